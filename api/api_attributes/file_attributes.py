@@ -1,5 +1,9 @@
+import json
+
 import httpx
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi_sqlalchemy import db
 from fastapi_utils.cbv import cbv
 from logger import LoggerFactory
@@ -11,13 +15,14 @@ from models import manifest
 from models.base_models import APIResponse
 from models.base_models import EAPIResponseCode
 from models.manifest_sql import DataAttributeModel
+from resources.concurrency import ordered_map
 from resources.error_handler import catch_internal
+from resources.http_client import get_client
+from resources.traversal import TraversalLimitError
+from resources.traversal import iter_folder_files
 
 from .utils import attach_attributes
 from .utils import get_file_node_bygeid
-from .utils import get_files_recursive
-from .utils import get_folder_node_bygeid
-from .utils import has_valid_attributes
 
 router = APIRouter()
 _API_NAMESPACE = "file_attributes_restful"
@@ -28,10 +33,12 @@ _logger = LoggerFactory(__name__).get_logger()
 class AttachAttributes:
     def __init__(self):
         self._logger = LoggerFactory('api_attributes').get_logger()
+        # traversal limit errors of the folders that were only partly processed
+        self.truncated = []
 
     @router.post('/files/attributes/attach', summary="Attach attributes on file", tags=['files'])
     @catch_internal(_API_NAMESPACE)
-    def post(self, data: models.AttachAttributesPOST):
+    async def post(self, data: models.AttachAttributesPOST):
         api_response = models.AttachPOSTResponse()
         self._logger.info(f"file data payload: {data}")
 
@@ -39,7 +46,7 @@ class AttachAttributes:
         global_entity_id = data.global_entity_id
         attributes = data.attributes
 
-        manifest = Manifest.get_by_id(manifest_id)
+        manifest, validator = await run_in_threadpool(Manifest.get_with_validator, manifest_id)
         if not manifest:
             api_response.code = EAPIResponseCode.bad_request
             api_response.error_msg = "can not get manifest data with manifest_id: {}".format(
@@ -48,88 +55,119 @@ class AttachAttributes:
             return api_response.json_response()
         self._logger.info(f"file manifest: {manifest}")
 
-        sql_attributes = manifest['attributes']
-        result_list = []
-
-        valid, error_msg = has_valid_attributes(sql_attributes, attributes)
+        valid, error_msg = validator.validate(attributes)
         if not valid:
             api_response.code = EAPIResponseCode.bad_request
             api_response.error_msg = error_msg
             return api_response.json_response()
 
-        for geid in global_entity_id:
-            file_node = get_file_node_bygeid(geid)
+        if data.stream:
+            return StreamingResponse(
+                self.stream_results(validator, attributes, global_entity_id), media_type='application/x-ndjson'
+            )
 
-            if not file_node:
-                folder_node = get_folder_node_bygeid(geid)
-                child_files = get_files_recursive(geid, [])
-                if len(child_files) == 0:
-                    continue
-
-                for child_file in child_files:
-                    # Make sure it's Greenroom file
-                    if "manifest_id" in child_file:
-                        result_list.append({
-                            "name": child_file["name"],
-                            "geid": child_file["global_entity_id"],
-                            "operation_status": "TERMINATED",
-                            "error_type": "attributes_duplicate"
-                        })
-                        continue
-
-                    is_success = attach_attributes(
-                        manifest, attributes, child_file, self._logger)
-                    if is_success:
-                        result_list.append({
-                            "name": child_file["name"],
-                            "geid": child_file["global_entity_id"],
-                            "operation_status": "SUCCEED"
-                        })
-                    else:
-                        result_list.append({
-                            "name": child_file["name"],
-                            "geid": child_file["global_entity_id"],
-                            "operation_status": "TERMINATED",
-                            "error_type": "internal_error"
-                        })
-            else:
-                if "manifest_id" in file_node:
-                    result_list.append({
-                        "name": file_node["name"],
-                        "geid": file_node["global_entity_id"],
-                        "operation_status": "TERMINATED",
-                        "error_type": "attributes_duplicate"
-                    })
-                    continue
-
-                is_success = attach_attributes(
-                    manifest, attributes, file_node, self._logger)
-
-                if is_success:
-                    result_list.append({
-                        "name": file_node["name"],
-                        "geid": file_node["global_entity_id"],
-                        "operation_status": "SUCCEED"
-                    })
-                else:
-                    result_list.append({
-                        "name": file_node["name"],
-                        "geid": file_node["global_entity_id"],
-                        "operation_status": "TERMINATED",
-                        "error_type": "internal_error"
-                    })
+        result_list = [result async for result in self.iter_results(validator, attributes, global_entity_id)]
 
         api_response.result = result_list
         api_response.code = EAPIResponseCode.success
         api_response.total = len(result_list)
+        if self.truncated:
+            api_response.truncated = True
+            api_response.error_msg = '; '.join(self.truncated)
 
         return api_response.json_response()
 
+    async def iter_results(self, validator, attributes, global_entity_id):
+        """Attach the attributes to every selected file, or every file under a selected folder.
+
+        Files are processed concurrently up to ATTACH_ATTRIBUTES_CONCURRENCY and the results come back in selection
+        order.
+        """
+        async def attach(file_node):
+            return await self.attach_to_file(validator, attributes, file_node)
+
+        async for result in ordered_map(
+            attach, self.iter_target_files(global_entity_id), ConfigClass.ATTACH_ATTRIBUTES_CONCURRENCY
+        ):
+            yield result
+
+    async def iter_target_files(self, global_entity_id):
+        for geid in global_entity_id:
+            file_node = await get_file_node_bygeid(geid)
+
+            if not file_node:
+                try:
+                    async for child_file in iter_folder_files(geid):
+                        yield child_file
+                except TraversalLimitError as e:
+                    # attributes are already attached to the files listed so far, so their results are still
+                    # reported and the rest of the folder is skipped
+                    self._logger.warning(f"attach attributes truncated: {e}")
+                    self.truncated.append(str(e))
+            else:
+                yield file_node
+
+    async def attach_to_file(self, validator, attributes, file_node):
+        # Make sure it's Greenroom file
+        if "manifest_id" in file_node:
+            return {
+                "name": file_node["name"],
+                "geid": file_node["global_entity_id"],
+                "operation_status": "TERMINATED",
+                "error_type": "attributes_duplicate"
+            }
+
+        try:
+            is_success = await attach_attributes(
+                validator, attributes, file_node, self._logger)
+        except httpx.HTTPError:
+            is_success = False
+
+        if is_success:
+            return {
+                "name": file_node["name"],
+                "geid": file_node["global_entity_id"],
+                "operation_status": "SUCCEED"
+            }
+        return {
+            "name": file_node["name"],
+            "geid": file_node["global_entity_id"],
+            "operation_status": "TERMINATED",
+            "error_type": "internal_error"
+        }
+
+    async def stream_results(self, validator, attributes, global_entity_id):
+        """Write one ndjson line per processed file followed by a summary line."""
+        summary = {
+            "code": EAPIResponseCode.success.value,
+            "error_msg": "",
+            "total": 0,
+            "succeed": 0,
+            "terminated": 0,
+            "truncated": False,
+        }
+        try:
+            async for result in self.iter_results(validator, attributes, global_entity_id):
+                summary["total"] += 1
+                if result["operation_status"] == "SUCCEED":
+                    summary["succeed"] += 1
+                else:
+                    summary["terminated"] += 1
+                yield json.dumps(result) + "\n"
+        except Exception as e:
+            self._logger.error(f"attach attributes stream aborted: {e}")
+            summary["code"] = EAPIResponseCode.internal_error.value
+            summary["error_msg"] = str(e)
+        if self.truncated:
+            summary["truncated"] = True
+            summary["error_msg"] = "; ".join(filter(None, [summary["error_msg"], *self.truncated]))
+        yield json.dumps({"summary": summary}) + "\n"
+
 
 @cbv(router)
 class RestfulAttributes:
     @router.post('/attributes', response_model=manifest.POSTAttributesResponse, summary="Bulk create attributes", tags=['attributes'])
-    def post(self, data: manifest.POSTAttributesRequest):
+    async def post(self, data: manifest.POSTAttributesRequest):
         api_response = APIResponse()
         attributes = data.attributes
         for item in attributes:
@@ -145,11 +183,10 @@ class RestfulAttributes:
 
             # check if connect to any files
             if not model_data["optional"]:
-                with httpx.Client() as client:
-                    response = client.post(
-                        ConfigClass.NEO4J_SERVICE_V1 + "nodes/File/query/count",
-                        json={"manifest_id": model_data["manifest_id"]}
-                    )
+                response = await get_client().post(
+                    ConfigClass.NEO4J_SERVICE_V1 + "nodes/File/query/count",
+                    json={"manifest_id": model_data["manifest_id"]}
+                )
                 try:
                     response.raise_for_status()
                 except httpx.HTTPError as exc:
@@ -160,10 +197,7 @@ class RestfulAttributes:
                     api_response.result = "Can't add required attributes to manifest attached to files"
                     _logger.error(api_response.result)
                     return api_response.json_response()
-            attribute = DataAttributeModel(**model_data)
-            db.session.add(attribute)
-            db.session.commit()
-            db.session.refresh(attribute)
+            await run_in_threadpool(Manifest.create_attributes, [model_data])
         api_response.result = "Success"
         return api_response.json_response()
 
@@ -195,6 +229,7 @@ class RestfulAttribute:
         db.session.add(attribute)
         db.session.commit()
         db.session.refresh(attribute)
+        Manifest.invalidate(manifest_ids=[attribute.manifest_id], project_codes=[attribute.project_code])
         my_res.result = attribute.to_dict()
         return my_res.json_response()
 
@@ -213,5 +248,6 @@ class RestfulAttribute:
 
         db.session.delete(attribute)
         db.session.commit()
+        Manifest.invalidate(manifest_ids=[attribute.manifest_id], project_codes=[attribute.project_code])
         my_res.result = "Success"
         return my_res.json_response()
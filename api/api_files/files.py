@@ -1,31 +1,174 @@
+import asyncio
+import json
 import math
 import os
 import time
 import copy
+from typing import Optional
+from typing import Tuple
 
-import httpx
 from fastapi import APIRouter
-from fastapi_sqlalchemy import db
+from fastapi.concurrency import run_in_threadpool
 from fastapi_utils.cbv import cbv
 from logger import LoggerFactory
 
 from api.api_files.utils import check_attributes
 from api.api_files.utils import get_file_node_bygeid
-from api.api_files.utils import has_valid_attributes
+from api.api_manifest.service import Manifest
 from config import ConfigClass
 from models import files as models
 from models import folders as folder_models
 from models import manifest
 from models.base_models import APIResponse
 from models.base_models import EAPIResponseCode
-from models.manifest_sql import DataAttributeModel
-from models.manifest_sql import DataManifestModel
+from resources.cache import TTLCache
+from resources.cursor import InvalidCursorError
+from resources.cursor import next_cursor
+from resources.cursor import page_offset
 from resources.error_handler import catch_internal
+from resources.es_outbox import enqueue
+from resources.es_outbox import enqueue_create
+from resources.es_outbox import enqueue_update
+from resources.http_client import get_client
+from resources.project_resolver import project_resolver
+from resources.step_graph import StepFailed
+from resources.step_graph import StepGraph
 
 router = APIRouter()
 _logger = LoggerFactory('api_files').get_logger()
 
 _API_NAMESPACE = 'file_entity_restful'
+_total_cache = TTLCache(ConfigClass.FILE_QUERY_TOTAL_CACHE_SIZE, ConfigClass.FILE_QUERY_TOTAL_CACHE_TTL)
+
+
+def file_payloads(data: models.CreateFilePOST) -> Tuple[dict, dict]:
+    '''
+    build the neo4j node and the elastic search entity of a file to register, returns (node, entity)
+    '''
+    payload = data.__dict__.copy()
+    payload['name'] = os.path.basename(data.full_path)
+    payload['path'] = os.path.dirname(data.full_path)
+    payload['archived'] = False
+
+    es_payload = {
+        'global_entity_id': payload['global_entity_id'],
+        'data_type': 'File',
+        'operator': payload['uploader'],
+        'file_size': payload['file_size'],
+        'tags': payload['tags'],
+        'archived': False,
+        'location': payload['location'],
+        'time_lastmodified': time.time(),
+        'process_pipeline': payload['process_pipeline'],
+        'uploader': payload['uploader'],
+        'file_name': payload['name'],
+        'time_created': time.time(),
+        'atlas_guid': payload['guid'],
+        'full_path': payload['full_path'],
+        'display_path': payload['display_path'],
+        "dcm_id": payload['dcm_id'],
+        'project_code': payload['project_code'],
+        'list_priority': 20,
+    }
+
+    if 'version_id' in payload:
+        es_payload['version'] = payload['version_id']
+
+    extra_labels = []
+    if data.namespace == 'greenroom':
+        extra_labels.append('Greenroom')
+        es_payload['zone'] = 'Greenroom'
+    else:
+        extra_labels.append('Core')
+        es_payload['zone'] = 'Core'
+
+    # create neo4j payload
+    neo4j_payload = {
+        "global_entity_id": payload["global_entity_id"],
+        "extra_labels": extra_labels,
+        "list_priority": 20,
+        "uploader": payload["uploader"],
+        "file_size": payload["file_size"],
+        "tags": payload["tags"],
+        "location": payload["location"],
+        "process_pipeline": payload["process_pipeline"],
+        "name": payload["name"],
+        "guid": payload["guid"],
+        "full_path": payload["full_path"],
+        "display_path": payload["display_path"],
+        "dcm_id": payload["dcm_id"],
+        "project_code": payload["project_code"],
+        "path": payload["path"],
+        "version_id": payload["version_id"],
+        "operator": payload["operator"],
+        "archived": payload["archived"],
+        "parent_folder_geid": payload["parent_folder_geid"],
+    }
+    return neo4j_payload, es_payload
+
+
+def format_greenroom_attributes(greenroom_node: dict, manifest: Optional[dict]) -> list:
+    '''
+    format the manifest attributes of a greenroom file for the elastic search entity of its core copy
+    '''
+    attributes = []
+    if not manifest:
+        return attributes
+    for sql_attribute in manifest['attributes']:
+        attribute_value = greenroom_node.get('attr_' + sql_attribute['name'], '')
+
+        if sql_attribute['type'] == 'multiple_choice':
+            attribute_value = []
+            attribute_value.append(greenroom_node.get('attr_' + sql_attribute['name'], ''))
+
+        attributes.append(
+            {
+                'attribute_name': sql_attribute['name'],
+                'name': manifest['name'],
+                'value': attribute_value,
+            }
+        )
+    return attributes
+
+
+def trash_payloads(data: models.CreateTrashPOST, file_node: dict) -> Tuple[dict, dict]:
+    '''
+    build the TrashFile node replacing a file and the elastic search update archiving the file, returns (node, update)
+    '''
+    name = os.path.basename(data.trash_full_path)
+    trash_path = os.path.dirname(data.trash_full_path)
+    trash_file_data = {
+        'name': name,
+        'path': trash_path,
+        'full_path': data.trash_full_path,
+        'description': file_node.get('description'),
+        'file_size': file_node.get('file_size'),
+        'guid': file_node.get('guid'),
+        'manifest_id': file_node.get('manifest_id', None),
+        'dcm_id': file_node.get('dcm_id', None),
+        'archived': True,
+        'extra_labels': [label for label in file_node.get('labels') if label != 'File'],
+        'uploader': file_node.get('uploader'),
+        'tags': file_node.get('tags'),
+        'global_entity_id': data.trash_geid,
+    }
+
+    for key, value in file_node.items():
+        if key.startswith('attr_'):
+            trash_file_data[key] = value
+
+    es_payload = {
+        'global_entity_id': file_node['global_entity_id'],
+        'updated_fields': {
+            'name': name,
+            'path': trash_path,
+            'full_path': data.trash_full_path,
+            'archived': True,
+            'process_pipeline': 'data_delete',
+            'time_lastmodified': time.time(),
+        },
+    }
+    return trash_file_data, es_payload
 
 
 @cbv(router)
@@ -35,45 +178,13 @@ class CreateFile:
 
     @router.post('/', response_model=models.CreateFilePOSTResponse, summary='Create file')
     @catch_internal(_API_NAMESPACE)
-    def post(self, data: models.CreateFilePOST):
+    async def post(self, data: models.CreateFilePOST):
         api_response = models.CreateFilePOSTResponse()
         self._logger.info(f'file data payload: {data}')
-        full_path = data.full_path
         original_geid = data.original_geid
-        payload = data.__dict__.copy()
-        self._logger.info(f'file payload: {payload}')
-        payload['name'] = os.path.basename(full_path)
-        payload['path'] = os.path.dirname(full_path)
-        payload['archived'] = False
-
-        process_pipeline = payload.get('process_pipeline', None)
-
-        es_payload = {
-            'global_entity_id': payload['global_entity_id'],
-            'data_type': 'File',
-            'operator': payload['uploader'],
-            'file_size': payload['file_size'],
-            'tags': payload['tags'],
-            'archived': False,
-            'location': payload['location'],
-            'time_lastmodified': time.time(),
-            'process_pipeline': payload['process_pipeline'],
-            'uploader': payload['uploader'],
-            'file_name': payload['name'],
-            'time_created': time.time(),
-            'atlas_guid': payload['guid'],
-            'full_path': payload['full_path'],
-            'display_path': payload['display_path'],
-            "dcm_id": payload['dcm_id'],
-            'project_code': payload['project_code'],
-            'list_priority': 20,
-        }
-
-        if 'version_id' in payload:
-            es_payload['version'] = payload['version_id']
+        process_pipeline = data.process_pipeline
 
         if data.input_file_id:
-            del payload['input_file_id']
             if not data.process_pipeline:
                 api_response.code = EAPIResponseCode.bad_request
                 api_response.error_msg = 'Missing required field process_pipeline for input_file_id'
@@ -83,52 +194,21 @@ class CreateFile:
                 api_response.error_msg = 'Missing required field operator for input_file_id'
                 return api_response.json_response()
 
-        extra_labels = []
-        if data.namespace == 'greenroom':
-            extra_labels.append('Greenroom')
-            es_payload['zone'] = 'Greenroom'
-        else:
-            extra_labels.append('Core')
-            es_payload['zone'] = 'Core'
-
-        # create neo4j payload
-        neo4j_payload = {
-            "global_entity_id": payload["global_entity_id"],
-            "extra_labels": extra_labels,
-            "list_priority": 20,
-            "uploader": payload["uploader"],
-            "file_size": payload["file_size"],
-            "tags": payload["tags"],
-            "location": payload["location"],
-            "process_pipeline": payload["process_pipeline"],
-            "name": payload["name"],
-            "guid": payload["guid"],
-            "full_path": payload["full_path"],
-            "display_path": payload["display_path"],
-            "dcm_id": payload["dcm_id"],
-            "project_code": payload["project_code"],
-            "path": payload["path"],
-            "version_id": payload["version_id"],
-            "operator": payload["operator"],
-            "archived": payload["archived"],
-            "parent_folder_geid": payload["parent_folder_geid"],
-        }
-        
-        # Create node
-        with httpx.Client() as client:
-            response = client.post(ConfigClass.NEO4J_SERVICE_V1 + 'nodes/File', json=neo4j_payload)
-
-        if response.status_code != 200:
-            api_response.code = EAPIResponseCode.internal_error
-            api_response.error_msg = f'Neo4j error: {response.json()}'
-            return api_response.json_response()
-        file_node = response.json()[0]
-
-        self._logger.info(f'File Node: {str(file_node)}')
+        neo4j_payload, es_payload = file_payloads(data)
 
-        if data.parent_folder_geid:
-            # Create Folder to File relation
-            respon_parent_folder_query = folder_models.http_query_node(
+        async def create_node():
+            response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + 'nodes/File', json=neo4j_payload)
+            if response.status_code != 200:
+                raise StepFailed(f'Neo4j error: {response.json()}')
+            file_node = response.json()[0]
+            self._logger.info(f'File Node: {str(file_node)}')
+            return file_node
+
+        async def query_parent():
+            if not data.parent_folder_geid:
+                # Container to file relation
+                return await project_resolver.resolve(code=data.project_code)
+            respon_parent_folder_query = await folder_models.http_query_node(
                 data.namespace, {'global_entity_id': data.parent_folder_geid}
             )
             if not respon_parent_folder_query.status_code == 200:
@@ -148,100 +228,289 @@ class CreateFile:
                         )
                     )
                 )
-            parent_folder_node = parent_folder_node[0]
-            relation_payload = {'start_id': parent_folder_node['id'], 'end_id': file_node['id']}
-
-            with httpx.Client() as client:
-                response = client.post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/own', json=relation_payload)
+            return parent_folder_node[0]
 
+        async def link_parent(file_node, parent):
+            # Create Folder or Container to File relation
+            relation_payload = {'start_id': parent['id'] if parent else None, 'end_id': file_node['id']}
+            response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/own', json=relation_payload)
             if response.status_code != 200:
-                api_response.code = EAPIResponseCode.internal_error
-                api_response.error_msg = f'Neo4j error: {response.json()}'
-                return api_response.json_response()
-        else:
-            # Create Container to file relation
-            query_params = {'code': data.project_code}
-            container_id = get_container_id(query_params)
-            # relation_payload = {"start_id": data.project_id,
-            #                     "end_id": file_node["id"]}
-            relation_payload = {'start_id': container_id, 'end_id': file_node['id']}
-
-            with httpx.Client() as client:
-                response = client.post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/own', json=relation_payload)
-            if response.status_code != 200:
-                api_response.code = EAPIResponseCode.internal_error
-                api_response.error_msg = f'Neo4j error: {response.json()}'
-                return api_response.json_response()
+                raise StepFailed(f'Neo4j error: {response.json()}')
 
-        # Create input to processed relation
-        # curretly wouldn't be triggered by dataops_util
-        if data.input_file_id:
+        async def link_input_file(file_node, parent_linked):
+            # Create input to processed relation
+            # curretly wouldn't be triggered by dataops_util
+            if not data.input_file_id:
+                return
             relation_payload = {
                 'start_id': data.input_file_id,
                 'end_id': file_node['id'],
                 'properties': {'operator': data.operator},
             }
             self._logger.debug('CreateFile relation_payload: ' + str(relation_payload))
-            with httpx.Client() as client:
-                response = client.post(
-                    ConfigClass.NEO4J_SERVICE_V1 + f'relations/{data.process_pipeline}', json=relation_payload
-                )
+            response = await get_client().post(
+                ConfigClass.NEO4J_SERVICE_V1 + f'relations/{data.process_pipeline}', json=relation_payload
+            )
             if response.status_code != 200:
-                api_response.code = EAPIResponseCode.internal_error
-                api_response.error_msg = f'Neo4j error: {response.json()}'
-                return api_response.json_response()
+                raise StepFailed(f'Neo4j error: {response.json()}')
 
-        # Create entity in Elastic Search
-        if process_pipeline != 'data_delete':
+        async def query_greenroom_node():
+            if process_pipeline != 'data_transfer' or not original_geid:
+                return None
             try:
-                if process_pipeline == 'data_transfer' and original_geid:
-                    with httpx.Client() as client:
-                        response = client.post(
-                            ConfigClass.NEO4J_SERVICE_V1 + 'nodes/File/query', json={'global_entity_id': original_geid}
-                        )
-                    gr_file_node = response.json()[0]
-                    self._logger.info(f'Greenroom File Node: {str(gr_file_node)}')
-                    if 'manifest_id' in gr_file_node:
-                        manifest_id = gr_file_node['manifest_id']
-                        full_path = gr_file_node['full_path']
-
-                        attributes = []
-                        with httpx.Client() as client:
-                            res = client.get(ConfigClass.NEO4J_SERVICE_V1 + f'manifest/{manifest_id}')
-                        if res.status_code == 200:
-                            manifest_data = res.json()
-                            manifest = manifest_data['result']
-                            sql_attributes = manifest['attributes']
-
-                            for sql_attribute in sql_attributes:
-                                attribute_value = gr_file_node.get('attr_' + sql_attribute['name'], '')
-
-                                if sql_attribute['type'] == 'multiple_choice':
-                                    attribute_value = []
-                                    attribute_value.append(gr_file_node.get('attr_' + sql_attribute['name'], ''))
-
-                                attributes.append(
-                                    {
-                                        'attribute_name': sql_attribute['name'],
-                                        'name': manifest['name'],
-                                        'value': attribute_value,
-                                    }
-                                )
-
-                        es_payload['attributes'] = attributes
+                response = await get_client().post(
+                    ConfigClass.NEO4J_SERVICE_V1 + 'nodes/File/query', json={'global_entity_id': original_geid}
+                )
+                gr_file_node = response.json()[0]
+                self._logger.info(f'Greenroom File Node: {str(gr_file_node)}')
+                return gr_file_node
             except Exception as e:
                 self._logger.error(str(e))
+                return None
 
+        async def query_greenroom_attributes(greenroom_node):
+            # the attributes attached to the greenroom file are copied to the core entity
+            if not greenroom_node or 'manifest_id' not in greenroom_node:
+                return None
+            try:
+                manifest = await run_in_threadpool(Manifest.get_by_id, greenroom_node['manifest_id'])
+                return format_greenroom_attributes(greenroom_node, manifest)
+            except Exception as e:
+                self._logger.error(str(e))
+                return None
+
+        async def create_entity(input_linked, greenroom_attributes):
+            # Create entity in Elastic Search
+            if process_pipeline == 'data_delete':
+                return
+            if greenroom_attributes is not None:
+                es_payload['attributes'] = greenroom_attributes
             self._logger.info('es_payload: ' + str(es_payload))
-            with httpx.Client() as client:
-                es_res = client.post(ConfigClass.PROVENANCE_SERVICE_V1 + 'entity/file', json=es_payload)
-            self._logger.info(f'Elastic Search Result: {es_res.json()}')
-            if es_res.status_code != 200:
-                api_response.code = EAPIResponseCode.internal_error
-                api_response.error_msg = f'Elastic Search Error: {es_res.json()}'
-                return api_response.json_response()
+            try:
+                await enqueue_create(es_payload)
+            except Exception as e:
+                raise StepFailed(f'Elastic Search outbox error: {e}')
+
+        # the lookups run concurrently with the node creation, the writes keep their original order
+        steps = StepGraph()
+        steps.add('file_node', create_node)
+        steps.add('parent', query_parent)
+        steps.add('parent_linked', link_parent, requires=['file_node', 'parent'])
+        steps.add('input_linked', link_input_file, requires=['file_node', 'parent_linked'])
+        steps.add('greenroom_node', query_greenroom_node)
+        steps.add('greenroom_attributes', query_greenroom_attributes, requires=['greenroom_node'])
+        steps.add('entity', create_entity, requires=['input_linked', 'greenroom_attributes'])
+        try:
+            results = await steps.run()
+        except StepFailed as e:
+            api_response.code = EAPIResponseCode.internal_error
+            api_response.error_msg = str(e)
+            return api_response.json_response()
+        finally:
+            self._logger.info(f'create file step timings: {steps.timings}')
+
+        api_response.result = results['file_node']
+        return api_response.json_response()
+
+
+@cbv(router)
+class CreateFileBatch:
+    def __init__(self):
+        self._logger = LoggerFactory('api_file').get_logger()
+
+    @router.post('/batch', response_model=models.CreateFileBatchPOSTResponse, summary='Create files in bulk')
+    @catch_internal(_API_NAMESPACE)
+    async def post(self, data: models.CreateFileBatchPOST):
+        """
+        Register many files with one bulk node creation per zone, one batch relation call per parent type and one
+        outbox insert, instead of a full CreateFile chain per file. Every file gets its own result, in payload order.
+        Files whose node batch got an unreadable response have status unknown and the response code is 500.
+        """
+        api_response = models.CreateFileBatchPOSTResponse()
+        if len(data.payload) > ConfigClass.FILE_BATCH_MAX_SIZE:
+            api_response.code = EAPIResponseCode.bad_request
+            api_response.error_msg = f'At most {ConfigClass.FILE_BATCH_MAX_SIZE} files can be created in one batch'
+            return api_response.json_response()
+
+        results = []
+        files = {}
+        for item in data.payload:
+            result = {'global_entity_id': item.global_entity_id, 'status': 'failed', 'error_msg': '', 'result': {}}
+            results.append(result)
+            if not item.global_entity_id:
+                result['error_msg'] = 'Missing required field global_entity_id'
+            elif item.global_entity_id in files:
+                result['error_msg'] = 'Duplicated global_entity_id'
+            elif item.input_file_id:
+                result['error_msg'] = 'input_file_id is not supported in batch, use POST /v1/files/'
+            else:
+                neo4j_payload, es_payload = file_payloads(item)
+                files[item.global_entity_id] = (item, neo4j_payload, es_payload, result)
+
+        def fail(geids, error_msg):
+            for geid in geids:
+                files[geid][3]['error_msg'] = error_msg
+
+        # geids sent in a node batch whose response could not be read, their nodes may exist
+        unconfirmed = []
+
+        async def query_parents():
+            # parents are checked before any node is created so a missing one does not leave an orphan file
+            folder_geids = list({item.parent_folder_geid for item, *_ in files.values() if item.parent_folder_geid})
+            project_codes = list({item.project_code for item, *_ in files.values() if not item.parent_folder_geid})
+            folders = {}
+            if folder_geids:
+                response = await get_client().post(
+                    ConfigClass.NEO4J_SERVICE_V1 + 'nodes/query/geids', json={'geids': folder_geids}
+                )
+                response.raise_for_status()
+                folders = {node['global_entity_id']: node for node in response.json()['result']
+                           if 'Folder' in node['labels']}
+            projects = await asyncio.gather(*[project_resolver.resolve(code=code) for code in project_codes])
+            parents = {}
+            for geid, (item, *_) in files.items():
+                if item.parent_folder_geid:
+                    parent = folders.get(item.parent_folder_geid)
+                    if parent is None:
+                        fail([geid], f'Parent folder not found {item.parent_folder_geid}')
+                        continue
+                else:
+                    parent = projects[project_codes.index(item.project_code)]
+                    if parent is None:
+                        fail([geid], f'Project not found {item.project_code}')
+                        continue
+                parents[geid] = parent
+            return parents
+
+        async def create_nodes(parents):
+            by_labels = {}
+            for geid in parents:
+                neo4j_payload = dict(files[geid][1])
+                by_labels.setdefault(tuple(neo4j_payload.pop('extra_labels')), []).append(neo4j_payload)
+
+            async def create_group(extra_labels, nodes):
+                geids = [node['global_entity_id'] for node in nodes]
+                response = await get_client().post(
+                    ConfigClass.NEO4J_SERVICE_V1 + 'nodes/File/batch',
+                    json={'payload': nodes, 'extra_labels': list(extra_labels)},
+                )
+                if response.status_code != 200:
+                    fail(geids, f'Neo4j error: {response.text}')
+                    return []
+                try:
+                    created = response.json()
+                except ValueError:
+                    created = None
+                if not isinstance(created, list) or not all(isinstance(node, dict) for node in created):
+                    # the batch may have been written, so these files are not reported as plain failures to retry
+                    self._logger.error(f'unexpected neo4j batch response: {response.text}')
+                    unconfirmed.extend(geids)
+                    for geid in geids:
+                        files[geid][3]['status'] = 'unknown'
+                    fail(geids, 'Neo4j error: unexpected batch response, the file may have been created')
+                    return []
+                created = {node.get('global_entity_id'): node for node in created}
+                # a node missing from the response is not known to exist, so it is neither linked nor indexed
+                fail([geid for geid in geids if geid not in created], 'Neo4j error: node missing from batch response')
+                for geid in geids:
+                    if geid in created:
+                        files[geid][3]['result'] = created[geid]
+                return [geid for geid in geids if geid in created]
+
+            groups = await asyncio.gather(*[create_group(labels, nodes) for labels, nodes in by_labels.items()])
+            return [geid for geids in groups for geid in geids]
+
+        async def link_parents(parents, nodes):
+            by_parent_label = {'Folder': [], 'Container': []}
+            for geid in nodes:
+                item = files[geid][0]
+                if item.parent_folder_geid:
+                    by_parent_label['Folder'].append((geid, {'global_entity_id': item.parent_folder_geid}))
+                else:
+                    by_parent_label['Container'].append((geid, {'code': item.project_code}))
+
+            async def link_group(start_label, links):
+                relations = [{'start_params': start, 'end_params': {'global_entity_id': geid}} for geid, start in links]
+                try:
+                    await folder_models.bulk_link_project(['start', 'end'], start_label, 'File', relations)
+                except Exception as e:
+                    self._logger.error(str(e))
+                    fail([geid for geid, _ in links], f'Neo4j error: {e}')
+                    return []
+                return [geid for geid, _ in links]
+
+            groups = await asyncio.gather(
+                *[link_group(label, links) for label, links in by_parent_label.items() if links]
+            )
+            return [geid for geids in groups for geid in geids]
+
+        async def query_greenroom_attributes():
+            # the attributes attached to the greenroom files are copied to their core entities
+            originals = {
+                geid: item.original_geid for geid, (item, *_) in files.items()
+                if item.process_pipeline == 'data_transfer' and item.original_geid
+            }
+            if not originals:
+                return {}
+            try:
+                response = await get_client().post(
+                    ConfigClass.NEO4J_SERVICE_V1 + 'nodes/query/geids', json={'geids': list(set(originals.values()))}
+                )
+                response.raise_for_status()
+                greenroom_nodes = {node['global_entity_id']: node for node in response.json()['result']
+                                   if 'File' in node['labels']}
+                manifests = await run_in_threadpool(
+                    Manifest.get_by_ids,
+                    [node['manifest_id'] for node in greenroom_nodes.values() if 'manifest_id' in node],
+                )
+                attributes = {}
+                for geid, original_geid in originals.items():
+                    greenroom_node = greenroom_nodes.get(original_geid)
+                    if greenroom_node and 'manifest_id' in greenroom_node:
+                        manifest = manifests.get(int(greenroom_node['manifest_id']))
+                        attributes[geid] = format_greenroom_attributes(greenroom_node, manifest)
+                return attributes
+            except Exception as e:
+                self._logger.error(str(e))
+                return {}
+
+        async def create_entities(linked, attributes):
+            es_docs = []
+            for geid in linked:
+                item, _, es_payload, _ = files[geid]
+                if item.process_pipeline == 'data_delete':
+                    continue
+                if geid in attributes:
+                    es_payload['attributes'] = attributes[geid]
+                es_docs.append(es_payload)
+            try:
+                await enqueue('POST', es_docs)
+            except Exception as e:
+                fail(linked, f'Elastic Search outbox error: {e}')
+                return
+            for geid in linked:
+                files[geid][3]['status'] = 'success'
+
+        if files:
+            steps = StepGraph()
+            steps.add('parents', query_parents)
+            steps.add('nodes', create_nodes, requires=['parents'])
+            steps.add('linked', link_parents, requires=['parents', 'nodes'])
+            steps.add('attributes', query_greenroom_attributes)
+            steps.add('entities', create_entities, requires=['linked', 'attributes'])
+            try:
+                await steps.run()
+            finally:
+                self._logger.info(f'create {len(files)} files step timings: {steps.timings}')
 
-        api_response.result = file_node
+        if unconfirmed:
+            api_response.code = EAPIResponseCode.internal_error
+            api_response.error_msg = (
+                f'Neo4j returned an unexpected batch response, {len(unconfirmed)} files with status unknown may have '
+                'been created: query them before creating them again'
+            )
+        api_response.result = results
+        api_response.total = len(results)
         return api_response.json_response()
 
 
@@ -255,7 +524,7 @@ class DatasetFileQuery:
         summary='Query on files by Container',
     )
     # def post(self, dataset_id, data: models.DatasetFileQueryPOST):
-    def post(self, project_geid, data: models.DatasetFileQueryPOST):
+    async def post(self, project_geid, data: models.DatasetFileQueryPOST):
         api_response = models.DatasetFileQueryPOSTResponse()
         page = data.page
         page_size = data.page_size
@@ -264,10 +533,16 @@ class DatasetFileQuery:
             api_response.code = EAPIResponseCode.bad_request
             api_response.error_msg = 'Invalid order_type'
             return api_response.json_response()
+        try:
+            offset = page_offset(page, page_size, data.cursor, data.order_by, order_type)
+        except InvalidCursorError as e:
+            api_response.code = EAPIResponseCode.bad_request
+            api_response.error_msg = str(e)
+            return api_response.json_response()
         page_kwargs = {
             'order_by': data.order_by,
             'order_type': order_type,
-            'skip': page * page_size,
+            'skip': offset,
             'limit': page_size,
         }
         query = data.query
@@ -279,27 +554,41 @@ class DatasetFileQuery:
 
         if not query:
             query = None
-        query_params = {'global_entity_id': project_geid}
-        container_id = get_container_id(query_params)
+        project = await project_resolver.resolve(geid=project_geid)
+        if not project:
+            api_response.code = EAPIResponseCode.not_found
+            api_response.error_msg = 'Project not found'
+            return api_response.json_response()
         relation_payload = {
             **page_kwargs,
             'label': 'own',
             'start_label': 'Container',
             'end_label': labels,
-            'start_params': {'id': int(container_id)},
+            'start_params': {'id': int(project['id'])},
             'end_params': query,
             'partial': data.partial,
         }
-        with httpx.Client() as client:
-            response = client.post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/query', json=relation_payload)
-        nodes = [x['end_node'] for x in response.json()]
-
-        with httpx.Client() as client:
-            response = client.post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/query/count', json=relation_payload)
-        total = response.json()['count']
+        total_key = (project_geid, json.dumps([labels, query, data.partial], sort_keys=True, default=str))
+        if data.include_total:
+            page_response, count_response = await asyncio.gather(
+                get_client().post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/query', json=relation_payload),
+                get_client().post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/query/count', json=relation_payload),
+            )
+            nodes = [x['end_node'] for x in page_response.json()]
+            total = count_response.json()['count']
+            _total_cache.set(total_key, total)
+        else:
+            response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/query', json=relation_payload)
+            nodes = [x['end_node'] for x in response.json()]
+            total = _total_cache.get(total_key)
+            if total is None:
+                total = offset + len(nodes) + (1 if len(nodes) == page_size else 0)
         api_response.result = nodes
         api_response.total = total
-        api_response.page = page
+        api_response.page = offset // page_size
+        api_response.next_cursor = next_cursor(
+            offset, nodes, page_size, data.order_by, order_type, total if data.include_total else None
+        )
         api_response.num_of_pages = math.ceil(total / page_size)
         return api_response.json_response()
 
@@ -310,12 +599,8 @@ class TrashCreate:
         self._logger = LoggerFactory('api_delete_file').get_logger()
 
     @router.post('/trash', response_model=models.CreateTrashPOSTResponse, summary='Create TrashFile')
-    def post(self, data: models.CreateTrashPOST):
+    async def post(self, data: models.CreateTrashPOST):
         api_response = models.CreateTrashPOSTResponse()
-        full_path = data.full_path
-        trash_full_path = data.trash_full_path
-        name = os.path.basename(trash_full_path)
-        trash_path = os.path.dirname(trash_full_path)
 
         self._logger.info('global_entity_id: ' + data.geid)
 
@@ -325,45 +610,23 @@ class TrashCreate:
         else:
             payload = {'full_path': data.full_path}
 
-        with httpx.Client() as client:
-            response = client.post(ConfigClass.NEO4J_SERVICE_V1 + 'nodes/File/query', json=payload)
+        response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + 'nodes/File/query', json=payload)
         file_node = response.json()[0]
-        labels = file_node.get('labels')
-        labels.remove('File')
-
-        trash_file_data = {
-            'name': name,
-            'path': trash_path,
-            'full_path': trash_full_path,
-            'description': file_node.get('description'),
-            'file_size': file_node.get('file_size'),
-            'guid': file_node.get('guid'),
-            'manifest_id': file_node.get('manifest_id', None),
-            'dcm_id': file_node.get('dcm_id', None),
-            'archived': True,
-            'extra_labels': labels,
-            'uploader': file_node.get('uploader'),
-            'tags': file_node.get('tags'),
-            'global_entity_id': data.trash_geid,
-        }
+        trash_file_data, es_payload = trash_payloads(data, file_node)
 
-        for key, value in file_node.items():
-            if key.startswith('attr_'):
-                trash_file_data[key] = value
+        # Get dataset, before anything is written so a missing project does not leave an orphan TrashFile
+        project_code = file_node.get('project_code')
+        dataset = await project_resolver.resolve(code=project_code) if project_code else None
+        if not dataset:
+            api_response.code = EAPIResponseCode.not_found
+            api_response.error_msg = f'Project not found {project_code}'
+            return api_response.json_response()
+        container_id = dataset['id']
 
         # Create TrashFile
-        with httpx.Client() as client:
-            response = client.post(ConfigClass.NEO4J_SERVICE_V1 + 'nodes/TrashFile', json=trash_file_data)
+        response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + 'nodes/TrashFile', json=trash_file_data)
         trash_file = response.json()[0]
 
-        # Get dataset
-        get_connected = ConfigClass.NEO4J_SERVICE_V1 + 'relations/connected/{}'.format(file_node['global_entity_id'])
-        with httpx.Client() as client:
-            response = client.get(get_connected)
-        connected_nodes = response.json()['result']
-        dataset = [connected for connected in connected_nodes if 'Container' in connected['labels']][0]
-        container_id = dataset['id']
-
         # Create File to TrashFile relation
         relation_payload = {
             'start_id': file_node['id'],
@@ -371,36 +634,189 @@ class TrashCreate:
             'properties': {'operator': file_node.get('operator')},
         }
 
-        with httpx.Client() as client:
-            client.post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/deleted', json=relation_payload)
+        await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/deleted', json=relation_payload)
         # Create Container to file relation
         relation_payload = {'start_id': container_id, 'end_id': trash_file['id']}
 
-        with httpx.Client() as client:
-            client.post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/own', json=relation_payload)
+        await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + 'relations/own', json=relation_payload)
         api_response.result = trash_file
 
         # Update Elastic Search Entity
-        es_payload = {
-            'global_entity_id': file_node['global_entity_id'],
-            'updated_fields': {
-                'name': name,
-                'path': trash_path,
-                'full_path': trash_full_path,
-                'archived': True,
-                'process_pipeline': 'data_delete',
-                'time_lastmodified': time.time(),
-            },
-        }
         self._logger.info(f'es delete file payload: {es_payload}')
-        with httpx.Client() as client:
-            es_res = client.put(ConfigClass.PROVENANCE_SERVICE_V1 + 'entity/file', json=es_payload)
-        self._logger.info(f'es delete file response: {es_res.text}')
-        if es_res.status_code != 200:
+        try:
+            await enqueue_update(es_payload)
+        except Exception as e:
             api_response.code = EAPIResponseCode.internal_error
-            api_response.error_msg = f'Elastic Search Error: {es_res.json()}'
+            api_response.error_msg = f'Elastic Search outbox error: {e}'
+            return api_response.json_response()
+
+        return api_response.json_response()
+
+
+@cbv(router)
+class TrashCreateBatch:
+    def __init__(self):
+        self._logger = LoggerFactory('api_delete_file').get_logger()
+
+    @router.post(
+        '/trash/batch', response_model=models.CreateTrashBatchPOSTResponse, summary='Create TrashFiles in bulk'
+    )
+    @catch_internal(_API_NAMESPACE)
+    async def post(self, data: models.CreateTrashBatchPOST):
+        """
+        Move many files to the trash with one bulk node query, one TrashFile batch per label set, one batch call for
+        the deleted and the own relations each and one outbox insert. Every file gets its own result, in payload
+        order.
+        """
+        api_response = models.CreateTrashBatchPOSTResponse()
+        if len(data.payload) > ConfigClass.FILE_BATCH_MAX_SIZE:
+            api_response.code = EAPIResponseCode.bad_request
+            api_response.error_msg = f'At most {ConfigClass.FILE_BATCH_MAX_SIZE} files can be trashed in one batch'
             return api_response.json_response()
 
+        results = []
+        items = {}
+        for item in data.payload:
+            result = {'global_entity_id': item.geid, 'status': 'failed', 'error_msg': '', 'result': {}}
+            results.append(result)
+            source = item.geid or item.full_path
+            if not item.trash_geid:
+                result['error_msg'] = 'Missing required field trash_geid'
+            elif source in items:
+                result['error_msg'] = 'Duplicated file'
+            else:
+                items[source] = (item, result)
+
+        async def query_files():
+            geids = [item.geid for item, _ in items.values() if item.geid]
+            file_nodes = {}
+            if geids:
+                response = await get_client().post(
+                    ConfigClass.NEO4J_SERVICE_V1 + 'nodes/query/geids', json={'geids': geids}
+                )
+                response.raise_for_status()
+                file_nodes = {node['global_entity_id']: node for node in response.json()['result']
+                              if 'File' in node['labels']}
+
+            # files given by path only are queried one by one, there is no bulk path lookup
+            async def query_path(full_path):
+                response = await get_client().post(
+                    ConfigClass.NEO4J_SERVICE_V1 + 'nodes/File/query', json={'full_path': full_path}
+                )
+                response.raise_for_status()
+                return response.json()[0] if response.json() else None
+
+            paths = [item.full_path for item, _ in items.values() if not item.geid]
+            file_nodes.update(zip(paths, await asyncio.gather(*[query_path(path) for path in paths])))
+
+            found = {}
+            for source, (item, result) in items.items():
+                file_node = file_nodes.get(source)
+                if file_node is None:
+                    result['error_msg'] = f'File not found {source}'
+                    continue
+                result['global_entity_id'] = file_node['global_entity_id']
+                found[source] = file_node
+            return found
+
+        async def query_containers(files):
+            # each project is resolved once through the cached resolver
+            codes = list({file_node['project_code'] for file_node in files.values() if file_node.get('project_code')})
+            projects = dict(zip(codes, await asyncio.gather(*[project_resolver.resolve(code=code) for code in codes])))
+            containers = {}
+            for source, file_node in files.items():
+                container = projects.get(file_node.get('project_code'))
+                if container is None:
+                    items[source][1]['error_msg'] = 'Project not found'
+                    continue
+                containers[source] = container
+            return containers
+
+        async def create_trash_files(files, containers):
+            by_labels = {}
+            for source in containers:
+                trash_file_data, es_payload = trash_payloads(items[source][0], files[source])
+                by_labels.setdefault(tuple(trash_file_data.pop('extra_labels')), []).append(
+                    (source, trash_file_data, es_payload)
+                )
+
+            async def create_group(extra_labels, group):
+                response = await get_client().post(
+                    ConfigClass.NEO4J_SERVICE_V1 + 'nodes/TrashFile/batch',
+                    json={'payload': [trash_file for _, trash_file, _ in group], 'extra_labels': list(extra_labels)},
+                )
+                if response.status_code != 200:
+                    for source, _, _ in group:
+                        items[source][1]['error_msg'] = f'Neo4j error: {response.text}'
+                    return []
+                created = response.json()
+                created = {node.get('global_entity_id'): node for node in created} if isinstance(created, list) else {}
+                found = []
+                for source, trash_file, es_payload in group:
+                    node = created.get(trash_file['global_entity_id'])
+                    if node is None:
+                        # not known to exist, so it is neither linked nor indexed
+                        items[source][1]['error_msg'] = 'Neo4j error: node missing from batch response'
+                        continue
+                    items[source][1]['result'] = node
+                    found.append((source, trash_file, es_payload))
+                return found
+
+            groups = await asyncio.gather(*[create_group(labels, group) for labels, group in by_labels.items()])
+            return [created for group in groups for created in group]
+
+        async def link_trash_files(files, containers, trash_files):
+            deleted = []
+            owned = []
+            for source, trash_file, _ in trash_files:
+                file_node = files[source]
+                deleted.append({
+                    'start_params': {'global_entity_id': file_node['global_entity_id']},
+                    'end_params': {'global_entity_id': trash_file['global_entity_id']},
+                    'properties': {'operator': file_node.get('operator')},
+                })
+                owned.append({
+                    'start_params': {'global_entity_id': containers[source]['global_entity_id']},
+                    'end_params': {'global_entity_id': trash_file['global_entity_id']},
+                })
+            if not trash_files:
+                return []
+            try:
+                await asyncio.gather(
+                    folder_models.http_bulk_post_relation('deleted', ['start', 'end'], 'File', 'TrashFile', deleted),
+                    folder_models.http_bulk_post_relation('own', ['start', 'end'], 'Container', 'TrashFile', owned),
+                )
+            except Exception as e:
+                self._logger.error(str(e))
+                for source, _, _ in trash_files:
+                    items[source][1]['error_msg'] = f'Neo4j error: {e}'
+                return []
+            return trash_files
+
+        async def update_entities(linked):
+            try:
+                await enqueue('PUT', [es_payload for _, _, es_payload in linked])
+            except Exception as e:
+                for source, _, _ in linked:
+                    items[source][1]['error_msg'] = f'Elastic Search outbox error: {e}'
+                return
+            for source, _, _ in linked:
+                items[source][1]['status'] = 'success'
+
+        if items:
+            steps = StepGraph()
+            steps.add('files', query_files)
+            steps.add('containers', query_containers, requires=['files'])
+            steps.add('trash_files', create_trash_files, requires=['files', 'containers'])
+            steps.add('linked', link_trash_files, requires=['files', 'containers', 'trash_files'])
+            steps.add('entities', update_entities, requires=['linked'])
+            try:
+                await steps.run()
+            finally:
+                self._logger.info(f'trash {len(items)} files step timings: {steps.timings}')
+
+        api_response.result = results
+        api_response.total = len(results)
         return api_response.json_response()
 
 
@@ -413,7 +829,7 @@ class FileManifest:
         summary='Edit attached manifest',
         tags=['files'],
     )
-    def put(
+    async def put(
         self,
         request: dict,
         file_geid: str,
@@ -422,71 +838,50 @@ class FileManifest:
         data = request
 
         # file_node = get_file_node_bygeid(data["global_entity_id"])
-        file_node = get_file_node_bygeid(file_geid)
+        file_node = await get_file_node_bygeid(file_geid)
+        if not file_node:
+            api_response.code = EAPIResponseCode.not_found
+            api_response.error_msg = 'File not found'
+            _logger.error(api_response.error_msg)
+            return api_response.json_response()
         # data.pop("global_entity_id")
-        manifest_obj = db.session.query(DataManifestModel).get(file_node['manifest_id'])
+        validator = None
+        if file_node.get('manifest_id') is not None:
+            validator = await run_in_threadpool(Manifest.get_validator, file_node['manifest_id'])
+        if not validator:
+            api_response.code = EAPIResponseCode.not_found
+            api_response.error_msg = 'Manifest not found'
+            _logger.error(api_response.error_msg)
+            return api_response.json_response()
 
         # Check required attributes
-        attributes = (
-            db.session.query(DataAttributeModel)
-            .filter_by(manifest_id=file_node['manifest_id'])
-            .order_by(DataAttributeModel.id.asc())
-        )
-        valid_attributes = []
-        es_attributes = []
-        for attr in attributes:
-            valid_attributes.append(attr.name)
-            if not attr.optional and not attr.name in data:
-                api_response.result = 'Missing required attribute'
-                api_response.code = EAPIResponseCode.bad_request
-                _logger.error(api_response.result)
-                return api_response.json_response()
-            if attr.type.value == 'multiple_choice':
-                if not data[attr.name] in attr.value.split(','):
-                    if not data[attr.name] and attr.optional:
-                        continue
-                    api_response.result = 'Invalid attribute value'
-                    api_response.code = EAPIResponseCode.bad_request
-                    _logger.error(api_response.result)
-                    return api_response.json_response()
-                attribute_value = []
-                attribute_value.append(data[attr.name])
-                es_attributes.append({'attribute_name': attr.name, 'name': manifest_obj.name, 'value': attribute_value})
-            if attr.type.value == 'text':
-                value = data[attr.name]
-                if value:
-                    if len(value) > 100:
-                        api_response.result = 'text to long'
-                        api_response.code = EAPIResponseCode.bad_request
-                        _logger.error(api_response.result)
-                        return api_response.json_response()
-                    es_attributes.append({'attribute_name': attr.name, 'name': manifest_obj.name, 'value': value})
+        valid, error_msg = validator.validate_update(data)
+        if not valid:
+            api_response.result = error_msg
+            api_response.code = EAPIResponseCode.bad_request
+            _logger.error(api_response.result)
+            return api_response.json_response()
+
         post_data = {
             'manifest_id': file_node['manifest_id'],
         }
         for key, value in data.items():
-            if key not in valid_attributes:
-                api_response.result = 'Not a valid attribute'
-                api_response.code = EAPIResponseCode.bad_request
-                _logger.error(api_response.result)
-                return api_response.json_response()
             post_data['attr_' + key] = value
 
         file_id = file_node['id']
-        with httpx.Client() as client:
-            response = client.put(ConfigClass.NEO4J_SERVICE_V1 + f'nodes/File/node/{file_id}', json=post_data)
+        response = await get_client().put(ConfigClass.NEO4J_SERVICE_V1 + f'nodes/File/node/{file_id}', json=post_data)
         api_response.result = response.json()[0]
 
         # Update Elastic Search Entity
         es_payload = {
             'global_entity_id': file_node['global_entity_id'],
-            'updated_fields': {'attributes': es_attributes, 'time_lastmodified': time.time()},
+            'updated_fields': {'attributes': validator.update_es_attributes(data), 'time_lastmodified': time.time()},
         }
-        with httpx.Client() as client:
-            es_res = client.put(ConfigClass.PROVENANCE_SERVICE_V1 + 'entity/file', json=es_payload)
-        if es_res.status_code != 200:
+        try:
+            await enqueue_update(es_payload)
+        except Exception as e:
             api_response.code = EAPIResponseCode.internal_error
-            api_response.error_msg = f'Elastic Search Error: {es_res.json()}'
+            api_response.error_msg = f'Elastic Search outbox error: {e}'
             _logger.error(api_response.error_msg)
             return api_response.json_response()
 
@@ -504,25 +899,21 @@ class ValidateManifest:
         api_response = APIResponse()
         manifest_name = data.manifest_name
         project_code = data.project_code
-        manifest = db.session.query(DataManifestModel).filter_by(project_code=project_code, name=manifest_name).first()
-        if not manifest:
+        manifests = Manifest.get_by_project_name(project_code)
+        manifest = next((item for item in manifests if item['name'] == manifest_name), None)
+        validator = Manifest.get_validator(manifest['id']) if manifest else None
+        if not validator:
             api_response.code = EAPIResponseCode.not_found
             api_response.result = f'Manifest not found'
             _logger.error(api_response.result)
             return api_response.json_response()
 
-        attributes = db.session.query(DataAttributeModel).filter_by(manifest_id=manifest.id)
-        valid_attributes = []
-        for attr in attributes:
-            valid_attributes.append(attr.name)
-
         attributes = data.attributes or {}
-        for key, value in attributes.items():
-            if key not in valid_attributes:
-                api_response.code = EAPIResponseCode.bad_request
-                api_response.result = 'Invalid attribute'
-                _logger.error(api_response.result)
-                return api_response.json_response()
+        if validator.unknown_attributes(attributes):
+            api_response.code = EAPIResponseCode.bad_request
+            api_response.result = 'Invalid attribute'
+            _logger.error(api_response.result)
+            return api_response.json_response()
 
         valid, error_msg = check_attributes(attributes)
         if not valid:
@@ -532,7 +923,7 @@ class ValidateManifest:
             return api_response.json_response()
 
         # Check required attributes
-        valid, error_msg = has_valid_attributes(manifest.id, data.__dict__)
+        valid, error_msg = validator.validate(attributes, text_too_long='text to long')
         if not valid:
             api_response.result = error_msg
             api_response.code = EAPIResponseCode.bad_request
@@ -540,16 +931,3 @@ class ValidateManifest:
             return api_response.json_response()
         api_response.result = 'Success'
         return api_response.json_response()
-
-
-def get_container_id(query_params):
-    url = ConfigClass.NEO4J_SERVICE_V1 + f'nodes/Container/query'
-    payload = {**query_params}
-    with httpx.Client() as client:
-        result = client.post(url, json=payload)
-
-    if result.status_code != 200 or result.json() == []:
-        return None
-    result = result.json()[0]
-    container_id = result['id']
-    return container_id
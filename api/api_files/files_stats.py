@@ -1,17 +1,23 @@
+import asyncio
+
 from fastapi import APIRouter
 from fastapi_utils.cbv import cbv
 from logger import LoggerFactory
 
+from config import ConfigClass
 import models.files as files_models
-import models.project as project_models
 from models.base_models import APIResponse
 from models.base_models import EAPIResponseCode
+from resources.cache import TTLCache
 from resources.error_handler import catch_internal
 from resources.helpers import get_file_count_neo4j
 from resources.helpers import get_operation_logs_total
+from resources.project_resolver import project_resolver
 
 router = APIRouter()
 _API_NAMESPACE = "api_files_stats"
+# dashboards poll the statistics of every project, so identical queries are answered from memory for a short while
+_stats_cache = TTLCache(ConfigClass.FILES_STATS_CACHE_SIZE, ConfigClass.FILES_STATS_CACHE_TTL)
 
 
 @cbv(router)
@@ -22,7 +28,7 @@ class FilesStats:
     @router.get('/project/{project_geid}/files/statistics', response_model=files_models.FilesStatsGETResponse,
                 summary="FilesDailyStats Restful")
     @catch_internal(_API_NAMESPACE)
-    def get(self, project_geid, start_date, end_date, operator=None):
+    async def get(self, project_geid, start_date, end_date, operator=None):
         '''
         Get function to extract daily file statistics
         '''
@@ -31,32 +37,42 @@ class FilesStats:
             f"FilesDailyStats project_geid: {project_geid}")
         api_response = APIResponse()
         api_response.code = EAPIResponseCode.success
-        # get project
-        project_info = project_models.http_query_node({
-            "global_entity_id": project_geid
-        }).json()[0]
-        # get stats from auditlogs
-        stats_from_auditlogs = [get_operation_logs_total(
-            project_info['code'],
-            operation_type,
-            start_date,
-            end_date,
-            "file",
-            operator=operator
-        ) for operation_type in ["data_upload", "data_download", "data_transfer"]]
-        # get stats from neo4j count
-        stats_from_neo4j = [get_file_count_neo4j(
-            project_info['code'],
-            zone,
-            uploader=operator
-        ) for zone in ["Greenroom", "Core"]]
-        # return response
-        api_response.result = {
-            "uploaded": stats_from_auditlogs[0],
-            "downloaded": stats_from_auditlogs[1],
-            "approved": stats_from_auditlogs[2],
-            "greenroom": stats_from_neo4j[0],
-            "core": stats_from_neo4j[1],
+        cache_key = (project_geid, start_date, end_date, operator)
+        result = _stats_cache.get(cache_key)
+        if result is None:
+            result = await self.collect_stats(project_geid, start_date, end_date, operator)
+            _stats_cache.set(cache_key, result)
+        api_response.result = result
+        return api_response.json_response()
+
+    async def collect_stats(self, project_geid, start_date, end_date, operator):
+        '''
+        query the project node, its audit log totals and its file counts concurrently
+        '''
+        # the code is a key of the project, cached once resolved, the node itself is read fresh with the stats
+        project = await project_resolver.resolve(geid=project_geid)
+        # get stats from auditlogs and neo4j count
+        project_info, *stats = await asyncio.gather(
+            project_resolver.fetch(geid=project_geid),
+            *[get_operation_logs_total(
+                project['code'],
+                operation_type,
+                start_date,
+                end_date,
+                "file",
+                operator=operator
+            ) for operation_type in ["data_upload", "data_download", "data_transfer"]],
+            *[get_file_count_neo4j(
+                project['code'],
+                zone,
+                uploader=operator
+            ) for zone in ["Greenroom", "Core"]]
+        )
+        return {
+            "uploaded": stats[0],
+            "downloaded": stats[1],
+            "approved": stats[2],
+            "greenroom": stats[3],
+            "core": stats[4],
             "project_info": project_info
         }
-        return api_response.json_response()
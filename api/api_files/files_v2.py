@@ -1,10 +1,21 @@
+import csv
+import io
+import json
+
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 from fastapi_utils.cbv import cbv
+from logger import LoggerFactory
 from models import files as models
+from models.base_models import APIResponse
 from models.base_models import EAPIResponseCode
 from config import ConfigClass
+from resources.cursor import InvalidCursorError
+from resources.cursor import next_cursor
+from resources.cursor import page_offset
+from resources.http_client import get_client
+from resources.traversal import iter_subtree_pages
 import math
-import httpx
 
 router = APIRouter()
 @cbv(router)
@@ -13,7 +24,7 @@ class DatasetFileQueryV2:
     @router.post('/{project_geid}/query', response_model=models.DatasetFileQueryPOSTResponse,
                  summary="Query on files by dataset")
     # def post(self, dataset_id, data: models.DatasetFileQueryPOSTV2):
-    def post(self, project_geid, data: models.DatasetFileQueryPOSTV2):
+    async def post(self, project_geid, data: models.DatasetFileQueryPOSTV2):
         api_response = models.DatasetFileQueryPOSTResponse()
         page = data.page
         page_size = data.page_size
@@ -22,10 +33,16 @@ class DatasetFileQueryV2:
             api_response.code = EAPIResponseCode.bad_request
             api_response.error_msg = "Invalid order_type"
             return api_response.json_response()
+        try:
+            offset = page_offset(page, page_size, data.cursor, data.order_by, order_type)
+        except InvalidCursorError as e:
+            api_response.code = EAPIResponseCode.bad_request
+            api_response.error_msg = str(e)
+            return api_response.json_response()
         page_kwargs = {
             "order_by": "list_priority ASC,end_node." + data.order_by,
             "order_type": order_type,
-            "skip": page * page_size,
+            "skip": offset,
             "limit": page_size
         }
         query = data.query
@@ -35,26 +52,6 @@ class DatasetFileQueryV2:
             api_response.error_msg = "Missing required attribute labels"
             return api_response.json_response()
 
-        try:
-            query_params ={
-                "global_entity_id": project_geid
-            }
-            container_id = get_container_id(query_params)
-            with httpx.Client() as client:
-                response = client.get(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/Container/node/{container_id}")
-
-            if response.status_code != 200:
-                error_msg = response.json()
-                api_response.code = EAPIResponseCode.internal_error
-                api_response.error_msg = f"Neo4j error: {error_msg}"
-                return api_response.json_response()
-            dataset = response.json()[0]
-        except Exception as e:
-            api_response.code = EAPIResponseCode.internal_error
-            api_response.error_msg = "Neo4j error: " + str(e)
-            return api_response.json_response()
-
-
         for label in labels:
             if not "Folder" in label and not "TrashFile" in label:
                 if not query.get(label):
@@ -66,13 +63,12 @@ class DatasetFileQueryV2:
             "start_label": "Container",
             "end_labels": labels,
             "query": {
-                "start_params": {"code": dataset["code"]},
+                "start_params": {"global_entity_id": project_geid},
                 "end_params": query,
             },
         }
         try:
-            with httpx.Client() as client:
-                response = client.post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", json=relation_payload)
+            response = await get_client().post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", json=relation_payload)
 
             if response.status_code != 200:
                 error_msg = response.json()
@@ -88,7 +84,8 @@ class DatasetFileQueryV2:
         total = response.json()["total"]
         api_response.result = nodes["results"]
         api_response.total = total
-        api_response.page = page
+        api_response.page = offset // page_size
+        api_response.next_cursor = next_cursor(offset, nodes["results"], page_size, data.order_by, order_type, total)
         api_response.num_of_pages = math.ceil(total / page_size)
         return api_response.json_response()
 
@@ -96,7 +93,7 @@ class DatasetFileQueryV2:
 @cbv(router)
 class FolderFileQueryV2:
     @router.post('/folder/{folder_geid}/query', response_model=models.DatasetFileQueryPOSTResponse, summary="Query on files by dataset")
-    def post(self, folder_geid, data: models.DatasetFileQueryPOSTV2):
+    async def post(self, folder_geid, data: models.DatasetFileQueryPOSTV2):
         api_response = models.DatasetFileQueryPOSTResponse()
         page = data.page
         page_size = data.page_size
@@ -105,10 +102,16 @@ class FolderFileQueryV2:
             api_response.code = EAPIResponseCode.bad_request
             api_response.error_msg = "Invalid order_type"
             return api_response.json_response()
+        try:
+            offset = page_offset(page, page_size, data.cursor, data.order_by, order_type)
+        except InvalidCursorError as e:
+            api_response.code = EAPIResponseCode.bad_request
+            api_response.error_msg = str(e)
+            return api_response.json_response()
         page_kwargs = {
             "order_by": "list_priority ASC,end_node." + data.order_by,
             "order_type": order_type,
-            "skip": page * page_size,
+            "skip": offset,
             "limit": page_size
         }
         query = data.query
@@ -132,28 +135,98 @@ class FolderFileQueryV2:
                 "end_params": query,
             },
         }
-        with httpx.Client() as client:
-            response = client.post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", json=relation_payload)
+        response = await get_client().post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", json=relation_payload)
 
         nodes = response.json()
 
         total = response.json()["total"]
         api_response.result = nodes["results"]
         api_response.total = total
-        api_response.page = page
+        api_response.page = offset // page_size
+        api_response.next_cursor = next_cursor(offset, nodes["results"], page_size, data.order_by, order_type, total)
         api_response.num_of_pages = math.ceil(total / page_size)
         return api_response.json_response()
 
 
-def get_container_id(query_params):
-    url = ConfigClass.NEO4J_SERVICE_V1 + f"nodes/Container/query"
-    payload = {
-        **query_params
-    }
-    with httpx.Client() as client:
-        response = client.post(url, json=payload)
+EXPORT_CSV_FIELDS = [
+    "global_entity_id", "name", "display_path", "labels", "file_size", "uploader", "time_created", "time_lastmodified"
+]
+# global_entity_id of the last csv row when the export failed part way, its name column holds the error
+EXPORT_CSV_ERROR_MARKER = "#error"
+
+
+@cbv(router)
+class FileExportV2:
+    def __init__(self):
+        self._logger = LoggerFactory("api_files_export").get_logger()
+
+    @router.get('/{geid}/export', summary="Stream every file under a project or folder as ndjson or csv")
+    async def get(self, geid, source_type: str = "Folder", export_format: str = "ndjson", include_folders: bool = False):
+        """
+        Walk the project or folder subtree page by page and stream one row per file. The next page is requested while
+        the current one is being sent, so the response starts at once and memory does not grow with the tree. When a
+        later page fails the export ends with an {"error": ...} line (ndjson) or a row whose global_entity_id is
+        #error and whose name is the error (csv).
+        """
+        api_response = APIResponse()
+        start_label = {"Project": "Container", "Folder": "Folder"}.get(source_type)
+        if not start_label:
+            api_response.code = EAPIResponseCode.bad_request
+            api_response.error_msg = "Invalid source_type"
+            return api_response.json_response()
+        if export_format not in ["ndjson", "csv"]:
+            api_response.code = EAPIResponseCode.bad_request
+            api_response.error_msg = "Invalid export_format"
+            return api_response.json_response()
 
-    if response.status_code != 200 or response.json() == []:
-        return None
-    container = response.json()[0]
-    return str(container["id"])
+        pages = iter_subtree_pages(geid, start_label)
+        # fetch the first page up front so a failing query is still reported with an error status
+        try:
+            first_page = await pages.__anext__()
+        except Exception as e:
+            await pages.aclose()
+            api_response.code = EAPIResponseCode.internal_error
+            api_response.error_msg = "Neo4j error: " + str(e)
+            return api_response.json_response()
+
+        if export_format == "csv":
+            return StreamingResponse(
+                self.stream_rows(first_page, pages, export_format, include_folders),
+                media_type="text/csv",
+                headers={"Content-Disposition": f'attachment; filename="{geid}.csv"'},
+            )
+        return StreamingResponse(
+            self.stream_rows(first_page, pages, export_format, include_folders), media_type="application/x-ndjson"
+        )
+
+    async def stream_rows(self, page, pages, export_format, include_folders):
+        if export_format == "csv":
+            yield ",".join(EXPORT_CSV_FIELDS) + "\r\n"
+        try:
+            while True:
+                nodes = [node for node in page if include_folders or "File" in node["labels"]]
+                if nodes:
+                    yield self.format_rows(nodes, export_format)
+                page = await pages.__anext__()
+        except StopAsyncIteration:
+            pass
+        except Exception as e:
+            # headers are already sent, so the failure can only be reported in the body: a trailing error object
+            # or marker row tells the client the export is truncated
+            self._logger.error(f"file export stream aborted: {e}")
+            if export_format == "ndjson":
+                yield json.dumps({"error": str(e)}) + "\n"
+            else:
+                yield self.format_rows([{"global_entity_id": EXPORT_CSV_ERROR_MARKER, "name": str(e)}], export_format)
+        finally:
+            await pages.aclose()
+
+    @staticmethod
+    def format_rows(nodes, export_format):
+        if export_format == "ndjson":
+            return "".join(json.dumps(node, default=str) + "\n" for node in nodes)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS, extrasaction="ignore")
+        for node in nodes:
+            writer.writerow({**node, "labels": ";".join(node.get("labels", []))})
+        return buffer.getvalue()
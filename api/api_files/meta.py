@@ -1,12 +1,16 @@
+import asyncio
 import math
 import json
-import httpx
 from fastapi import APIRouter, Depends
 from fastapi_utils.cbv import cbv
-from models.meta import MetaGET, MetaGETResponse, get_parent_connections, GETFileDetail, POSTFileDetail, \
+from models.meta import MetaGET, MetaGETResponse, get_cached_parent_connections, GETFileDetail, POSTFileDetail, \
         POSTFileDetailResponse
 from models.base_models import EAPIResponseCode, APIResponse
 from config import ConfigClass
+from resources.cursor import InvalidCursorError
+from resources.cursor import next_cursor
+from resources.cursor import page_offset
+from resources.http_client import get_client
 from .utils import get_source_label, get_query_labels, convert_query
 
 router = APIRouter()
@@ -15,14 +19,13 @@ router = APIRouter()
 @cbv(router)
 class FileBulkDetail:
     @router.post('/bulk/detail', response_model=POSTFileDetailResponse, summary="Get files by geid")
-    def post(self, data: POSTFileDetail):
+    async def post(self, data: POSTFileDetail):
         api_response = APIResponse()
         if not data.geids:
             api_response.code = EAPIResponseCode.bad_request
             api_response.error_msg = "geids is required"
             return api_response.json_response()
-        with httpx.Client() as client:
-            response = client.post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/query/geids", json={"geids": data.geids})
+        response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/query/geids", json={"geids": data.geids})
         try:
             response.raise_for_status()
         except Exception as e:
@@ -36,10 +39,9 @@ class FileBulkDetail:
 @cbv(router)
 class FileDetail:
     @router.get('/detail/{file_geid}', response_model=GETFileDetail, summary="Get detail of single file by geid")
-    def get(self, file_geid):
+    async def get(self, file_geid):
         api_response = APIResponse()
-        with httpx.Client() as client:
-            response = client.get(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/geid/{file_geid}")
+        response = await get_client().get(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/geid/{file_geid}")
         try:
             response.raise_for_status()
         except Exception as e:
@@ -58,7 +60,7 @@ class FileDetail:
 @cbv(router)
 class FileMeta:
     @router.get('/meta/{geid}', response_model=MetaGETResponse, summary="Query on files by dataset or folder")
-    def get(self, geid, params: MetaGET = Depends(MetaGET)):
+    async def get(self, geid, params: MetaGET = Depends(MetaGET)):
         """
             Get and filter file meta from Neo4j given a Dataset or Folder geid
         """
@@ -70,10 +72,16 @@ class FileMeta:
             api_response.code = EAPIResponseCode.bad_request
             api_response.error_msg = "Invalid order_type"
             return api_response.json_response()
+        try:
+            offset = page_offset(page, page_size, params.cursor, params.order_by, order_type)
+        except InvalidCursorError as e:
+            api_response.code = EAPIResponseCode.bad_request
+            api_response.error_msg = str(e)
+            return api_response.json_response()
         page_kwargs = {
             "order_by": "list_priority ASC,end_node." + params.order_by,
             "order_type": order_type,
-            "skip": page * page_size,
+            "skip": offset,
             "limit": page_size
         }
         source_type = params.source_type
@@ -113,8 +121,11 @@ class FileMeta:
             },
         }
         try:
-            with httpx.Client() as client:
-                response = client.post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", json=relation_payload)
+            # the routing does not depend on the page, so it is fetched (or read from the cache) alongside the listing
+            response, routing = await asyncio.gather(
+                get_client().post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", json=relation_payload),
+                get_cached_parent_connections(geid),
+            )
             response.raise_for_status()
             if response.status_code != 200:
                 error_msg = response.json()
@@ -123,9 +134,6 @@ class FileMeta:
                 return api_response.json_response()
             nodes = response.json()
 
-            # get routing
-            routing = get_parent_connections(geid)
-
         except Exception as e:
             api_response.code = EAPIResponseCode.internal_error
             api_response.error_msg = "Neo4j error: " + str(e)
@@ -137,6 +145,7 @@ class FileMeta:
             "routing": routing
         }
         api_response.total = total
-        api_response.page = page
+        api_response.page = offset // page_size
+        api_response.next_cursor = next_cursor(offset, nodes["results"], page_size, params.order_by, order_type, total)
         api_response.num_of_pages = math.ceil(total / page_size)
         return api_response.json_response()
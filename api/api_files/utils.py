@@ -1,35 +1,9 @@
 import re
 import time
 
-import httpx
-from fastapi_sqlalchemy import db
-
 from config import ConfigClass
-from models.manifest_sql import DataAttributeModel
-
-
-def get_files_recursive(folder_geid, all_files=[]):
-    query = {
-        "start_label": "Folder",
-        "end_labels": ["File", "Folder"],
-        "query": {
-            "start_params": {
-                "global_entity_id": folder_geid,
-            },
-            "end_params": {
-                "archived": False
-            }
-        }
-    }
-    with httpx.Client() as client:
-        resp = client.post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", json=query)
-    for node in resp.json()["results"]:
-        if "File" in node["labels"]:
-            all_files.append(node)
-        else:
-            get_files_recursive(node["global_entity_id"], all_files=all_files)
-
-    return all_files
+from resources.es_outbox import enqueue_update
+from resources.http_client import get_client
 
 
 # TODO remove the label checking by get by geid
@@ -107,43 +81,39 @@ def convert_query(labels, query, partial, source_type):
     return neo4j_query
 
 
-def get_file_node_bygeid(geid):
+async def get_file_node_bygeid(geid):
     post_data = {"global_entity_id": geid}
-    with httpx.Client() as client:
-        response = client.post(
-            ConfigClass.NEO4J_SERVICE_V1 + f"nodes/File/query", json=post_data
-        )
+    response = await get_client().post(
+        ConfigClass.NEO4J_SERVICE_V1 + f"nodes/File/query", json=post_data
+    )
     if not response.json():
         return None
     return response.json()[0]
 
 
-def get_folder_node_bygeid(geid):
+async def get_folder_node_bygeid(geid):
     # no call for this function found
     post_data = {"global_entity_id": geid}
-    with httpx.Client() as client:
-        response = client.post(
-            ConfigClass.NEO4J_SERVICE_V1 + f"nodes/Folder/query", json=post_data
-        )
+    response = await get_client().post(
+        ConfigClass.NEO4J_SERVICE_V1 + f"nodes/Folder/query", json=post_data
+    )
     if not response.json():
         return None
     return response.json()[0]
 
 
-def get_trashfile_node_bygeid(geid):
+async def get_trashfile_node_bygeid(geid):
     # no call for this function found
     post_data = {"global_entity_id": geid}
-    with httpx.Client() as client:
-        response = client.post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/TrashFile/query", json=post_data)
+    response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/TrashFile/query", json=post_data)
     if not response.json():
         return None
     return response.json()[0]
 
 
-def get_file_node(full_path):
+async def get_file_node(full_path):
     post_data = {"full_path": full_path}
-    with httpx.Client() as client:
-        response = client.post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/File/query", json=post_data)
+    response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/File/query", json=post_data)
     if not response.json():
         return None
     return response.json()[0]
@@ -156,30 +126,6 @@ def is_greenroom(file_node):
         return True
 
 
-def has_valid_attributes(manifest_id, data):
-    attributes = db.session.query(DataAttributeModel).filter_by(manifest_id=manifest_id).order_by(DataAttributeModel.id.asc())
-    for attr in attributes:
-        if not attr.optional and not attr.name in data.get("attributes", {}):
-            return False, "Missing required attribute"
-        if attr.type.value == "multiple_choice":
-            value = data.get("attributes", {}).get(attr.name)
-            if value:
-                if not value in attr.value.split(","):
-                    return False, "Invalid choice field"
-            else:
-                if not attr.optional:
-                    return False, "Field required"
-        if attr.type.value == "text":
-            value = data.get("attributes", {}).get(attr.name)
-            if value:
-                if len(value) > 100:
-                    return False, "text to long"
-            else:
-                if not attr.optional:
-                    return False, "Field required"
-    return True, ""
-
-
 def check_attributes(attributes):
     # Apply name restrictions
     name_requirements = re.compile("^[a-zA-z0-9]{1,32}$")
@@ -189,43 +135,16 @@ def check_attributes(attributes):
     return True, ""
 
 
-def attach_attributes(manifest, attributes, file_node, _logger):
-    # no call for this function found
+async def attach_attributes(validator, attributes, file_node, _logger):
     post_data = {
-        "manifest_id": manifest['id'],
+        "manifest_id": validator.manifest_id,
     }
-
-    sql_attributes = manifest['attributes']
-
-    es_attributes = []
-
     for key in attributes:
-        value = attributes[key]
-        post_data["attr_" + key] = value
-
-        sql_attribute = [x for x in sql_attributes if x['name'] == key]
-        if len(sql_attribute) == 0:
-            continue
-        sql_attribute = sql_attribute[0]
-
-        if sql_attribute["type"] == 'multiple_choice':
-            attribute_value = []
-            attribute_value.append(value)
-
-            es_attributes.append({
-                "attribute_name": key,
-                "name": manifest['name'],
-                "value": attribute_value
-            })
-        else:
-            es_attributes.append({
-                "attribute_name": key,
-                "name": manifest['name'],
-                "value": value
-            })
+        post_data["attr_" + key] = attributes[key]
+    es_attributes = validator.es_attributes(attributes)
+
     file_id = file_node["id"]
-    with httpx.Client() as client:
-        response = client.put(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/File/node/{file_id}", json=post_data)
+    response = await get_client().put(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/File/node/{file_id}", json=post_data)
 
     if response.status_code != 200:
         _logger.error('Update Neo4j Node failed: {}'.format(response.text))
@@ -239,11 +158,10 @@ def attach_attributes(manifest, attributes, file_node, _logger):
             "time_lastmodified": time.time()
         }
     }
-    with httpx.Client() as client:
-        es_res = client.put(ConfigClass.PROVENANCE_SERVICE_V1 + 'entity/file', json=es_payload)
-
-    if es_res.status_code != 200:
-        _logger.error('Update Elastic Search Entity failed: {}'.format(es_res.text))
+    try:
+        await enqueue_update(es_payload)
+    except Exception as e:
+        _logger.error('Queue Elastic Search Entity update failed: {}'.format(e))
         return False
 
     return True
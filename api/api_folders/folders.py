@@ -3,16 +3,15 @@ import math
 import os
 import time
 
-import httpx
 from fastapi import APIRouter
 from fastapi_utils.cbv import cbv
 from logger import LoggerFactory
 
-from config import ConfigClass
 from models import folders as models
 from models.base_models import EAPIResponseCode
-from models.meta import get_parent_connections
 from resources.error_handler import catch_internal
+from resources.es_outbox import enqueue
+from resources.es_outbox import enqueue_create
 
 router = APIRouter()
 _API_NAMESPACE = 'api_folder_nodes'
@@ -25,7 +24,7 @@ class FolderNodes:
 
     @router.post('/folders/batch', response_model=models.FoldersPOSTResponse, summary='Batch Folder Nodes Restful')
     # @catch_internal(_API_NAMESPACE)
-    def batch_folder(self, request_payload: models.BatchFoldersPOST):
+    async def batch_folder(self, request_payload: models.BatchFoldersPOST):
         """Post function to btach create folder."""
         self._logger.info(f'folder payload: {request_payload.__dict__}')
         api_response = models.APIResponse()
@@ -36,6 +35,7 @@ class FolderNodes:
 
         nodes_data = []
         relations_data = []
+        es_docs = []
 
         for item in payload:
             item = dict(item)
@@ -71,9 +71,8 @@ class FolderNodes:
                 )
 
             if not request_payload.link_container and len(new_node['folder_relative_path']):
-                self._logger.info('create folder in elastic search')
-                try:
-                    es_body = {
+                es_docs.append(
+                    {
                         'global_entity_id': new_node['global_entity_id'],
                         'zone': namespace,
                         'data_type': 'Folder',
@@ -93,41 +92,46 @@ class FolderNodes:
                         'project_code': new_node['project_code'],
                         'priority': 10,
                     }
-                    with httpx.Client() as client:
-                        es_res = client.post(ConfigClass.PROVENANCE_SERVICE_V1 + 'entity/file', json=es_body)
-                    self._logger.info(es_body)
-                    self._logger.info(es_res.text)
-                    if es_res.status_code != 200:
-                        self._logger.error(f'Error while creating folder node in elastic search : {es_res.text}')
-                        api_response.code = EAPIResponseCode.internal_error
-                        api_response.result = 'Error while creating folder node in elastic search'
-                        return api_response.json_response()
-                except Exception as e:
-                    self._logger.error('Error while call elastic search' + str(e))
-                    api_response.code = EAPIResponseCode.internal_error
-                    api_response.result = 'Error while call elastic search' + str(e)
-                    return api_response.json_response()
-
-        result_create_node = models.http_bulk_post_node(nodes_data, extra_labels)
+                )
 
-        if result_create_node.status_code == 200:
-            if relations_data:
-                result_link_projects = models.bulk_link_project(['start', 'end'], 'Container', 'Folder', relations_data)
-                if result_link_projects.status_code == 200:
-                    api_response.code = EAPIResponseCode.success
-                    api_response.result = {'result': 'success'}
-                else:
-                    api_response.code = EAPIResponseCode.internal_error
-                    api_response.result = {'result': 'failed to link projects with folders'}
-        else:
+        result_create_node = await models.http_bulk_post_node(nodes_data, extra_labels)
+        if result_create_node.status_code != 200:
             api_response.code = EAPIResponseCode.internal_error
             api_response.result = {'result': 'failed to create folders'}
+            return api_response.json_response()
+
+        if relations_data:
+            try:
+                await models.bulk_link_project(['start', 'end'], 'Container', 'Folder', relations_data)
+            except Exception as e:
+                self._logger.error('Error while linking projects with folders ' + str(e))
+                api_response.code = EAPIResponseCode.internal_error
+                api_response.error_msg = str(e)
+                api_response.result = {'result': 'failed to link projects with folders'}
+                return api_response.json_response()
+        api_response.code = EAPIResponseCode.success
+        api_response.result = {'result': 'success'}
+
+        # folders are indexed only once their nodes exist, in a single outbox insert which is all or nothing: when it
+        # fails the folders exist in neo4j but none of them is queued for elastic search
+        if es_docs:
+            self._logger.info(f'create {len(es_docs)} folders in elastic search')
+            try:
+                await enqueue('POST', es_docs)
+            except Exception as e:
+                self._logger.error('Error while queueing elastic search folders ' + str(e))
+                api_response.code = EAPIResponseCode.internal_error
+                api_response.error_msg = f'Elastic Search outbox error: {e}'
+                api_response.result = {
+                    'result': 'folders created but none of them was queued for elastic search',
+                    'not_indexed': [doc['global_entity_id'] for doc in es_docs],
+                }
 
         return api_response.json_response()
 
     @router.post('/folders', response_model=models.FoldersPOSTResponse, summary='Folder Nodes Restful')
     @catch_internal(_API_NAMESPACE)
-    def post(self, request_payload: models.FoldersPOST):
+    async def post(self, request_payload: models.FoldersPOST):
         """Post function to create entity."""
         self._logger.info(f'folder payload: {request_payload.__dict__}')
         api_response = models.APIResponse()
@@ -149,6 +153,7 @@ class FolderNodes:
         }
 
         # name folder do not need to be stored in es
+        es_body = None
         if len(request_payload.folder_relative_path):
             es_body = {
                 'global_entity_id': request_payload.global_entity_id,
@@ -170,28 +175,31 @@ class FolderNodes:
                 'project_code': request_payload.project_code,
                 'priority': 10,
             }
-            with httpx.Client() as client:
-                es_res = client.post(ConfigClass.PROVENANCE_SERVICE_V1 + 'entity/file', json=es_body)
-            if es_res.status_code != 200:
-                self._logger.error(f'Error while creating folder node in elastic search : {es_res.text}')
-                api_response.code = EAPIResponseCode.internal_error
-                api_response.result = 'Error while creating folder node in elastic search'
-                return api_response.json_response()
 
         is_trashbin_root = request_payload.extra_attrs.get('is_trashbin_root')
         for k, v in request_payload.extra_attrs.items():
             new_node[k] = v
         self._logger.info(f' neo4j folder creation payload:  {new_node}')
-        result_create_node = models.http_post_node(new_node, request_payload.global_entity_id)
+        result_create_node = await models.http_post_node(new_node, request_payload.global_entity_id)
         if result_create_node.status_code == 200:
             node_created = result_create_node.json()[0]
             # if not root node folder
             if request_payload.folder_relative_path and request_payload.folder_parent_geid and not is_trashbin_root:
-                models.link_folder_parent(
-                    namespace, request_payload.folder_parent_geid, node_created['global_entity_id']
-                )
+                await models.link_folder_parent(namespace, request_payload.folder_parent_geid, node_created)
             else:
-                models.link_project(namespace, request_payload.project_code, node_created['global_entity_id'])
+                await models.link_project(namespace, request_payload.project_code, node_created)
+            # the subfolders of an uploaded tree are created next, under this one
+            models.cache_folder_node(node_created)
+            # queued once the node and its link exist, so a failed create is never indexed
+            if es_body:
+                try:
+                    await enqueue_create(es_body)
+                except Exception as e:
+                    self._logger.error(f'Error while queueing folder node for elastic search : {e}')
+                    api_response.code = EAPIResponseCode.internal_error
+                    api_response.error_msg = f'Elastic Search outbox error: {e}'
+                    api_response.result = node_created
+                    return api_response.json_response()
             api_response.code = EAPIResponseCode.success
             api_response.result = node_created
             return api_response.json_response()
@@ -200,7 +208,7 @@ class FolderNodes:
 
     @router.get('/folders', response_model=models.FoldersQueryResponse, summary='Folder Nodes Restful')
     @catch_internal(_API_NAMESPACE)
-    def query(self, zone, project_code, folder_relative_path=None, uploader=None):
+    async def query(self, zone, project_code, folder_relative_path=None, uploader=None):
         """Get function to query the entity by condition."""
         api_response = models.APIResponse()
         if not zone in ['core', 'greenroom']:
@@ -213,7 +221,7 @@ class FolderNodes:
             query_payload['folder_relative_path'] = folder_relative_path
         if uploader:
             query_payload['uploader'] = uploader
-        query_respon = models.http_query_node(namespace, query_payload)
+        query_respon = await models.http_query_node(namespace, query_payload)
         if query_respon.status_code == 200:
             api_response.code = EAPIResponseCode.success
             api_response.result = query_respon.json()
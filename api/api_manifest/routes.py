@@ -1,7 +1,7 @@
 import re
 
-import httpx
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
 from fastapi_sqlalchemy import db
 from fastapi_utils.cbv import cbv
 from logger import LoggerFactory
@@ -10,12 +10,11 @@ from config import ConfigClass
 from models import manifest
 from models.base_models import APIResponse
 from models.base_models import EAPIResponseCode
-from models.manifest_sql import DataAttributeModel
 from models.manifest_sql import DataManifestModel
+from resources.http_client import get_client
 from .service import Manifest
 from .utils import check_attributes
-from .utils import get_file_node_bygeid
-from .utils import get_trashfile_node_bygeid
+from .utils import get_file_nodes_bygeids
 
 manifest_router = APIRouter()
 _logger = LoggerFactory('api_manifest').get_logger()
@@ -60,6 +59,7 @@ class RestfulManifests:
         db.session.add(manifest)
         db.session.commit()
         db.session.refresh(manifest)
+        Manifest.invalidate(project_codes=[manifest.project_code])
 
         api_response.result = manifest.to_dict()
         return api_response.json_response()
@@ -100,6 +100,7 @@ class RestfulManifest:
                 my_res.result = "Invalid type"
                 _logger.error(my_res.result)
                 return my_res.json_response()
+        old_project_code = manifest.project_code
         update_fields = ["name", "project_code"]
         for field in update_fields:
             if hasattr(data, field):
@@ -107,13 +108,14 @@ class RestfulManifest:
         db.session.add(manifest)
         db.session.commit()
         db.session.refresh(manifest)
+        Manifest.invalidate(manifest_ids=[manifest.id], project_codes=[old_project_code, manifest.project_code])
         my_res.result = manifest.to_dict()
         return my_res.json_response()
 
     @manifest_router.delete('/manifest/{manifest_id}', response_model=manifest.DELETEManifestResponse, summary="delete a single manifest")
-    def delete(self, manifest_id):
+    async def delete(self, manifest_id):
         my_res = APIResponse()
-        manifest = db.session.query(DataManifestModel).get(manifest_id)
+        manifest = await run_in_threadpool(Manifest.get_by_id, manifest_id)
         if not manifest:
             my_res.code = EAPIResponseCode.not_found
             my_res.error_msg = 'Manifest not found'
@@ -121,22 +123,16 @@ class RestfulManifest:
             return my_res.json_response()
 
         # check if connect to any files
-        with httpx.Client() as client:
-            response = client.post(
-                ConfigClass.NEO4J_SERVICE_V1 + "nodes/File/query/count", json={"manifest_id": int(manifest_id)}
-            )
+        response = await get_client().post(
+            ConfigClass.NEO4J_SERVICE_V1 + "nodes/File/query/count", json={"manifest_id": int(manifest_id)}
+        )
         if response.json()["count"] > 0:
             my_res.code = EAPIResponseCode.forbidden
             my_res.result = "Can't delete manifest attached to files"
             _logger.error(my_res.result)
             return my_res.json_response()
 
-        attributes = db.session.query(DataAttributeModel).filter_by(manifest_id=manifest.id)
-        for atr in attributes:
-            db.session.delete(atr)
-        db.session.commit()
-        db.session.delete(manifest)
-        db.session.commit()
+        await run_in_threadpool(Manifest.delete, manifest_id)
         my_res.result = "success"
         return my_res.json_response()
 
@@ -144,33 +140,25 @@ class RestfulManifest:
 @cbv(manifest_router)
 class ImportManifest:
     @manifest_router.post('/manifest/file/import', response_model=manifest.POSTImportResponse, summary="Import a data manifest")
-    def post(self, data: manifest.POSTImportRequest):
+    async def post(self, data: manifest.POSTImportRequest):
         api_response = APIResponse()
         # limit check
-        manifests = db.session.query(DataManifestModel).filter_by(project_code=data.project_code)
-        if manifests.count() > 9:
+        manifests = await run_in_threadpool(Manifest.get_by_project_name, data.project_code)
+        if len(manifests) > 9:
             api_response.code = EAPIResponseCode.forbidden
             api_response.result = "Manifest limit reached"
             _logger.error(api_response.result)
             return api_response.json_response()
 
-        for manifest in manifests:
-            result = manifest.to_dict()
+        for result in manifests:
             if data.name == result["name"]:
                 api_response.code = EAPIResponseCode.bad_request
                 api_response.result = "duplicate manifest name"
                 _logger.error(api_response.result)
                 return api_response.json_response()
 
-        manifest_data = {
-            "name": data.name,
-            "project_code": data.project_code
-        }
         # Create manifest in psql
-        manifest = DataManifestModel(**manifest_data)
-        db.session.add(manifest)
-        db.session.commit()
-        db.session.refresh(manifest)
+        manifest = await run_in_threadpool(Manifest.create, data.name, data.project_code)
 
         attributes = data.attributes
         attr_data = {}
@@ -206,7 +194,7 @@ class ImportManifest:
         # required attrbiute check
         for attribute in attributes:
             attr_data = {
-                "manifest_id": manifest.id,
+                "manifest_id": manifest["id"],
                 "project_code": data.project_code,
             }
             for field in required_fields:
@@ -218,10 +206,9 @@ class ImportManifest:
                 attr_data[field] = attribute[field]
             # check if connect to any files
             if not attr_data["optional"]:
-                with httpx.Client() as client:
-                    response = client.post(
-                        ConfigClass.NEO4J_SERVICE_V1 + "nodes/File/query/count", json={"manifest_id": manifest.id}
-                    )
+                response = await get_client().post(
+                    ConfigClass.NEO4J_SERVICE_V1 + "nodes/File/query/count", json={"manifest_id": manifest["id"]}
+                )
                 if response.json()["count"] > 0:
                     api_response.code = EAPIResponseCode.forbidden
                     api_response.result = "Can't add required attributes to manifest attached to files"
@@ -230,11 +217,7 @@ class ImportManifest:
             attr_list.append(attr_data)
 
         # Create create attributes in psql
-        for attr in attr_list:
-            attribute = DataAttributeModel(**attr)
-            db.session.add(attribute)
-            db.session.commit()
-            db.session.refresh(attribute)
+        await run_in_threadpool(Manifest.create_attributes, attr_list)
         api_response.result = "Success"
         return api_response.json_response()
 
@@ -247,48 +230,54 @@ class ExportManifest:
         response_data = {
             "attributes": []
         }
-        manifest = db.session.query(DataManifestModel).get(manifest_id)
-        attributes = db.session.query(DataAttributeModel).filter_by(manifest_id=manifest.id). \
-            order_by(DataAttributeModel.id.asc())
-        for attribute in attributes:
+        manifest = Manifest.get_by_id(manifest_id)
+        if not manifest:
+            api_response.code = EAPIResponseCode.not_found
+            api_response.error_msg = 'Manifest not found'
+            _logger.error(api_response.error_msg)
+            return api_response.json_response()
+        for attribute in manifest["attributes"]:
             response_data["attributes"].append({
-                "name": attribute.name,
-                "type": attribute.type.value,
-                "value": attribute.value,
-                "optional": attribute.optional,
+                "name": attribute["name"],
+                "type": attribute["type"],
+                "value": attribute["value"],
+                "optional": attribute["optional"],
             })
-        response_data["name"] = manifest.name
-        response_data["project_code"] = manifest.project_code
+        response_data["name"] = manifest["name"]
+        response_data["project_code"] = manifest["project_code"]
         return response_data
 
 
 @cbv(manifest_router)
 class FileManifestQuery:
     @manifest_router.post('/manifest/query', response_model=manifest.POSTQueryResponse, summary="Query file manifests")
-    def post(self, data: manifest.POSTQueryRequest):
+    async def post(self, data: manifest.POSTQueryRequest):
         api_response = APIResponse()
         geid_list = data.geid_list
         lineage_view = data.lineage_view
 
+        file_nodes = await get_file_nodes_bygeids(list(set(geid_list))) if geid_list else {}
+        manifest_ids = {node["manifest_id"] for node in file_nodes.values() if node.get("manifest_id")}
+        manifests = await run_in_threadpool(Manifest.get_by_ids, manifest_ids) if manifest_ids else {}
+
         results = {}
         for geid in geid_list:
-            file_node = get_file_node_bygeid(geid)
-            if not file_node:
-                file_node = get_trashfile_node_bygeid(geid)
-
+            file_node = file_nodes.get(geid)
+            manifest = None
             if file_node and file_node.get("manifest_id"):
+                manifest = manifests.get(int(file_node["manifest_id"]))
+
+            if manifest:
                 attributes = []
                 manifest_id = file_node["manifest_id"]
-                manifest = db.session.query(DataManifestModel).get(manifest_id)
-                sql_attributes = db.session.query(DataAttributeModel).filter_by(manifest_id=manifest_id)
-                for sql_attribute in sql_attributes:
+                for sql_attribute in manifest["attributes"]:
                     attributes.append({
-                        "id": sql_attribute.id,
-                        "name": sql_attribute.name,
-                        "manifest_name": manifest.name,
-                        "value": file_node.get("attr_" + sql_attribute.name, ""),
-                        "type": sql_attribute.type.value,
-                        "optional": sql_attribute.optional,
+                        "id": sql_attribute["id"],
+                        "name": sql_attribute["name"],
+                        "manifest_name": manifest["name"],
+                        "value": file_node.get("attr_" + sql_attribute["name"], ""),
+                        "type": sql_attribute["type"],
+                        "optional": sql_attribute["optional"],
                         "manifest_id": manifest_id,
                     })
                 results[geid] = attributes
@@ -1,33 +1,187 @@
+import copy
+
 from fastapi_sqlalchemy import db
+from logger import LoggerFactory
+from sqlalchemy.orm import selectinload
+
+from config import ConfigClass
 from models.manifest_sql import DataManifestModel , DataAttributeModel
+from resources.cache import TTLCache
+from resources.pg_notify import publish
+from .validator import ManifestValidator
+
+_logger = LoggerFactory('manifest_service').get_logger()
+
 
 class Manifest:
+    """Read and write data manifests with their ordered attributes.
+
+    Reads are served from per worker caches keyed by manifest id and by project code, and each manifest is cached next
+    to its compiled ManifestValidator. Every write evicts the affected entries and publishes them on
+    MANIFEST_NOTIFY_CHANNEL so the other workers evict them as well.
+    """
+
+    by_id_cache = TTLCache(ConfigClass.MANIFEST_CACHE_SIZE, ConfigClass.MANIFEST_CACHE_TTL)
+    by_project_cache = TTLCache(ConfigClass.MANIFEST_CACHE_SIZE, ConfigClass.MANIFEST_CACHE_TTL)
+    # bumped on every eviction so a load that started before it does not store a stale manifest
+    generation = 0
 
     @classmethod
     def get_by_project_name(cls, project_code):
-        manifests = db.session.query(DataManifestModel).filter_by(project_code=project_code)
-        results = []
-        for manifest in manifests:
-            result = manifest.to_dict()
-            result["attributes"] = []
-            attributes = db.session.query(DataAttributeModel).filter_by(
-                manifest_id=manifest.id
-            ).order_by(DataAttributeModel.id.asc())
-            for atr in attributes:
-                result["attributes"].append(atr.to_dict())
-            results.append(result)
-        return results
+        results = cls.by_project_cache.get(project_code)
+        if results is None:
+            generation = cls.generation
+            results = cls._load_by_project_name(project_code)
+            if generation == cls.generation:
+                cls.by_project_cache.set(project_code, results)
+        return copy.deepcopy(results)
 
     @classmethod
     def get_by_id(cls, id):
-        manifest = db.session.query(DataManifestModel).get(id)
+        entry = cls._get_entry(id)
+        if entry is None:
+            return None
+        return copy.deepcopy(entry[0])
+
+    @classmethod
+    def get_with_validator(cls, id):
+        '''
+        return a manifest with the validator compiled from the same version, or (None, None) when it does not exist
+        '''
+        entry = cls._get_entry(id)
+        if entry is None:
+            return None, None
+        return copy.deepcopy(entry[0]), entry[1]
+
+    @classmethod
+    def get_validator(cls, id):
+        entry = cls._get_entry(id)
+        return entry[1] if entry else None
+
+    @classmethod
+    def get_by_ids(cls, ids):
+        '''
+        return the manifests keyed by id, loading the ones not cached with a single query
+        '''
+        results = {}
+        missing = []
+        for manifest_id in {int(i) for i in ids}:
+            entry = cls.by_id_cache.get(manifest_id)
+            if entry is None:
+                missing.append(manifest_id)
+            else:
+                results[manifest_id] = entry[0]
+        if missing:
+            generation = cls.generation
+            manifests = db.session.query(DataManifestModel).options(
+                selectinload(DataManifestModel.attributes)
+            ).filter(DataManifestModel.id.in_(missing))
+            for manifest in manifests:
+                results[manifest.id] = cls._cache_entry(cls._to_dict(manifest), generation)[0]
+        return copy.deepcopy(results)
+
+    @classmethod
+    def _get_entry(cls, id):
+        entry = cls.by_id_cache.get(int(id))
+        if entry is None:
+            generation = cls.generation
+            result = cls._load_by_id(id)
+            if result is None:
+                return None
+            entry = cls._cache_entry(result, generation)
+        return entry
+
+    @classmethod
+    def _cache_entry(cls, result, generation):
+        # the validator is compiled from the same manifest dict so both are evicted and reloaded together
+        entry = (result, ManifestValidator(result))
+        if generation == cls.generation:
+            cls.by_id_cache.set(result["id"], entry)
+        return entry
+
+    @classmethod
+    def _load_by_project_name(cls, project_code):
+        manifests = db.session.query(DataManifestModel).options(
+            selectinload(DataManifestModel.attributes)
+        ).filter_by(project_code=project_code).order_by(DataManifestModel.id.asc())
+        return [cls._to_dict(manifest) for manifest in manifests]
+
+    @classmethod
+    def _load_by_id(cls, id):
+        manifest = db.session.query(DataManifestModel).options(
+            selectinload(DataManifestModel.attributes)
+        ).filter_by(id=id).first()
         if manifest:
-            result = manifest.to_dict()
-            result["attributes"] = []
-            attributes = db.session.query(DataAttributeModel).filter_by(
-                manifest_id=id
-            ).order_by(DataAttributeModel.id.asc())
-            for atr in attributes:
-                result["attributes"].append(atr.to_dict())
-            return result
-        return None
\ No newline at end of file
+            return cls._to_dict(manifest)
+        return None
+
+    @staticmethod
+    def _to_dict(manifest):
+        result = manifest.to_dict()
+        result["attributes"] = [atr.to_dict() for atr in manifest.attributes]
+        return result
+
+    @classmethod
+    def create(cls, name, project_code):
+        manifest = DataManifestModel(name=name, project_code=project_code)
+        db.session.add(manifest)
+        db.session.commit()
+        db.session.refresh(manifest)
+        cls.invalidate(project_codes=[project_code])
+        return manifest.to_dict()
+
+    @classmethod
+    def create_attributes(cls, attr_list):
+        for attr in attr_list:
+            attribute = DataAttributeModel(**attr)
+            db.session.add(attribute)
+            db.session.commit()
+            db.session.refresh(attribute)
+        cls.invalidate(
+            manifest_ids=[attr["manifest_id"] for attr in attr_list],
+            project_codes=[attr["project_code"] for attr in attr_list],
+        )
+
+    @classmethod
+    def delete(cls, id):
+        manifest = db.session.query(DataManifestModel).get(id)
+        attributes = db.session.query(DataAttributeModel).filter_by(manifest_id=manifest.id)
+        for atr in attributes:
+            db.session.delete(atr)
+        db.session.commit()
+        db.session.delete(manifest)
+        db.session.commit()
+        cls.invalidate(manifest_ids=[manifest.id], project_codes=[manifest.project_code])
+
+    @classmethod
+    def invalidate(cls, manifest_ids=(), project_codes=()):
+        '''
+        evict manifests from this worker's caches and notify the other workers. Call it after the write is committed.
+        '''
+        payload = {
+            "manifest_ids": sorted({int(i) for i in manifest_ids if i is not None}),
+            "project_codes": sorted({code for code in project_codes if code}),
+        }
+        cls.evict(payload)
+        try:
+            publish(db.session, ConfigClass.MANIFEST_NOTIFY_CHANNEL, payload)
+        except Exception as e:
+            _logger.error(f'failed to publish manifest invalidation {payload}: {e}')
+
+    @classmethod
+    def evict(cls, payload):
+        '''
+        evict the manifests listed in an invalidation payload, or everything when the payload is None
+        '''
+        cls.generation += 1
+        if payload is None:
+            cls.by_id_cache.clear()
+            cls.by_project_cache.clear()
+            return
+        for manifest_id in payload.get("manifest_ids", []):
+            cached = cls.by_id_cache.get(manifest_id)
+            if cached:
+                cls.by_project_cache.pop(cached[0]["project_code"])
+            cls.by_id_cache.pop(manifest_id)
+        for project_code in payload.get("project_codes", []):
+            cls.by_project_cache.pop(project_code)
@@ -1,42 +1,47 @@
-import httpx
 from config import ConfigClass
-from models.manifest_sql import DataManifestModel , DataAttributeModel, TypeEnum
-from fastapi_sqlalchemy import db
+from resources.http_client import get_client
 import re
 
 
-def get_file_node_bygeid(geid):
+async def get_file_node_bygeid(geid):
     post_data = {"global_entity_id": geid}
-    with httpx.Client() as client:
-        response = client.post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/File/query", json=post_data)
+    response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/File/query", json=post_data)
     if not response.json():
         return None
     return response.json()[0]
 
 
-def get_folder_node_bygeid(geid):
+async def get_folder_node_bygeid(geid):
     # imported but not used
     post_data = {"global_entity_id": geid}
-    with httpx.Client() as client:
-        response = client.post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/Folder/query", json=post_data)
+    response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/Folder/query", json=post_data)
     if not response.json():
         return None
     return response.json()[0]
 
 
-def get_trashfile_node_bygeid(geid):
+async def get_trashfile_node_bygeid(geid):
     post_data = {"global_entity_id": geid}
-    with httpx.Client() as client:
-        response = client.post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/TrashFile/query", json=post_data)
+    response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/TrashFile/query", json=post_data)
     if not response.json():
         return None
     return response.json()[0]
 
 
-def get_file_node(full_path):
+async def get_file_nodes_bygeids(geids):
+    """Resolve a list of geids to their File or TrashFile nodes with one bulk query, keyed by geid."""
+    response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + "nodes/query/geids", json={"geids": geids})
+    response.raise_for_status()
+    nodes = {}
+    for node in response.json()["result"]:
+        if "File" in node["labels"] or ("TrashFile" in node["labels"] and node["global_entity_id"] not in nodes):
+            nodes[node["global_entity_id"]] = node
+    return nodes
+
+
+async def get_file_node(full_path):
     post_data = {"full_path": full_path}
-    with httpx.Client() as client:
-        response = client.post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/File/query", json=post_data)
+    response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/File/query", json=post_data)
     if not response.json():
         return None
     return response.json()[0]
@@ -47,29 +52,6 @@ def is_greenroom(file_node):
     else:
         return True
 
-def has_valid_attributes(manifest_id, data):
-    attributes = db.session.query(DataAttributeModel).filter_by(manifest_id=manifest_id).order_by(DataAttributeModel.id.asc())
-    for attr in attributes:
-        if not attr.optional and not attr.name in data.get("attributes", {}):
-            return False, "Missing required attribute"
-        if attr.type.value == "multiple_choice":
-            value = data.get("attributes", {}).get(attr.name)
-            if value:
-                if not value in attr.value.split(","):
-                    return False, "Invalid choice field"
-            else:
-                if not attr.optional:
-                    return False, "Field required"
-        if attr.type.value == "text":
-            value = data.get("attributes", {}).get(attr.name)
-            if value:
-                if len(value) > 100:
-                    return False, "text to long"
-            else:
-                if not attr.optional:
-                    return False, "Field required"
-    return True, ""
-
 def check_attributes(attributes):
     # Apply name restrictions
     name_requirements = re.compile("^[a-zA-z0-9]{1,32}$")
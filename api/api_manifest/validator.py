@@ -0,0 +1,104 @@
+from typing import Tuple
+
+TEXT_MAX_LENGTH = 100
+
+
+class ManifestValidator:
+    """Attribute rules of one manifest version, compiled once so payloads are checked with set and dict lookups.
+
+    Instances are immutable and cached next to the manifest in ``Manifest``; build one per manifest dict, never per
+    request.
+    """
+
+    def __init__(self, manifest: dict):
+        self.manifest_id = manifest["id"]
+        self.manifest_name = manifest["name"]
+        # (name, type, optional, choices) in attribute id order, so the first failing rule is stable
+        self.rules = tuple(
+            (
+                attr["name"],
+                attr["type"],
+                attr["optional"],
+                frozenset((attr["value"] or "").split(",")) if attr["type"] == "multiple_choice" else None,
+            )
+            for attr in manifest["attributes"]
+        )
+        self.names = frozenset(attr["name"] for attr in manifest["attributes"])
+        self.types = {attr["name"]: attr["type"] for attr in manifest["attributes"]}
+
+    def unknown_attributes(self, received: dict) -> list:
+        return [name for name in received if name not in self.names]
+
+    @staticmethod
+    def is_choice(value, choices) -> bool:
+        # received values are not always strings and unhashable ones can not be looked up in the frozenset
+        return isinstance(value, str) and value in choices
+
+    def validate(self, received: dict, text_too_long: str = "text too long") -> Tuple[bool, str]:
+        '''
+        check the received values when attaching a manifest, returns (valid, error message). Attributes missing from
+        the manifest are not checked here.
+        '''
+        # one attribute at a time so the first error reported is the one of the first failing attribute
+        for name, attr_type, optional, choices in self.rules:
+            if not optional and name not in received:
+                return False, "Missing required attribute"
+            if attr_type not in ("multiple_choice", "text"):
+                continue
+            value = received.get(name)
+            if not value:
+                if not optional:
+                    return False, "Field required"
+                continue
+            if attr_type == "multiple_choice":
+                if not self.is_choice(value, choices):
+                    return False, "Invalid choice field"
+            elif len(value) > TEXT_MAX_LENGTH:
+                return False, text_too_long
+        return True, ""
+
+    def validate_update(self, received: dict) -> Tuple[bool, str]:
+        '''
+        check the received values when updating the attributes of a file, returns (valid, error message). Empty
+        required text values are accepted and unknown attributes are only reported once every rule passed.
+        '''
+        for name, attr_type, optional, choices in self.rules:
+            if not optional and name not in received:
+                return False, "Missing required attribute"
+            value = received.get(name)
+            if attr_type == "multiple_choice":
+                if not self.is_choice(value, choices) and (value or not optional):
+                    return False, "Invalid attribute value"
+            elif attr_type == "text":
+                if value and len(value) > TEXT_MAX_LENGTH:
+                    return False, "text to long"
+        if self.unknown_attributes(received):
+            return False, "Not a valid attribute"
+        return True, ""
+
+    def es_attributes(self, received: dict) -> list:
+        '''
+        format the received values of the manifest attributes for the elastic search entity
+        '''
+        return [
+            self.es_attribute(name, value) for name, value in received.items() if name in self.types
+        ]
+
+    def update_es_attributes(self, received: dict) -> list:
+        '''
+        format the values of a file attributes update for the elastic search entity, in attribute id order and
+        without the empty optional choices and empty texts
+        '''
+        es_attributes = []
+        for name, attr_type, optional, choices in self.rules:
+            value = received.get(name)
+            if attr_type == "multiple_choice" and self.is_choice(value, choices) or attr_type == "text" and value:
+                es_attributes.append(self.es_attribute(name, value))
+        return es_attributes
+
+    def es_attribute(self, name: str, value) -> dict:
+        return {
+            "attribute_name": name,
+            "name": self.manifest_name,
+            "value": [value] if self.types[name] == "multiple_choice" else value,
+        }
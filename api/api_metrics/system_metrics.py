@@ -1,6 +1,7 @@
 from typing import Optional
 
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
 from fastapi_sqlalchemy import db
 from fastapi_utils.cbv import cbv
 from logger import LoggerFactory
@@ -8,9 +9,11 @@ from sqlalchemy import cast
 from sqlalchemy import Date
 from sqlalchemy import func
 
+from models.base_models import APIResponse
 from models.base_models import EAPIResponseCode
 from models.metrics import StatsResponse
 from models.metrics_sql import SystemMetrics
+from resources.es_outbox import es_outbox_dispatcher
 
 router = APIRouter()
 _API_NAMESPACE = "stats_restful"
@@ -22,6 +25,17 @@ class SystemStats:
     def __init__(self):
         self._logger = LoggerFactory(_API_NAMESPACE).get_logger()
 
+    @staticmethod
+    def _query_metrics(date: Optional[str] = None):
+        columns = (SystemMetrics.active_user, SystemMetrics.project, SystemMetrics.storage, SystemMetrics.vm,
+                   SystemMetrics.cores, SystemMetrics.ram, func.to_char(SystemMetrics.date, 'YYYY-MM-DD'))
+        # if date query parameter not provided, query the most recent date
+        if date is None:
+            return db.session.query(*columns).order_by(SystemMetrics.date.desc()).first()
+
+        # if date provided with parameter, query selected date
+        return db.session.query(*columns).filter(cast(SystemMetrics.date, Date) == date).first()
+
     @router.get("/stats",
                 response_model=StatsResponse,
                 summary="Retrieve System Stats/Metrics")
@@ -34,17 +48,7 @@ class SystemStats:
         api_response = StatsResponse()
 
         try:
-            # if date query parameter not provided, query the most recent date
-            if date is None:
-                response_query = db.session.query(SystemMetrics.active_user,SystemMetrics.project, SystemMetrics.storage,
-                    SystemMetrics.vm, SystemMetrics.cores,SystemMetrics.ram, func.to_char(SystemMetrics.date, 'YYYY-MM-DD')). \
-                    order_by(SystemMetrics.date.desc()).first()
-
-            # if date provided with parameter, query selected date
-            else:
-                response_query = db.session.query(SystemMetrics.active_user, SystemMetrics.project, SystemMetrics.storage,
-                    SystemMetrics.vm, SystemMetrics.cores, SystemMetrics.ram, func.to_char(SystemMetrics.date, 'YYYY-MM-DD')). \
-                    filter(cast(SystemMetrics.date, Date) == date).first()
+            response_query = await run_in_threadpool(self._query_metrics, date)
 
             if response_query is None:
                 raise Exception("Failure to query metrics from database table")
@@ -67,3 +71,26 @@ class SystemStats:
             self._logger.error(error)
             api_response.code = EAPIResponseCode.internal_error
             return api_response.json_response()
+
+
+@cbv(router)
+class ESOutboxStats:
+
+    def __init__(self):
+        self._logger = LoggerFactory(_API_NAMESPACE).get_logger()
+
+    @router.get("/stats/es-outbox", summary="Retrieve the elastic search outbox lag")
+    async def get_lag(self):
+        '''
+        Pending and dead elastic search writes, the age in seconds of the oldest pending one, and the writes this
+        worker delivered or failed since it started
+        '''
+        api_response = APIResponse()
+        try:
+            api_response.result = await es_outbox_dispatcher.lag()
+        except Exception as e:
+            error = f"Retrieval of elastic search outbox lag failed: {e}"
+            api_response.error_msg = error
+            self._logger.error(error)
+            api_response.code = EAPIResponseCode.internal_error
+        return api_response.json_response()
@@ -1,4 +1,3 @@
-import httpx
 from fastapi import APIRouter
 from fastapi_utils.cbv import cbv
 from logger import LoggerFactory
@@ -6,6 +5,7 @@ from logger import LoggerFactory
 from config import ConfigClass
 from models import project as models
 from models.base_models import EAPIResponseCode
+from resources.http_client import get_client
 
 router = APIRouter()
 _API_NAMESPACE = "api_project"
@@ -21,7 +21,7 @@ class FileCheck:
                 response_model=models.CheckFileResponse,
                 tags=["File Check"],
                 summary="Check file exists")
-    def get(self, project_code, zone, file_relative_path):
+    async def get(self, project_code, zone, file_relative_path):
         """
         Check if file exists in given project/folder
         """
@@ -45,8 +45,7 @@ class FileCheck:
         self._logger.info(f"POST payload: {data}")
         self._logger.info(f"POST url: {url}")
         try:
-            with httpx.Client() as client:
-                res = client.post(url=url, json=data)
+            res = await get_client().post(url=url, json=data)
             self._logger.info(f"POST response: {res.text}")
             res = res.json().get('result')
             self._logger.info(f"POST result: {res}")
@@ -71,3 +70,4 @@ class FileCheck:
         api_response.result = result
         api_response.error_msg = error_msg
         return api_response.json_response()
+
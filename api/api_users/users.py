@@ -3,7 +3,7 @@ from fastapi_utils.cbv import cbv
 from models import users as models
 from models.base_models import APIResponse, EAPIResponseCode
 from config import ConfigClass
-import httpx
+from resources.http_client import get_client
 import math
 
 router = APIRouter()
@@ -11,10 +11,9 @@ router = APIRouter()
 @cbv(router)
 class User:
     @router.get('/{username}', response_model=models.GETUserResponse, summary="Get User")
-    def get(self, username):
+    async def get(self, username):
         api_response = APIResponse()
-        with httpx.Client() as client:
-            response = client.post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/User/query", json={"name": username})
+        response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/User/query", json={"name": username})
         if not response.json() or response.status_code == 404:
             api_response.error_msg = "User not found"
             api_response.code = EAPIResponseCode.not_found
@@ -23,16 +22,14 @@ class User:
         return api_response.json_response()
 
     @router.put('/{username}', response_model=models.GETUserResponse, summary="update User")
-    def put(self, username, data: dict):
+    async def put(self, username, data: dict):
         api_response = APIResponse()
-        with httpx.Client() as client:
-            response = client.post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/User/query", json={"name": username})
+        response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/User/query", json={"name": username})
         if not response.json():
             api_response.error_msg = "User not found"
             api_response.code = EAPIResponseCode.not_found
             return api_response.json_response()
         user_id = response.json()[0]["id"]
-        with httpx.Client() as client:
-            response = client.put(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/User/node/{user_id}", json=data)
+        response = await get_client().put(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/User/node/{user_id}", json=data)
         api_response.result = response.json()
         return api_response.json_response()
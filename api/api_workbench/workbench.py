@@ -1,16 +1,27 @@
+import httpx
 from fastapi import APIRouter
+from fastapi.concurrency import run_in_threadpool
 from fastapi_utils.cbv import cbv
 from fastapi_sqlalchemy import db
 from models import workbench
 from models.workbench_sql import WorkbenchModel
 from models.base_models import APIResponse, EAPIResponseCode
 from datetime import datetime
-import httpx
-from config import ConfigClass
+from resources.project_resolver import project_resolver
 
 router = APIRouter()
 
 
+def _count_workbench_records(query):
+    return db.session.query(WorkbenchModel).filter_by(**query).count()
+
+
+def _create_workbench_record(sql_params):
+    workbench_object = WorkbenchModel(**sql_params)
+    db.session.add(workbench_object)
+    db.session.commit()
+
+
 @cbv(router)
 class Workbench:
     @router.get('/{project_geid}/workbench', response_model=workbench.GETWorkbenchResponse, summary="Get workbench entry")
@@ -39,7 +50,7 @@ class Workbench:
         return api_response.json_response()
 
     @router.post('/{project_geid}/workbench', response_model=workbench.POSTWorkbenchResponse, summary="Create a workbench entry")
-    def post(self, project_geid, data: workbench.POSTWorkbenchRequest):
+    async def post(self, project_geid, data: workbench.POSTWorkbenchRequest):
         api_response = APIResponse()
         if not data.workbench_resource in ["guacamole", "superset", "jupyterhub"]:
             api_response.error_msg = "Invalid workbench resource"
@@ -52,8 +63,8 @@ class Workbench:
                 "workbench_resource": data.workbench_resource,
                 "geid": project_geid,
             }
-            workbench_objects = db.session.query(WorkbenchModel).filter_by(**query)
-            if workbench_objects.count() > 0:
+            workbench_count = await run_in_threadpool(_count_workbench_records, query)
+            if workbench_count > 0:
                 api_response.error_msg = "Record already exists for this project and resource"
                 api_response.code = EAPIResponseCode.conflict
                 return api_response.json_response()
@@ -61,13 +72,16 @@ class Workbench:
             api_response.error_msg = "Error querying psql: " + str(e)
             api_response.code = EAPIResponseCode.internal_error
             return api_response.json_response()
-        with httpx.Client() as client:
-            response = client.post(ConfigClass.NEO4J_SERVICE_V1 + f"nodes/Container/query", json={"global_entity_id": project_geid})
-        if response.status_code != 200:
-            api_response.error_msg = response.json()
-            api_response.code = response.status_code
+        try:
+            dataset_node = await project_resolver.resolve(geid=project_geid)
+        except httpx.HTTPStatusError as e:
+            api_response.error_msg = e.response.json()
+            api_response.code = e.response.status_code
+            return api_response.json_response()
+        if not dataset_node:
+            api_response.error_msg = "Project not found"
+            api_response.code = EAPIResponseCode.not_found
             return api_response.json_response()
-        dataset_node = response.json()[0]
 
         deployed_date = None
         if data.deployed:
@@ -85,9 +99,7 @@ class Workbench:
             "deployed_by": data.deployed_by,
         }
         try:
-            workbench_object = WorkbenchModel(**sql_params)
-            db.session.add(workbench_object)
-            db.session.commit()
+            await run_in_threadpool(_create_workbench_record, sql_params)
         except Exception as e:
             api_response.error_msg = "Error creating entry in psql: " + str(e)
             api_response.code = EAPIResponseCode.internal_error
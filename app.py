@@ -13,9 +13,14 @@ from opentelemetry.sdk.resources import SERVICE_NAME
 from opentelemetry.sdk.trace import TracerProvider
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
 
+from api.api_manifest.service import Manifest
 from api.routes import api_router
 from api.routes import api_router_v2
 from config import ConfigClass
+from resources.es_outbox import close_pool
+from resources.es_outbox import es_outbox_dispatcher
+from resources.http_client import close_client
+from resources.pg_notify import PGListener
 
 app = FastAPI(
     title="EntityInfo Service",
@@ -58,5 +63,34 @@ router = APIRouter()
 app.include_router(api_router, prefix="/v1")
 app.include_router(api_router_v2, prefix="/v2")
 
+
+manifest_listener = PGListener(ConfigClass.MANIFEST_NOTIFY_CHANNEL, Manifest.evict)
+
+
+@app.on_event("startup")
+async def start_manifest_listener() -> None:
+    manifest_listener.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_http_client() -> None:
+    await close_client()
+
+
+@app.on_event("startup")
+async def start_es_outbox_dispatcher() -> None:
+    es_outbox_dispatcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_manifest_listener() -> None:
+    await manifest_listener.stop()
+
+
+@app.on_event("shutdown")
+async def stop_es_outbox_dispatcher() -> None:
+    await es_outbox_dispatcher.stop()
+    await close_pool()
+
 if __name__ == "__main__":
     uvicorn.run("app:app", host=ConfigClass.HOST, port=ConfigClass.PORT, log_level="info", reload=True)
@@ -6,11 +6,12 @@ from fastapi import Request
 from logger import LoggerFactory
 
 from config import ConfigClass
+from resources.http_client import get_client
 
 logger = LoggerFactory(__name__).get_logger()
 
 
-def jwt_required(request: Request):
+async def jwt_required(request: Request):
     """
         why is there no call to this function?!
         delete candidate!
@@ -25,11 +26,10 @@ def jwt_required(request: Request):
 
     # check if user is existed in neo4j
     url = ConfigClass.NEO4J_SERVICE_V1 + "nodes/User/query"
-    with httpx.Client() as client:
-        res = client.post(
-            url,
-            json={"name": username}
-        )
+    res = await get_client().post(
+        url,
+        json={"name": username}
+    )
     try:
         res.raise_for_status()
         if res.status_code != 200:
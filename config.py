@@ -42,6 +42,62 @@ class Settings(BaseSettings):
     OPEN_TELEMETRY_HOST: str = '127.0.0.1'
     OPEN_TELEMETRY_PORT: int = 6831
 
+    HTTP_POOL_MAX_CONNECTIONS: int = 200
+    HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS: int = 50
+    HTTP_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_TIMEOUT: float = 5.0
+    HTTP_CONNECT_TIMEOUT: float = 5.0
+
+    TRAVERSAL_CONCURRENCY: int = 20
+    TRAVERSAL_MAX_DEPTH: int = 100
+    TRAVERSAL_MAX_FILES: int = 100000
+    TRAVERSAL_MAX_FRONTIER: int = 10000
+
+    ATTACH_ATTRIBUTES_CONCURRENCY: int = 20
+
+    ES_BATCH_FALLBACK_CONCURRENCY: int = 20
+    # seconds before the bulk entity endpoint is tried again after it answered 404 or 405
+    ES_BULK_RETRY_INTERVAL: float = 300.0
+
+    # elastic search writes are stored in the es_outbox table and delivered by a background dispatcher
+    ES_OUTBOX_POOL_SIZE: int = 5
+    ES_OUTBOX_BATCH_SIZE: int = 500
+    ES_OUTBOX_POLL_INTERVAL: float = 1.0
+    # seconds a claimed row is reserved for the worker delivering it, longer than a bulk request can take
+    ES_OUTBOX_LEASE: float = 60.0
+    ES_OUTBOX_MAX_ATTEMPTS: int = 10
+    ES_OUTBOX_RETRY_DELAY: float = 2.0
+    ES_OUTBOX_RETRY_MAX_DELAY: float = 300.0
+
+    MANIFEST_CACHE_SIZE: int = 1000
+    MANIFEST_CACHE_TTL: float = 300.0
+    MANIFEST_NOTIFY_CHANNEL: str = 'manifest_changed'
+    PG_LISTEN_RECONNECT_DELAY: float = 5.0
+
+    FILES_STATS_CACHE_SIZE: int = 1000
+    FILES_STATS_CACHE_TTL: float = 30.0
+
+    # per worker cache of project keys, the ttl bounds how long a deleted project is still resolved
+    PROJECT_CACHE_SIZE: int = 10000
+    PROJECT_CACHE_TTL: float = 3600.0
+
+    # counts of project file queries, reused when a page is requested without include_total
+    FILE_QUERY_TOTAL_CACHE_SIZE: int = 1000
+    FILE_QUERY_TOTAL_CACHE_TTL: float = 60.0
+
+    EXPORT_PAGE_SIZE: int = 1000
+
+    FILE_BATCH_MAX_SIZE: int = 1000
+
+    # breadcrumbs of listed nodes, cached per worker without eviction so the ttl is how long a moved or renamed
+    # folder can still show its old path
+    ROUTING_CACHE_SIZE: int = 10000
+    ROUTING_CACHE_TTL: float = 300.0
+
+    # parent folders reused when linking new folders, short lived since folders can be trashed by other services
+    FOLDER_NODE_CACHE_SIZE: int = 10000
+    FOLDER_NODE_CACHE_TTL: float = 60.0
+
     def __init__(self):
         super().__init__()
         self.NEO4J_SERVICE_V1 = self.NEO4J_SERVICE + '/v1/neo4j/'
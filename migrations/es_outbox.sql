@@ -0,0 +1,21 @@
+-- Elastic search entity writes waiting to be delivered to the provenance service, see resources/es_outbox.py.
+-- Apply it once per database, before the service starts, with the schema set in RDS_SCHEMA_DEFAULT:
+--
+--     psql "$RDS_DB_URI" -v schema=<RDS_SCHEMA_DEFAULT> -f migrations/es_outbox.sql
+
+CREATE TABLE IF NOT EXISTS :"schema".es_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    global_entity_id VARCHAR NOT NULL,
+    -- POST creates the entity, PUT updates it
+    method VARCHAR NOT NULL,
+    payload JSONB NOT NULL,
+    -- pending rows are delivered by the dispatcher, dead rows ran out of attempts and are kept for inspection
+    status VARCHAR NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_es_outbox_status_available_at ON :"schema".es_outbox (status, available_at);
+CREATE INDEX IF NOT EXISTS ix_es_outbox_global_entity_id ON :"schema".es_outbox (global_entity_id);
@@ -5,9 +5,13 @@ class AttachAttributesPOST(BaseModel):
     manifest_id: str
     global_entity_id: list
     attributes: dict
+    # write one ndjson line per processed file instead of a single json response
+    stream: bool = False
 
 
 class AttachPOSTResponse(APIResponse):
+    # set when a folder exceeded a traversal limit, result then only holds the files processed before it
+    truncated: bool = False
     result: dict = Field({}, example={
            'code': 200,
            'error_msg': '',
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, validator, Field, root_validator
 from fastapi.responses import JSONResponse
 from enum import Enum
@@ -32,3 +34,12 @@ class PaginationRequest(BaseModel):
     page_size: int = 25 
     order_type: str = "asc"
     order_by: str = "time_created"
+
+
+class CursorPaginationRequest(PaginationRequest):
+    # next_cursor of the previous page, takes precedence over page
+    cursor: Optional[str] = None
+
+
+class CursorAPIResponse(APIResponse):
+    next_cursor: Optional[str] = None
@@ -1,9 +1,12 @@
+from typing import List
+
 from pydantic import BaseModel
 from pydantic import Field
 
 from config import ConfigClass
 from models.base_models import APIResponse
-from models.base_models import PaginationRequest
+from models.base_models import CursorAPIResponse
+from models.base_models import CursorPaginationRequest
 
 
 # CreateTrashPOST
@@ -38,6 +41,24 @@ class CreateTrashPOSTResponse(APIResponse):
     )
 
 
+class CreateTrashBatchPOST(BaseModel):
+    payload: List[CreateTrashPOST]
+
+
+class CreateTrashBatchPOSTResponse(APIResponse):
+    result: list = Field(
+        [],
+        example=[
+            {
+                'global_entity_id': '5321880a-1a41-4bc8-a5d5-9767323205792-1620404058',
+                'status': 'success',
+                'error_msg': '',
+                'result': {'id': 479, 'labels': ['Greenroom', 'TrashFile'], 'name': 'BCD-1234_file_2.aacn'},
+            },
+        ],
+    )
+
+
 # CreateFilePOST
 class CreateFilePOST(BaseModel):
     file_size: int
@@ -86,11 +107,38 @@ class CreateFilePOSTResponse(APIResponse):
     )
 
 
+class CreateFileBatchPOST(BaseModel):
+    payload: List[CreateFilePOST]
+
+
+class CreateFileBatchPOSTResponse(APIResponse):
+    result: list = Field(
+        [],
+        example=[
+            {
+                'global_entity_id': '5321880a-1a41-4bc8-a5d5-9767323205792-1620404058',
+                'status': 'success',
+                'error_msg': '',
+                'result': {'id': 478, 'labels': ['Greenroom', 'File'], 'name': 'BCD-1234_file_2.aacn'},
+            },
+            {
+                'global_entity_id': '',
+                'status': 'failed',
+                'error_msg': 'Missing required field global_entity_id',
+                'result': {},
+            },
+        ],
+    )
+
+
 # DatasetFileQueryPOSTResponse
 
 
-class DatasetFileQueryPOST(PaginationRequest):
+class DatasetFileQueryPOST(CursorPaginationRequest):
     partial: bool = False
+    # skip the count query; total is then a recently cached count, or an estimate that is one past the current page
+    # while the page is full
+    include_total: bool = True
     query: dict = Field(
         {},
         example={
@@ -110,7 +158,7 @@ class DatasetFileQueryPOST(PaginationRequest):
     )
 
 
-class DatasetFileQueryPOSTV2(PaginationRequest):
+class DatasetFileQueryPOSTV2(CursorPaginationRequest):
     query: dict = Field(
         {},
         example={
@@ -127,7 +175,7 @@ class DatasetFileQueryPOSTV2(PaginationRequest):
     )
 
 
-class DatasetFileQueryPOSTResponse(APIResponse):
+class DatasetFileQueryPOSTResponse(CursorAPIResponse):
     result: dict = Field(
         {},
         example=[
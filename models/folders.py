@@ -9,8 +9,12 @@ from pydantic import Field
 from config import ConfigClass
 from models.base_models import APIResponse
 from resources import helpers
+from resources.cache import TTLCache
+from resources.http_client import get_client
+from resources.project_resolver import project_resolver
 
 _logger = LoggerFactory('folder_model').get_logger()
+_folder_node_cache = TTLCache(ConfigClass.FOLDER_NODE_CACHE_SIZE, ConfigClass.FOLDER_NODE_CACHE_TTL)
 
 
 class FoldersPOST(BaseModel):
@@ -204,7 +208,7 @@ class FoldersQueryResponse(APIResponse):
     ])
 
 
-def http_bulk_post_node(payload: list, extra_labels: list):
+async def http_bulk_post_node(payload: list, extra_labels: list):
     '''
     bulk create nodes in neo4j
     '''
@@ -213,62 +217,64 @@ def http_bulk_post_node(payload: list, extra_labels: list):
         "payload": payload,
         "extra_labels": extra_labels
     }
-    with httpx.Client() as client:
-        response = client.post(node_creation_url, json=data)
+    response = await get_client().post(node_creation_url, json=data)
     return response
 
 
-def http_post_node(node_dict: dict, geid=None):
+async def http_post_node(node_dict: dict, geid=None):
     '''
     will assign the geid automaticly
     '''
     if not geid:
-        node_dict["global_entity_id"] = helpers.get_geid()
+        node_dict["global_entity_id"] = await helpers.get_geid()
     node_creation_url = ConfigClass.NEO4J_SERVICE_V1 + "nodes/Folder"
-    with httpx.Client() as client:
-        response = client.post(node_creation_url, json=node_dict)
+    response = await get_client().post(node_creation_url, json=node_dict)
     return response
 
 
-def http_query_node(namespace, query_params={}):
+async def http_query_node(namespace, query_params={}):
     payload = {
         **query_params
     }
     node_query_url = ConfigClass.NEO4J_SERVICE_V1 + "nodes/Folder/query"
-    with httpx.Client() as client:
-        response = client.post(node_query_url, json=payload)
+    response = await get_client().post(node_query_url, json=payload)
     return response
 
 
-def link_folder_parent(namespace, parent_folder_geid, child_folder_geid):
+def cache_folder_node(node: dict):
     '''
-    link folder parent
+    remember a folder node, so folders created under it are linked without querying it again
     '''
-    respon_parent_folder_query = http_query_node(
-        namespace, {"global_entity_id": parent_folder_geid})
+    _folder_node_cache.set(node["global_entity_id"], node)
+
+
+async def get_folder_node(namespace, folder_geid):
+    folder_node = _folder_node_cache.get(folder_geid)
+    if folder_node is not None:
+        return folder_node
+    respon_parent_folder_query = await http_query_node(
+        namespace, {"global_entity_id": folder_geid})
     if not respon_parent_folder_query.status_code == 200:
         raise (Exception("[respon_parent_folder_query Error] {} {}".format(
             respon_parent_folder_query.status_code, respon_parent_folder_query.text)))
     parent_folder_node = respon_parent_folder_query.json()
     if not parent_folder_node:
         raise (Exception("[respon_parent_folder_query Error] Not found {} {}".format(
-            respon_parent_folder_query.status_code, parent_folder_geid)))
+            respon_parent_folder_query.status_code, folder_geid)))
     parent_folder_node = parent_folder_node[0]
-    respon_child_folder_query = http_query_node(
-        namespace, {"global_entity_id": child_folder_geid})
-    if not respon_child_folder_query.status_code == 200:
-        raise (Exception("[respon_child_folder_query Error] {} {}".format(
-            respon_child_folder_query.status_code, respon_child_folder_query.text)))
-    child_folder_node = respon_child_folder_query.json()
-    if not child_folder_node:
-        raise (Exception("[respon_child_folder_query Error] Not found {} {}".format(
-            respon_child_folder_query.status_code, child_folder_geid)))
-    child_folder_node = child_folder_node[0]
+    cache_folder_node(parent_folder_node)
+    return parent_folder_node
+
+
+async def link_folder_parent(namespace, parent_folder_geid, child_folder_node):
+    '''
+    link folder parent, child_folder_node is the node returned when the child was created
+    '''
+    parent_folder_node = await get_folder_node(namespace, parent_folder_geid)
     relation_payload = {
         "start_id": parent_folder_node["id"], "end_id": child_folder_node["id"]}
-    with httpx.Client() as client:
-        response = client.post(ConfigClass.NEO4J_SERVICE_V1 +
-                               "relations/own", json=relation_payload)
+    response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 +
+                           "relations/own", json=relation_payload)
     if response.status_code // 100 == 2:
         return response
     else:
@@ -276,39 +282,19 @@ def link_folder_parent(namespace, parent_folder_geid, child_folder_geid):
             response.status_code, response.text)))
 
 
-def link_project(namespace, project_code, child_folder_geid):
-    payload = {
-        "code": project_code
-    }
-    project_node_query_url = ConfigClass.NEO4J_SERVICE_V1 + "nodes/Container/query"
-    with httpx.Client() as client:
-        response_query_project = client.post(
-            project_node_query_url, json=payload)
-    _logger.info("request url: {}".format(project_node_query_url))
-    _logger.info("request payload: {}".format(payload))
-    if not response_query_project.status_code == 200:
+async def link_project(namespace, project_code, child_folder_node):
+    try:
+        project = await project_resolver.resolve(code=project_code)
+    except httpx.HTTPError as exc:
         raise (
-            Exception('[link_project] Invalid project code: {} {}'.format(project_code, response_query_project.status_code)))
-    project = response_query_project.json()
+            Exception('[link_project] Invalid project code: {} {}'.format(project_code, exc)))
     if not project:
         raise (
             Exception('[link_project] Not found project: {}'.format(project_code)))
-    project = project[0]
-    respon_child_folder_query = http_query_node(
-        namespace, {"global_entity_id": child_folder_geid})
-    if not respon_child_folder_query.status_code == 200:
-        raise (Exception("[respon_child_folder_query Error] {} {}".format(
-            respon_child_folder_query.status_code, respon_child_folder_query.text)))
-    child_folder_node = respon_child_folder_query.json()
-    if not child_folder_node:
-        raise (Exception("[respon_child_folder_query Error] Not found {} {}".format(
-            respon_child_folder_query.status_code, child_folder_geid)))
-    child_folder_node = child_folder_node[0]
     relation_payload = {
         "start_id": project["id"], "end_id": child_folder_node["id"]}
-    with httpx.Client() as client:
-        response = client.post(ConfigClass.NEO4J_SERVICE_V1 +
-                               "relations/own", json=relation_payload)
+    response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 +
+                           "relations/own", json=relation_payload)
     if response.status_code // 100 == 2:
         return response
     else:
@@ -316,7 +302,11 @@ def link_project(namespace, project_code, child_folder_geid):
             response.status_code, response.text)))
 
 
-def bulk_link_project(params_location, start_label, end_label, payload):
+async def bulk_link_project(params_location, start_label, end_label, payload):
+    return await http_bulk_post_relation("own", params_location, start_label, end_label, payload)
+
+
+async def http_bulk_post_relation(relation_label, params_location, start_label, end_label, payload):
     # bulk create relations
     data = {
         "payload": payload,
@@ -324,12 +314,11 @@ def bulk_link_project(params_location, start_label, end_label, payload):
         "start_label": start_label,
         "end_label": end_label
     }
-    with httpx.Client() as client:
-        response = client.post(ConfigClass.NEO4J_SERVICE_V1 +
-                               "relations/own/batch", json=data)
+    response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 +
+                           f"relations/{relation_label}/batch", json=data)
 
     if response.status_code // 100 == 2:
         return response
     else:
-        raise (Exception("[bulk_link_project Error] {} {}".format(
-            response.status_code, response.text)))
+        raise (Exception("[bulk_link_{} Error] {} {}".format(
+            relation_label, response.status_code, response.text)))
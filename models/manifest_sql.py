@@ -5,6 +5,7 @@ from fastapi_sqlalchemy import db
 from sqlalchemy import Column, String, Date, DateTime, Integer, Boolean, ForeignKey
 from sqlalchemy import Enum as EnumSql
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
@@ -19,6 +20,7 @@ class DataManifestModel(Base):
     id = Column(Integer, unique=True, primary_key=True)
     name = Column(String())
     project_code = Column(String())
+    attributes = relationship("DataAttributeModel", order_by="DataAttributeModel.id", lazy="select")
 
     def __init__(self, name, project_code):
         self.name = name
@@ -1,22 +1,29 @@
-import httpx
+import copy
+
 from pydantic import BaseModel
 from pydantic import Field
 
 from config import ConfigClass
 from models.base_models import APIResponse
-from models.base_models import PaginationRequest
+from models.base_models import CursorAPIResponse
+from models.base_models import CursorPaginationRequest
 from models.folders import http_query_node
+from resources.cache import TTLCache
+from resources.http_client import get_client
+
+# per worker and not evicted when nodes are moved, renamed or trashed, ROUTING_CACHE_TTL bounds how stale it can be
+_routing_cache = TTLCache(ConfigClass.ROUTING_CACHE_SIZE, ConfigClass.ROUTING_CACHE_TTL)
 
 
 ### DatasetFileQueryPOSTResponse
-class MetaGET(PaginationRequest):
+class MetaGET(CursorPaginationRequest):
     source_type: str
     zone: str
     partial: str = ''
     query: str = ''
 
 
-class MetaGETResponse(APIResponse):
+class MetaGETResponse(CursorAPIResponse):
     result: dict = Field(
         {},
         example={
@@ -111,12 +118,11 @@ class GETFileDetail(APIResponse):
     )
 
 
-def get_parent_connections(entity_geid):
+async def get_parent_connections(entity_geid):
     """get parent connections from neo4j service."""
     routing = []
     # get routing
-    with httpx.Client() as client:
-        response_routing = client.get(ConfigClass.NEO4J_SERVICE_V1 + 'relations/connected/{}'.format(entity_geid))
+    response_routing = await get_client().get(ConfigClass.NEO4J_SERVICE_V1 + 'relations/connected/{}'.format(entity_geid))
     routing = []
     if response_routing.status_code == 200:
         routing = response_routing.json()['result']
@@ -126,10 +132,19 @@ def get_parent_connections(entity_geid):
     # add self node, if not returned by neo4j
     if len([route for route in routing if route['global_entity_id'] == entity_geid]) == 0:
         self_query_payload = {'global_entity_id': entity_geid}
-        self_query_respon = http_query_node('doesnotmatterforgeidquery', self_query_payload)
+        self_query_respon = await http_query_node('doesnotmatterforgeidquery', self_query_payload)
         if self_query_respon.status_code == 200:
             routing = routing + self_query_respon.json()
         else:
             raise (Exception('[v2 routing query] {}, {}'.format(self_query_respon.status_code, self_query_respon.text)))
 
     return routing
+
+
+async def get_cached_parent_connections(entity_geid):
+    """get parent connections through the per worker routing cache."""
+    routing = _routing_cache.get(entity_geid)
+    if routing is None:
+        routing = await get_parent_connections(entity_geid)
+        _routing_cache.set(entity_geid, routing)
+    return copy.deepcopy(routing)
@@ -0,0 +1,38 @@
+from sqlalchemy import BigInteger
+from sqlalchemy import Column
+from sqlalchemy import DateTime
+from sqlalchemy import Index
+from sqlalchemy import Integer
+from sqlalchemy import String
+from sqlalchemy import Text
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.declarative import declarative_base
+
+from config import ConfigClass
+
+Base = declarative_base()
+
+
+class ESOutboxModel(Base):
+    """
+    Elastic search entity writes waiting to be delivered to the provenance service, the table is created by
+    migrations/es_outbox.sql
+    """
+    __tablename__ = 'es_outbox'
+    __table_args__ = (
+        Index('ix_es_outbox_status_available_at', 'status', 'available_at'),
+        Index('ix_es_outbox_global_entity_id', 'global_entity_id'),
+        {'schema': ConfigClass.RDS_SCHEMA_DEFAULT},
+    )
+    id = Column(BigInteger, primary_key=True)
+    global_entity_id = Column(String(), nullable=False)
+    # POST creates the entity, PUT updates it
+    method = Column(String(), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    # pending rows are delivered by the dispatcher, dead rows ran out of attempts and are kept for inspection
+    status = Column(String(), nullable=False, server_default='pending')
+    attempts = Column(Integer, nullable=False, server_default='0')
+    last_error = Column(Text)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
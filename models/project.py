@@ -1,8 +1,6 @@
-import httpx
 from pydantic import BaseModel
 from pydantic import Field
 
-from config import ConfigClass
 from models.base_models import APIResponse
 from models.base_models import PaginationRequest
 
@@ -41,11 +39,3 @@ class CheckFileResponse(APIResponse):
             ],
         },
     )
-
-
-def http_query_node(query_params={}):
-    payload = {**query_params}
-    node_query_url = ConfigClass.NEO4J_SERVICE_V1 + 'nodes/Container/query'
-    with httpx.Client() as client:
-        response = client.post(node_query_url, json=payload)
-    return response
@@ -0,0 +1,39 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterable
+from typing import AsyncIterator
+from typing import Awaitable
+from typing import Callable
+from typing import Iterable
+from typing import Union
+
+
+async def _iterate(items: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def ordered_map(
+    func: Callable[..., Awaitable], items: Union[Iterable, AsyncIterable], limit: int
+) -> AsyncIterator:
+    '''
+    run ``func`` over ``items`` with at most ``limit`` calls in flight and yield the results in input order.
+
+    Items are pulled lazily from ``items`` so only ``limit`` of them are held at a time, and the calls still pending
+    are cancelled if the consumer stops early or one of them raises.
+    '''
+    pending = deque()
+    try:
+        async for item in _iterate(items):
+            pending.append(asyncio.ensure_future(func(item)))
+            if len(pending) >= limit:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,67 @@
+import base64
+import binascii
+import json
+from typing import List
+from typing import Optional
+
+# A cursor is an opaque, url safe encoding of the row offset of the next page together with the page size and the
+# ordering it was issued for. It is an offset and not a sort key because the graph service only pages with skip/limit
+# and has no range predicates to resume after a key, so rows created or trashed between two pages can still shift the
+# listing. A cursor is only accepted with the page size and ordering it was issued for, so a client can not skip or
+# repeat rows by changing them halfway through a listing.
+# Clients must treat the value as opaque so the encoding can change without breaking them.
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor is malformed or was issued for a different page size or ordering."""
+
+
+def encode_cursor(offset: int, page_size: int, order_by: str, order_type: str) -> str:
+    '''
+    build the opaque cursor of the page starting at row ``offset`` of a listing paged by page_size and ordered by
+    order_by and order_type
+    '''
+    payload = {
+        'offset': offset,
+        'page_size': page_size,
+        'order_by': order_by,
+        'order_type': (order_type or '').lower(),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor: str, page_size: int, order_by: str, order_type: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        offset = int(payload['offset'])
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidCursorError('Invalid cursor')
+    if offset < 0:
+        raise InvalidCursorError('Invalid cursor')
+    issued_for = (payload.get('page_size'), payload.get('order_by'), payload.get('order_type'))
+    if issued_for != (page_size, order_by, (order_type or '').lower()):
+        raise InvalidCursorError('Cursor was issued for another page_size, order_by or order_type')
+    payload['offset'] = offset
+    return payload
+
+
+def page_offset(page: int, page_size: int, cursor: Optional[str], order_by: str, order_type: str) -> int:
+    '''
+    return the row offset of the requested page, taken from the cursor when one is given
+    '''
+    if cursor:
+        return decode_cursor(cursor, page_size, order_by, order_type)['offset']
+    return page * page_size
+
+
+def next_cursor(
+    offset: int, nodes: List[dict], page_size: int, order_by: str, order_type: str, total: int = None
+) -> Optional[str]:
+    '''
+    return the cursor of the page after ``nodes``, or None when this page is the last one
+    '''
+    end = offset + len(nodes)
+    has_more = end < total if total is not None else len(nodes) == page_size
+    if not nodes or not has_more:
+        return None
+    return encode_cursor(end, page_size, order_by, order_type)
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+from logger import LoggerFactory
+
+from config import ConfigClass
+from resources.http_client import get_client
+
+_logger = LoggerFactory('es_batcher').get_logger()
+
+ENTITY_URL = 'entity/file'
+ENTITY_BATCH_URL = 'entity/file/batch'
+
+
+class EntityResult(NamedTuple):
+    """Outcome of one elastic search entity write."""
+
+    global_entity_id: str
+    status_code: int
+    error: str = ''
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code // 100 == 2
+
+
+class ESBatcher:
+    '''
+    write elastic search entities to the provenance service with bulk calls.
+
+    ``send`` writes a set of documents with one call and reports the result of each document, so failures are handled
+    per entity by the outbox dispatcher.
+    '''
+
+    def __init__(self):
+        self._bulk_unavailable_until = 0.0
+
+    async def send(self, method: str, docs: List[dict]) -> List[EntityResult]:
+        '''
+        write the documents with one bulk call, or one call per document when there is a single document or the
+        provenance service does not expose the bulk endpoint.
+        '''
+        if not docs:
+            return []
+        if len(docs) == 1 or not self._bulk_available():
+            return await self._send_each(method, docs)
+
+        response = await get_client().request(
+            method, ConfigClass.PROVENANCE_SERVICE_V1 + ENTITY_BATCH_URL, json={'payload': docs}
+        )
+        if response.status_code in (404, 405):
+            # a gateway can answer 404 for a moment, so the bulk endpoint is tried again after a while
+            _logger.warning('provenance service has no bulk entity endpoint, sending documents one by one')
+            self._bulk_unavailable_until = time.monotonic() + ConfigClass.ES_BULK_RETRY_INTERVAL
+            return await self._send_each(method, docs)
+        if response.status_code // 100 != 2:
+            return [EntityResult(doc['global_entity_id'], response.status_code, response.text) for doc in docs]
+
+        by_geid = self._parse_bulk_response(response)
+        if by_geid is None or any(doc['global_entity_id'] not in by_geid for doc in docs):
+            # the documents may or may not have been written, sending them again one by one is safe since every
+            # write carries the full document
+            _logger.warning(f'unexpected bulk entity response, sending documents one by one: {response.text[:200]}')
+            return await self._send_each(method, docs)
+        results = []
+        for doc in docs:
+            item = by_geid[doc['global_entity_id']]
+            results.append(
+                EntityResult(doc['global_entity_id'], item.get('status_code', 200), item.get('error_msg', ''))
+            )
+        return results
+
+    def _bulk_available(self) -> bool:
+        return time.monotonic() >= self._bulk_unavailable_until
+
+    @staticmethod
+    def _parse_bulk_response(response) -> Optional[dict]:
+        '''
+        return the bulk results keyed by geid, or None when the body is not {"result": [{"global_entity_id": ...}]}
+        '''
+        try:
+            items = response.json()['result']
+            return {item['global_entity_id']: item for item in items}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    async def _send_each(self, method: str, docs: List[dict]) -> List[EntityResult]:
+        semaphore = asyncio.Semaphore(ConfigClass.ES_BATCH_FALLBACK_CONCURRENCY)
+
+        async def send_one(doc):
+            async with semaphore:
+                response = await get_client().request(method, ConfigClass.PROVENANCE_SERVICE_V1 + ENTITY_URL, json=doc)
+            error = '' if response.status_code == 200 else response.text
+            return EntityResult(doc['global_entity_id'], response.status_code, error)
+
+        return list(await asyncio.gather(*[send_one(doc) for doc in docs]))
+
+
+es_batcher = ESBatcher()
@@ -0,0 +1,226 @@
+import asyncio
+import json
+from typing import List
+
+import asyncpg
+from logger import LoggerFactory
+
+from config import ConfigClass
+from models.outbox_sql import ESOutboxModel
+from resources.es_batcher import es_batcher
+from resources.pg_notify import PGListener
+
+_logger = LoggerFactory('es_outbox').get_logger()
+
+_TABLE = f'{ConfigClass.RDS_SCHEMA_DEFAULT}.{ESOutboxModel.__tablename__}'
+
+# a row waits for any older pending row of the same entity, so the create of an entity is always delivered before
+# its updates even when several workers drain the outbox. Claimed rows are leased by pushing available_at past the
+# delivery, a row whose worker died before marking it is claimed again once its lease ran out.
+_CLAIM_SQL = f'''
+UPDATE {_TABLE} SET available_at = now() + make_interval(secs => $2)
+WHERE id IN (
+    SELECT id FROM {_TABLE} AS o
+    WHERE status = 'pending' AND available_at <= now()
+    AND NOT EXISTS (
+        SELECT 1 FROM {_TABLE} AS p
+        WHERE p.global_entity_id = o.global_entity_id AND p.status = 'pending' AND p.id < o.id
+    )
+    ORDER BY id LIMIT $1 FOR UPDATE SKIP LOCKED
+)
+RETURNING id, global_entity_id, method, payload, attempts
+'''
+
+_FAIL_SQL = f'''
+UPDATE {_TABLE} SET
+    attempts = attempts + 1,
+    last_error = $2,
+    status = CASE WHEN $3 OR attempts + 1 >= $4 THEN 'dead' ELSE 'pending' END,
+    available_at = now() + make_interval(secs => least($5 * power(2, attempts), $6))
+WHERE id = $1
+'''
+
+_LAG_SQL = f'''
+SELECT
+    count(*) FILTER (WHERE status = 'pending') AS pending,
+    count(*) FILTER (WHERE status = 'dead') AS dead,
+    extract(epoch FROM now() - min(created_at) FILTER (WHERE status = 'pending')) AS lag_seconds
+FROM {_TABLE}
+'''
+
+_pool = None
+# held while the pool is created, so concurrent first uses do not each create one
+_pool_lock = None
+
+
+async def get_pool() -> asyncpg.pool.Pool:
+    """Return the worker wide asyncpg pool used by the outbox, creating it on first use."""
+
+    global _pool, _pool_lock
+    if _pool is None:
+        if _pool_lock is None:
+            _pool_lock = asyncio.Lock()
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(
+                    PGListener.dsn(), min_size=1, max_size=ConfigClass.ES_OUTBOX_POOL_SIZE
+                )
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def enqueue(method: str, docs: List[dict]) -> None:
+    '''
+    store elastic search entity writes in the outbox, they are delivered in the background by the dispatcher.
+    ``method`` is POST to create the entities and PUT to update them.
+    '''
+    if not docs:
+        return
+    pool = await get_pool()
+    await pool.executemany(
+        f'INSERT INTO {_TABLE} (global_entity_id, method, payload) VALUES ($1, $2, $3::jsonb)',
+        [(doc['global_entity_id'], method, json.dumps(doc, default=str)) for doc in docs],
+    )
+    es_outbox_dispatcher.wake()
+
+
+async def enqueue_create(doc: dict) -> None:
+    await enqueue('POST', [doc])
+
+
+async def enqueue_update(doc: dict) -> None:
+    await enqueue('PUT', [doc])
+
+
+def is_retryable(status_code: int) -> bool:
+    return status_code >= 500 or status_code in (408, 429)
+
+
+class ESOutboxDispatcher:
+    """Drain the elastic search outbox into the provenance service.
+
+    Each round claims up to ``batch_size`` due rows with ``FOR UPDATE SKIP LOCKED`` so the dispatchers of all workers
+    share the work, and leases them for ES_OUTBOX_LEASE seconds in the same short transaction. The rows are then sent
+    with the bulk entity endpoint without holding any transaction open, and a second short transaction deletes the
+    delivered rows. Failed rows are retried with exponential backoff and marked dead after ES_OUTBOX_MAX_ATTEMPTS
+    attempts, or at once when the provenance service rejects the document. Delivery is at least once: a row whose
+    lease runs out before it is marked is sent again.
+    """
+
+    def __init__(self, batch_size: int = None, poll_interval: float = None):
+        self.batch_size = batch_size or ConfigClass.ES_OUTBOX_BATCH_SIZE
+        self.poll_interval = poll_interval or ConfigClass.ES_OUTBOX_POLL_INTERVAL
+        self.delivered = 0
+        self.failed = 0
+        self._task = None
+        self._wakeup = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _logger.error(f'failed to drain the elastic search outbox: {e}')
+                claimed = 0
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def drain_once(self) -> int:
+        '''
+        deliver one batch of due rows, returns the number of rows claimed
+        '''
+        pool = await get_pool()
+        async with pool.acquire() as connection:
+            rows = await connection.fetch(_CLAIM_SQL, self.batch_size, ConfigClass.ES_OUTBOX_LEASE)
+        if not rows:
+            return 0
+        # UPDATE ... RETURNING does not keep the order of the subquery
+        rows = sorted(rows, key=lambda row: row['id'])
+        delivered, failures = await self._deliver(rows)
+        async with pool.acquire() as connection:
+            async with connection.transaction():
+                if delivered:
+                    await connection.execute(f'DELETE FROM {_TABLE} WHERE id = ANY($1::bigint[])', delivered)
+                if failures:
+                    await connection.executemany(_FAIL_SQL, failures)
+        self.delivered += len(delivered)
+        self.failed += len(failures)
+        return len(rows)
+
+    async def _deliver(self, rows) -> tuple:
+        delivered = []
+        failures = []
+        by_method = {}
+        for row in rows:
+            by_method.setdefault(row['method'], []).append(row)
+        for method, method_rows in by_method.items():
+            try:
+                results = await es_batcher.send(method, [json.loads(row['payload']) for row in method_rows])
+            except Exception as e:
+                _logger.error(f'elastic search outbox {method} of {len(method_rows)} entities failed: {e}')
+                results = None
+            for index, row in enumerate(method_rows):
+                if results is None:
+                    status_code, error = 0, 'provenance service unreachable'
+                else:
+                    status_code, error = results[index].status_code, results[index].error
+                if status_code // 100 == 2:
+                    delivered.append(row['id'])
+                    continue
+                _logger.warning(f'elastic search {method} of {row["global_entity_id"]} failed: {status_code} {error}')
+                failures.append((
+                    row['id'],
+                    f'{status_code} {error}',
+                    status_code != 0 and not is_retryable(status_code),
+                    ConfigClass.ES_OUTBOX_MAX_ATTEMPTS,
+                    ConfigClass.ES_OUTBOX_RETRY_DELAY,
+                    ConfigClass.ES_OUTBOX_RETRY_MAX_DELAY,
+                ))
+        return delivered, failures
+
+    async def lag(self) -> dict:
+        '''
+        return the outbox backlog: pending and dead rows and the age in seconds of the oldest pending row
+        '''
+        pool = await get_pool()
+        row = await pool.fetchrow(_LAG_SQL)
+        return {
+            'pending': row['pending'],
+            'dead': row['dead'],
+            'lag_seconds': float(row['lag_seconds'] or 0),
+            'delivered': self.delivered,
+            'failed': self.failed,
+        }
+
+
+es_outbox_dispatcher = ESOutboxDispatcher()
@@ -1,23 +1,22 @@
 from config import ConfigClass
-import httpx
+from resources.http_client import get_client
 
 
-def get_geid():
+async def get_geid():
     '''
     get geid
     http://localhost:5062/v1/utility/id?entity_type=data_upload
     '''
     url = ConfigClass.UTILITY_SERVICE_V1 + \
         "utility/id"
-    with httpx.Client() as client:
-        response = client.get(url)
+    response = await get_client().get(url)
     if response.status_code == 200:
         return response.json()['result']
     else:
         raise Exception('get_geid {}: {}'.format(response.status_code, url))
 
 
-def get_operation_auditlogs(project_code, action,
+async def get_operation_auditlogs(project_code, action,
                             start_date, end_date, resource, operator=None, ):
     '''
     get operation auditlogs from service_provenance
@@ -34,15 +33,14 @@ def get_operation_auditlogs(project_code, action,
         params['resource'] = resource
     if operator:
         params['operator'] = operator
-    with httpx.Client() as client:
-        response = client.get(url, params=params)
+    response = await get_client().get(url, params=params)
     if response.status_code == 200:
         return response.json()['result']
     else:
         raise Exception('get_operation_auditlogs {}: {}'.format(
             response.status_code, url))
 
-def get_operation_logs_total(project_code, action,
+async def get_operation_logs_total(project_code, action,
                             start_date, end_date, resource, operator=None, ):
     '''
     get operation auditlogs total from service_provenance
@@ -59,15 +57,14 @@ def get_operation_logs_total(project_code, action,
         params['resource'] = resource
     if operator:
         params['operator'] = operator
-    with httpx.Client() as client:
-        response = client.get(url, params=params)
+    response = await get_client().get(url, params=params)
     if response.status_code == 200:
         return response.json()['total']
     else:
         raise Exception('get_operation_auditlogs {}: {}'.format(
             response.status_code, url))
 
-def get_file_count_neo4j(project_code, zone, archived=False, uploader=None):
+async def get_file_count_neo4j(project_code, zone, archived=False, uploader=None):
     url = ConfigClass.NEO4J_SERVICE_V1 + "file/quick/count"
     labels = {
         "Greenroom": "Greenroom:File",
@@ -81,8 +78,7 @@ def get_file_count_neo4j(project_code, zone, archived=False, uploader=None):
     if uploader:
         params["display_path"] = uploader
         params["startwith"] = ["display_path"]
-    with httpx.Client() as client:
-        response = client.get(url, params=params)
+    response = await get_client().get(url, params=params)
     if response.status_code == 200:
         return response.json()['result']
     else:
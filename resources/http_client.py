@@ -0,0 +1,34 @@
+import httpx
+
+from config import ConfigClass
+
+_client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the worker wide pooled async http client, creating it on first use.
+
+    The client keeps connections to the neo4j, provenance and utility services alive between requests, so every
+    module should go through it instead of opening its own client.
+    """
+
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=ConfigClass.HTTP_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=ConfigClass.HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=ConfigClass.HTTP_POOL_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(ConfigClass.HTTP_TIMEOUT, connect=ConfigClass.HTTP_CONNECT_TIMEOUT),
+        )
+    return _client
+
+
+async def close_client() -> None:
+    """Close the pooled http client and release its connections."""
+
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import re
+from typing import Callable
+from typing import Optional
+
+import asyncpg
+from logger import LoggerFactory
+from sqlalchemy import text
+
+from config import ConfigClass
+
+_logger = LoggerFactory('pg_notify').get_logger()
+
+
+def publish(session, channel: str, payload: dict) -> None:
+    '''
+    send a notification on a postgres channel through the given sqlalchemy session and commit it
+    '''
+    session.execute(text('SELECT pg_notify(:channel, :payload)'), {'channel': channel, 'payload': json.dumps(payload)})
+    session.commit()
+
+
+class PGListener:
+    """Listen on a postgres channel with a dedicated asyncpg connection and pass every payload to ``callback``.
+
+    The connection is re-established after ``reconnect_delay`` seconds when it drops. ``callback`` is called with
+    ``None`` whenever the listener (re)connects, since notifications sent while it was down are lost.
+    """
+
+    def __init__(self, channel: str, callback: Callable[[Optional[dict]], None], reconnect_delay: float = None):
+        self.channel = channel
+        self.callback = callback
+        self.reconnect_delay = reconnect_delay or ConfigClass.PG_LISTEN_RECONNECT_DELAY
+        self._task = None
+
+    @staticmethod
+    def dsn() -> str:
+        # asyncpg only understands the plain postgresql scheme, not the sqlalchemy driver suffix
+        return re.sub(r'^postgres(ql)?(\+\w+)?://', 'postgresql://', ConfigClass.RDS_DB_URI)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            self.callback(json.loads(payload))
+        except Exception as e:
+            _logger.error(f'failed to handle notification on {channel}: {e}')
+
+    async def _run(self) -> None:
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn())
+                await connection.add_listener(self.channel, self._on_notification)
+                self.callback(None)
+                _logger.info(f'listening on postgres channel {self.channel}')
+                while not connection.is_closed():
+                    await asyncio.sleep(self.reconnect_delay)
+                _logger.warning(f'lost the connection listening on {self.channel}')
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _logger.error(f'failed to listen on postgres channel {self.channel}: {e}')
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(self.reconnect_delay)
@@ -0,0 +1,121 @@
+from typing import Optional
+
+import httpx
+from logger import LoggerFactory
+
+from config import ConfigClass
+from resources.cache import TTLCache
+from resources.http_client import get_client
+
+_logger = LoggerFactory('project_resolver').get_logger()
+
+
+# the keys of a project never change, unlike the other fields of its Container node
+PROJECT_KEYS = ('id', 'global_entity_id', 'code')
+
+
+class ProjectResolver:
+    """Resolve the keys of a project's Container node by geid, code or neo4j node id.
+
+    Only the id, geid and code of each project are cached, keyed by node id, and two small indexes point the geid and
+    the code at that record, so a project looked up by any of its keys is served from memory for every other key too.
+    The other fields of the node can be edited by another worker at any time, so ``fetch`` reads the full node from
+    neo4j whenever they are returned to a client. The cache is per worker, so a deleted project is only forgotten by
+    every worker after PROJECT_CACHE_TTL; ``invalidate`` drops it from the current worker.
+    """
+
+    def __init__(self, maxsize: int = None, ttl: float = None):
+        maxsize = maxsize or ConfigClass.PROJECT_CACHE_SIZE
+        ttl = ttl or ConfigClass.PROJECT_CACHE_TTL
+        self._nodes = TTLCache(maxsize, ttl)
+        self._index = {
+            'global_entity_id': TTLCache(maxsize, ttl),
+            'code': TTLCache(maxsize, ttl),
+        }
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, geid: str = None, code: str = None, id: int = None) -> Optional[dict]:
+        '''
+        return the id, global_entity_id and code of the Container node matching exactly one of geid, code or id, or
+        None when there is none
+        '''
+        if id is not None:
+            node_id = int(id)
+        elif geid is not None:
+            node_id = self._index['global_entity_id'].get(geid)
+        elif code is not None:
+            node_id = self._index['code'].get(code)
+        else:
+            raise ValueError('one of geid, code or id is required')
+
+        keys = self._nodes.get(node_id) if node_id is not None else None
+        if keys is not None:
+            self.hits += 1
+            return dict(keys)
+
+        self.misses += 1
+        node = await self.fetch(geid=geid, code=code, id=id)
+        if node is None:
+            return None
+        return {field: node.get(field) for field in PROJECT_KEYS}
+
+    async def fetch(self, geid: str = None, code: str = None, id: int = None) -> Optional[dict]:
+        '''
+        return the current Container node matching exactly one of geid, code or id, or None when there is none
+        '''
+        if id is None and geid is None and code is None:
+            raise ValueError('one of geid, code or id is required')
+        node = await self._query(geid=geid, code=code, id=id)
+        if node is not None:
+            self._store(node)
+        return node
+
+    async def _query(self, geid: str = None, code: str = None, id: int = None) -> Optional[dict]:
+        if id is not None:
+            response = await get_client().get(ConfigClass.NEO4J_SERVICE_V1 + f'nodes/Container/node/{int(id)}')
+        else:
+            payload = {'global_entity_id': geid} if geid is not None else {'code': code}
+            response = await get_client().post(ConfigClass.NEO4J_SERVICE_V1 + 'nodes/Container/query', json=payload)
+        try:
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            _logger.error('HTTP Exception', exc_info=True)
+            raise exc
+        nodes = response.json()
+        return nodes[0] if nodes else None
+
+    def _store(self, node: dict) -> None:
+        self._nodes.set(node['id'], {field: node.get(field) for field in PROJECT_KEYS})
+        for field, index in self._index.items():
+            if node.get(field) is not None:
+                index.set(node[field], node['id'])
+
+    def invalidate(self, geid: str = None, code: str = None, id: int = None) -> None:
+        '''
+        drop the cached project matching any of the given keys, together with its other keys
+        '''
+        node_ids = {int(id)} if id is not None else set()
+        for field, value in (('global_entity_id', geid), ('code', code)):
+            if value is not None:
+                node_id = self._index[field].get(value)
+                if node_id is not None:
+                    node_ids.add(node_id)
+                self._index[field].pop(value)
+        for node_id in node_ids:
+            node = self._nodes.get(node_id)
+            if node is not None:
+                for field, index in self._index.items():
+                    index.pop(node.get(field))
+            self._nodes.pop(node_id)
+
+    def clear(self) -> None:
+        self._nodes.clear()
+        for index in self._index.values():
+            index.clear()
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._nodes)}
+
+
+project_resolver = ProjectResolver()
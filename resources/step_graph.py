@@ -0,0 +1,60 @@
+import asyncio
+import time
+from typing import Awaitable
+from typing import Callable
+from typing import Iterable
+
+
+class StepFailed(Exception):
+    """Raised by a step to stop the graph with an error message meant for the client."""
+
+
+class StepGraph:
+    '''
+    run async steps as soon as the steps they require have finished.
+
+    Steps are added after the steps they require, and each one is called with the results of its required steps as
+    keyword arguments named after them. Steps without a path between them run concurrently. The first step to raise
+    cancels the steps still running and its exception propagates from ``run``, so callers handle the same errors as
+    when the steps ran one after another. ``timings`` holds the seconds every finished step took.
+    '''
+
+    def __init__(self):
+        self._steps = {}
+        self.results = {}
+        self.timings = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable], requires: Iterable[str] = ()) -> 'StepGraph':
+        requires = tuple(requires)
+        unknown = [required for required in requires if required not in self._steps]
+        if name in self._steps or unknown:
+            raise ValueError(f'step {name} is already added or requires unknown steps {unknown}')
+        self._steps[name] = (func, requires)
+        return self
+
+    async def run(self) -> dict:
+        tasks = {}
+        # insertion order is a topological order since a step can only require steps added before it
+        for name, (func, requires) in self._steps.items():
+            tasks[name] = asyncio.ensure_future(self._run_step(name, func, {r: tasks[r] for r in requires}))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            # collect the cancelled and dependent failures so none is reported as never retrieved
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        return self.results
+
+    async def _run_step(self, name: str, func: Callable[..., Awaitable], requires: dict):
+        kwargs = {}
+        for required, task in requires.items():
+            kwargs[required] = await task
+        start = time.perf_counter()
+        try:
+            result = await func(**kwargs)
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 4)
+        self.results[name] = result
+        return result
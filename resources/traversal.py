@@ -0,0 +1,154 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator
+
+import httpx
+from logger import LoggerFactory
+
+from config import ConfigClass
+from resources.http_client import get_client
+
+_logger = LoggerFactory('traversal').get_logger()
+
+
+class TraversalLimitError(Exception):
+    """Raised when a folder tree is deeper or larger than the configured traversal caps."""
+
+
+def _children_payload(start_label: str, geid: str) -> dict:
+    return {
+        'start_label': start_label,
+        'end_labels': ['File', 'Folder'],
+        'query': {
+            'start_params': {
+                'global_entity_id': geid,
+            },
+            'end_params': {
+                'Folder': {'archived': False},
+                'File': {'archived': False},
+            },
+        },
+    }
+
+
+async def _post_children_query(payload: dict) -> list:
+    response = await get_client().post(ConfigClass.NEO4J_SERVICE_V2 + 'relations/query', json=payload)
+    try:
+        response.raise_for_status()
+    except httpx.HTTPError as exc:
+        _logger.error('HTTP Exception', exc_info=True)
+        raise exc
+    return response.json()['results']
+
+
+async def query_children(start_label: str, geid: str) -> list:
+    '''
+    list the non archived files and folders directly owned by one node
+    '''
+    return await _post_children_query(_children_payload(start_label, geid))
+
+
+async def query_children_page(start_label: str, geid: str, skip: int, limit: int) -> list:
+    '''
+    list one page of the non archived files and folders directly owned by one node, in a stable order
+    '''
+    payload = {
+        **_children_payload(start_label, geid),
+        'order_by': 'end_node.global_entity_id',
+        'order_type': 'asc',
+        'skip': skip,
+        'limit': limit,
+    }
+    return await _post_children_query(payload)
+
+
+async def iter_children_pages(start_label: str, geid: str, page_size: int) -> AsyncIterator[list]:
+    '''
+    yield the children of one node page by page, requesting the next page while the current one is consumed
+    '''
+    skip = 0
+    pending = asyncio.ensure_future(query_children_page(start_label, geid, skip, page_size))
+    try:
+        while pending is not None:
+            page = await pending
+            skip += page_size
+            if len(page) == page_size:
+                pending = asyncio.ensure_future(query_children_page(start_label, geid, skip, page_size))
+            else:
+                pending = None
+            yield page
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def iter_subtree_pages(geid: str, start_label: str = 'Folder', page_size: int = None) -> AsyncIterator[list]:
+    '''
+    yield pages of every non archived file and folder under a folder (or container).
+
+    Folders are listed one at a time, each through ``iter_children_pages``, so only the current page, the prefetched
+    one and the geids of the folders still to visit are held in memory. The pending geids are not capped: they are
+    small strings, and a cap would fail exports of wide trees that this walk is meant to stream.
+    '''
+    page_size = page_size or ConfigClass.EXPORT_PAGE_SIZE
+    folders = deque([(start_label, geid)])
+    while folders:
+        label, folder_geid = folders.popleft()
+        async for page in iter_children_pages(label, folder_geid, page_size):
+            for node in page:
+                if 'Folder' in node['labels']:
+                    folders.append(('Folder', node['global_entity_id']))
+            yield page
+
+
+async def iter_folder_files(
+    geid: str,
+    start_label: str = 'Folder',
+    max_depth: int = None,
+    max_files: int = None,
+    max_frontier: int = None,
+    concurrency: int = None,
+) -> AsyncIterator[dict]:
+    '''
+    yield every non archived file under a folder (or container), breadth first.
+
+    Each level of the tree is expanded at once with up to ``concurrency`` sibling folders queried in parallel, and
+    file nodes are yielded as soon as their parent folder has been listed. ``max_depth`` bounds the number of levels,
+    ``max_files`` the number of files yielded and ``max_frontier`` the number of folders held for the next level.
+    '''
+    max_depth = ConfigClass.TRAVERSAL_MAX_DEPTH if max_depth is None else max_depth
+    max_files = ConfigClass.TRAVERSAL_MAX_FILES if max_files is None else max_files
+    max_frontier = ConfigClass.TRAVERSAL_MAX_FRONTIER if max_frontier is None else max_frontier
+    semaphore = asyncio.Semaphore(concurrency or ConfigClass.TRAVERSAL_CONCURRENCY)
+
+    async def expand(label, folder_geid):
+        async with semaphore:
+            return await query_children(label, folder_geid)
+
+    level = [(start_label, geid)]
+    depth = 0
+    file_count = 0
+    while level:
+        if depth >= max_depth:
+            raise TraversalLimitError(f'folder {geid} is deeper than {max_depth} levels')
+        next_level = []
+        tasks = [asyncio.ensure_future(expand(label, folder_geid)) for label, folder_geid in level]
+        try:
+            for future in asyncio.as_completed(tasks):
+                for node in await future:
+                    if 'File' in node['labels']:
+                        file_count += 1
+                        if file_count > max_files:
+                            raise TraversalLimitError(f'folder {geid} holds more than {max_files} files')
+                        yield node
+                    else:
+                        next_level.append(('Folder', node['global_entity_id']))
+                        if len(next_level) > max_frontier:
+                            raise TraversalLimitError(
+                                f'folder {geid} has more than {max_frontier} folders in one level'
+                            )
+        finally:
+            for task in tasks:
+                task.cancel()
+        level = next_level
+        depth += 1
@@ -1,3 +1,4 @@
+import asyncio
 from enum import auto
 from re import I
 import pytest
@@ -6,7 +7,7 @@ import httpx
 from fastapi.testclient import TestClient
 
 from config import ConfigClass
-from resources.helpers import get_geid
+from tests.prepare_test import get_geid
 
 
 def _delete_workbench_records(project_geid):
@@ -34,6 +35,43 @@ def test_client():
     return TestClient(app)
 
 
+@pytest.fixture
+def run():
+    '''
+        run a coroutine to completion on the event loop the test client uses.
+    '''
+    def run_until_complete(coro):
+        return asyncio.get_event_loop().run_until_complete(coro)
+    return run_until_complete
+
+
+@pytest.fixture
+def mock_http(httpx_mock):
+    '''
+        httpx_mock with a fresh pooled client, the shared one is bound to the event loop it was first used in.
+    '''
+    from resources import http_client
+    http_client._client = None
+    yield httpx_mock
+    asyncio.get_event_loop().run_until_complete(http_client.close_client())
+
+
+@pytest.fixture
+def outbox_rows(monkeypatch):
+    '''
+        collect the rows the endpoints insert in the elastic search outbox instead of writing them to postgres.
+    '''
+    from resources import es_outbox
+    rows = []
+
+    class Pool:
+        async def executemany(self, sql, args):
+            rows.extend(args)
+
+    monkeypatch.setattr(es_outbox, '_pool', Pool())
+    return rows
+
+
 @pytest.fixture
 def create_entityinfo_test_project_in_neo4j(scope='session', autouse=True):
     testing_api = ConfigClass.NEO4J_SERVICE_V1 + "nodes/Container"
@@ -4,7 +4,12 @@ from fastapi_sqlalchemy import db
 
 from app import app
 from config import ConfigClass
-from resources.helpers import get_geid
+
+
+def get_geid():
+    with httpx.Client() as client:
+        response = client.get(ConfigClass.UTILITY_SERVICE_V1 + 'utility/id')
+    return response.json()['result']
 
 
 class SetupException(Exception):
@@ -0,0 +1,139 @@
+import asyncio
+import json
+
+import pytest
+from pytest_httpx import to_response
+
+from api.api_attributes import file_attributes
+from api.api_manifest.service import Manifest
+from api.api_manifest.validator import ManifestValidator
+from config import ConfigClass
+
+NEO4J = ConfigClass.NEO4J_SERVICE_V1
+MANIFEST = {
+    'id': 1,
+    'name': 'Manifest1',
+    'project_code': 'unittest_project',
+    'attributes': [
+        {'name': 'attr1', 'type': 'multiple_choice', 'value': 'a1,a2', 'optional': False},
+        {'name': 'attr2', 'type': 'text', 'value': '', 'optional': True},
+    ],
+}
+ATTRIBUTES = {'attr1': 'a1', 'attr2': 'some text'}
+
+
+@pytest.fixture(autouse=True)
+def manifest(monkeypatch):
+    monkeypatch.setattr(Manifest, 'get_with_validator', classmethod(
+        lambda cls, manifest_id: (MANIFEST, ManifestValidator(MANIFEST))
+    ))
+
+
+def file_node(index):
+    return {'id': index, 'global_entity_id': f'file-{index}', 'name': f'file-{index}.txt', 'labels': ['File']}
+
+
+def mock_folder(mock_http, files, folders=(), failing=()):
+    '''
+        the selected geid is a folder holding ``files`` and ``folders``, the attach writes to the node ids in
+        ``failing`` fail
+    '''
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/File/query', json=[])
+
+    def children(request, extensions):
+        start = json.loads(request.read())['query']['start_params']['global_entity_id']
+        nodes = []
+        if start == 'folder':
+            nodes = files + [{'global_entity_id': geid, 'labels': ['Folder']} for geid in folders]
+        return to_response(json={'results': nodes, 'total': len(nodes)})
+
+    def attach(request, extensions):
+        if int(request.url.path.rsplit('/', 1)[-1]) in failing:
+            return to_response(status_code=500)
+        return to_response(json=[json.loads(request.read())])
+
+    mock_http.add_callback(children, method='POST', url=ConfigClass.NEO4J_SERVICE_V2 + 'relations/query')
+    mock_http.add_callback(attach, method='PUT')
+
+
+def attach_payload(**kwargs):
+    return dict({'manifest_id': '1', 'global_entity_id': ['folder'], 'attributes': ATTRIBUTES}, **kwargs)
+
+
+def test_01_attach_folder_files(test_client, mock_http, outbox_rows):
+    mock_folder(mock_http, [file_node(i) for i in range(3)])
+    res = test_client.post('/v1/files/attributes/attach', json=attach_payload()).json()
+    assert res['code'] == 200
+    assert res['truncated'] is False
+    assert [(r['geid'], r['operation_status']) for r in res['result']] == [
+        ('file-0', 'SUCCEED'), ('file-1', 'SUCCEED'), ('file-2', 'SUCCEED'),
+    ]
+    assert [geid for geid, _, _ in outbox_rows] == ['file-0', 'file-1', 'file-2']
+
+
+def test_02_traversal_limit_returns_the_partial_results(test_client, mock_http, outbox_rows, monkeypatch):
+    monkeypatch.setattr(ConfigClass, 'TRAVERSAL_MAX_FILES', 2)
+    mock_folder(mock_http, [file_node(i) for i in range(3)])
+    res = test_client.post('/v1/files/attributes/attach', json=attach_payload()).json()
+    assert res['code'] == 200
+    assert res['truncated'] is True
+    assert 'more than 2 files' in res['error_msg']
+    # the files attached before the limit was reached are reported
+    assert [r['geid'] for r in res['result']] == ['file-0', 'file-1']
+    assert len(outbox_rows) == 2
+
+
+def test_03_traversal_limit_in_the_stream_summary(test_client, mock_http, outbox_rows, monkeypatch):
+    monkeypatch.setattr(ConfigClass, 'TRAVERSAL_MAX_DEPTH', 1)
+    mock_folder(mock_http, [file_node(0)], folders=['sub-folder'])
+    res = test_client.post('/v1/files/attributes/attach', json=attach_payload(stream=True))
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert lines[0]['geid'] == 'file-0'
+    summary = lines[-1]['summary']
+    assert summary['truncated'] is True
+    assert summary['succeed'] == 1
+    assert 'deeper than 1 levels' in summary['error_msg']
+
+
+def test_04_stream_writes_one_line_per_file_and_a_summary(test_client, mock_http, outbox_rows):
+    files = [file_node(0), file_node(1), dict(file_node(2), manifest_id=1)]
+    mock_folder(mock_http, files, failing={1})
+    res = test_client.post('/v1/files/attributes/attach', json=attach_payload(stream=True))
+    assert res.status_code == 200
+    assert res.headers['content-type'] == 'application/x-ndjson'
+    lines = [json.loads(line) for line in res.text.splitlines()]
+    assert lines[:-1] == [
+        {'name': 'file-0.txt', 'geid': 'file-0', 'operation_status': 'SUCCEED'},
+        {'name': 'file-1.txt', 'geid': 'file-1', 'operation_status': 'TERMINATED', 'error_type': 'internal_error'},
+        {'name': 'file-2.txt', 'geid': 'file-2', 'operation_status': 'TERMINATED',
+         'error_type': 'attributes_duplicate'},
+    ]
+    assert lines[-1] == {'summary': {
+        'code': 200, 'error_msg': '', 'total': 3, 'succeed': 1, 'terminated': 2, 'truncated': False,
+    }}
+    assert [geid for geid, _, _ in outbox_rows] == ['file-0']
+
+
+def test_05_files_are_attached_concurrently_up_to_the_limit(test_client, mock_http, monkeypatch):
+    monkeypatch.setattr(ConfigClass, 'ATTACH_ATTRIBUTES_CONCURRENCY', 3)
+    in_flight = []
+    peak = []
+
+    def selected_file(request, extensions):
+        index = int(json.loads(request.read())['global_entity_id'].split('-')[1])
+        return to_response(json=[file_node(index)])
+
+    async def attach(validator, attributes, file_node, logger):
+        in_flight.append(file_node['id'])
+        peak.append(len(in_flight))
+        # later files finish first
+        await asyncio.sleep(0.01 * (10 - file_node['id']))
+        in_flight.remove(file_node['id'])
+        return True
+
+    mock_http.add_callback(selected_file, method='POST', url=NEO4J + 'nodes/File/query')
+    monkeypatch.setattr(file_attributes, 'attach_attributes', attach)
+    geids = [f'file-{i}' for i in range(10)]
+    res = test_client.post('/v1/files/attributes/attach', json=attach_payload(global_entity_id=geids)).json()
+    assert [r['geid'] for r in res['result']] == geids
+    assert max(peak) == 3
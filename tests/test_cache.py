@@ -0,0 +1,60 @@
+import time
+
+from resources.cache import TTLCache
+
+
+def test_01_get_returns_stored_value():
+    cache = TTLCache(10, 60)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert 'a' in cache
+    assert cache.get('b', 'default') == 'default'
+
+
+def test_02_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    cache = TTLCache(10, 5)
+    cache.set('a', 1)
+    now[0] += 4
+    assert cache.get('a') == 1
+    now[0] += 2
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_03_least_recently_used_entry_is_evicted():
+    cache = TTLCache(2, 60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert 'c' in cache
+
+
+def test_04_falsy_values_are_cached():
+    cache = TTLCache(10, 60)
+    cache.set('empty', [])
+    cache.set('none', None)
+    assert 'empty' in cache
+    assert 'none' in cache
+    assert cache.get('empty', 'default') == []
+
+
+def test_05_pop_and_clear():
+    cache = TTLCache(10, 60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.pop('a')
+    cache.pop('missing')
+    assert 'a' not in cache
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_06_zero_size_cache_stores_nothing():
+    cache = TTLCache(0, 60)
+    cache.set('a', 1)
+    assert cache.get('a') is None
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from resources.concurrency import ordered_map
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_01_results_come_back_in_input_order(run):
+    async def slow_for_small(value):
+        await asyncio.sleep(0.01 * (5 - value))
+        return value * 10
+
+    assert run(collect(ordered_map(slow_for_small, range(5), 3))) == [0, 10, 20, 30, 40]
+
+
+def test_02_at_most_limit_calls_are_in_flight(run):
+    in_flight = []
+    peak = []
+
+    async def track(value):
+        in_flight.append(value)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(value)
+        return value
+
+    assert run(collect(ordered_map(track, range(10), 3))) == list(range(10))
+    assert max(peak) == 3
+
+
+def test_03_items_are_pulled_lazily_from_async_iterables(run):
+    pulled = []
+
+    async def items():
+        for value in range(10):
+            pulled.append(value)
+            yield value
+
+    async def identity(value):
+        return value
+
+    async def first_two():
+        results = []
+        async for result in ordered_map(identity, items(), 2):
+            results.append(result)
+            if len(results) == 2:
+                break
+        return results
+
+    assert run(first_two()) == [0, 1]
+    assert len(pulled) <= 3
+
+
+def test_04_failure_cancels_pending_calls(run):
+    cancelled = []
+
+    async def work(value):
+        if value == 0:
+            raise ValueError('first call failed')
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(value)
+            raise
+        return value
+
+    async def consume():
+        try:
+            await collect(ordered_map(work, range(3), 3))
+        finally:
+            # let the cancelled calls handle their cancellation
+            await asyncio.sleep(0)
+
+    with pytest.raises(ValueError):
+        run(consume())
+    assert sorted(cancelled) == [1, 2]
@@ -0,0 +1,71 @@
+import base64
+
+import pytest
+
+from resources.cursor import InvalidCursorError
+from resources.cursor import decode_cursor
+from resources.cursor import encode_cursor
+from resources.cursor import next_cursor
+from resources.cursor import page_offset
+
+
+def test_01_cursor_round_trip():
+    cursor = encode_cursor(40, 20, 'time_created', 'DESC')
+    assert decode_cursor(cursor, 20, 'time_created', 'desc') == {
+        'offset': 40,
+        'page_size': 20,
+        'order_by': 'time_created',
+        'order_type': 'desc',
+    }
+
+
+def test_02_cursor_of_another_ordering_or_page_size_is_rejected():
+    cursor = encode_cursor(40, 20, 'time_created', 'desc')
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, 20, 'name', 'desc')
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, 20, 'time_created', 'asc')
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, 10, 'time_created', 'desc')
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    base64.urlsafe_b64encode(b'[1, 2]').decode(),
+    base64.urlsafe_b64encode(b'{"offset": -1, "page_size": 10, "order_by": "name", "order_type": "asc"}').decode(),
+    base64.urlsafe_b64encode(b'{"offset": "x", "page_size": 10, "order_by": "name", "order_type": "asc"}').decode(),
+    # issued before cursors recorded the page size
+    base64.urlsafe_b64encode(b'{"offset": 10, "order_by": "name", "order_type": "asc"}').decode(),
+])
+def test_03_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, 10, 'name', 'asc')
+
+
+def test_04_page_offset_prefers_the_cursor():
+    assert page_offset(2, 25, None, 'name', 'asc') == 50
+    assert page_offset(2, 25, encode_cursor(7, 25, 'name', 'asc'), 'name', 'asc') == 7
+
+
+def test_05_next_cursor_points_after_the_page():
+    nodes = [{'global_entity_id': str(i)} for i in range(10)]
+    cursor = next_cursor(20, nodes, 10, 'name', 'asc', total=35)
+    assert decode_cursor(cursor, 10, 'name', 'asc')['offset'] == 30
+
+
+def test_06_last_page_has_no_next_cursor():
+    nodes = [{'global_entity_id': str(i)} for i in range(5)]
+    assert next_cursor(30, nodes, 10, 'name', 'asc', total=35) is None
+    assert next_cursor(30, nodes, 10, 'name', 'asc') is None
+    assert next_cursor(30, [], 10, 'name', 'asc') is None
+    # without a total a full page may be followed by another one
+    assert next_cursor(0, nodes, 5, 'name', 'asc') is not None
+
+
+def test_07_listing_rejects_a_cursor_of_another_page_size(test_client):
+    cursor = encode_cursor(20, 10, 'time_created', 'asc')
+    res = test_client.post('/v1/files/project-geid/query', json={
+        'page_size': 25, 'cursor': cursor, 'query': {'labels': ['File']},
+    }).json()
+    assert res['code'] == 400
+    assert res['error_msg'] == 'Cursor was issued for another page_size, order_by or order_type'
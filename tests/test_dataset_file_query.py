@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from pytest_httpx import to_response
+
+from api.api_files import files
+from config import ConfigClass
+from resources.project_resolver import project_resolver
+
+NEO4J = ConfigClass.NEO4J_SERVICE_V1
+PROJECT = {'id': 7, 'global_entity_id': 'project-geid', 'code': 'unittest_project'}
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    project_resolver.clear()
+    files._total_cache.clear()
+    project_resolver._store(PROJECT)
+    yield
+    project_resolver.clear()
+    files._total_cache.clear()
+
+
+def relations(request, extensions):
+    payload = json.loads(request.read())
+    end = min(payload['skip'] + payload['limit'], 7)
+    return to_response(json=[{'end_node': {'id': i}} for i in range(payload['skip'], end)])
+
+
+def query(test_client, **kwargs):
+    payload = dict({'page_size': 3, 'query': {'labels': ['File', 'Greenroom']}}, **kwargs)
+    return test_client.post('/v1/files/project-geid/query', json=payload).json()
+
+
+def test_01_page_and_count(test_client, mock_http):
+    mock_http.add_callback(relations, method='POST', url=NEO4J + 'relations/query')
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/query/count', json={'count': 7})
+    res = query(test_client, page=1)
+    assert [node['id'] for node in res['result']] == [3, 4, 5]
+    assert (res['total'], res['page'], res['num_of_pages']) == (7, 1, 3)
+    count = json.loads(mock_http.get_requests(url=NEO4J + 'relations/query/count')[0].read())
+    assert count['start_params'] == {'id': 7}
+    assert count['end_label'] == ['File', 'Greenroom']
+
+
+def test_02_page_and_count_are_requested_concurrently(test_client, monkeypatch):
+    in_flight = []
+    peak = []
+
+    class Client:
+        async def post(self, url, json):
+            in_flight.append(url)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(url)
+            body = {'count': 7} if url.endswith('/count') else [{'end_node': {'id': 0}}]
+            return httpx.Response(200, json=body)
+
+    monkeypatch.setattr(files, 'get_client', lambda: Client())
+    assert query(test_client)['total'] == 7
+    assert max(peak) == 2
+
+
+def test_03_without_total_the_count_is_skipped(test_client, mock_http):
+    mock_http.add_callback(relations, method='POST', url=NEO4J + 'relations/query')
+    res = query(test_client, include_total=False, page=1)
+    # a full page estimates one more row
+    assert res['total'] == 7
+    assert res['next_cursor']
+    res = query(test_client, include_total=False, page=2)
+    assert (res['total'], res['next_cursor']) == (7, None)
+    assert mock_http.get_requests(url=NEO4J + 'relations/query/count') == []
+
+
+def test_04_without_total_a_recent_count_is_reused(test_client, mock_http):
+    mock_http.add_callback(relations, method='POST', url=NEO4J + 'relations/query')
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/query/count', json={'count': 7})
+    query(test_client)
+    res = query(test_client, include_total=False)
+    assert (res['total'], res['num_of_pages']) == (7, 3)
+    assert len(mock_http.get_requests(url=NEO4J + 'relations/query/count')) == 1
+    # other filters are counted separately
+    res = query(test_client, include_total=False, query={'labels': ['File', 'Core']})
+    assert res['total'] == 4
+
+
+def test_05_unknown_project(test_client, mock_http):
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Container/query', json=[])
+    res = test_client.post('/v1/files/missing-geid/query', json={'query': {'labels': ['File']}}).json()
+    assert (res['code'], res['error_msg']) == (404, 'Project not found')
@@ -0,0 +1,78 @@
+import json
+
+from pytest_httpx import to_response
+
+from config import ConfigClass
+from resources.es_batcher import ESBatcher
+
+BULK_URL = ConfigClass.PROVENANCE_SERVICE_V1 + 'entity/file/batch'
+ENTITY_URL = ConfigClass.PROVENANCE_SERVICE_V1 + 'entity/file'
+
+DOCS = [{'global_entity_id': 'geid-1', 'file_name': 'a'}, {'global_entity_id': 'geid-2', 'file_name': 'b'}]
+
+
+def echo_entity(request, extensions):
+    return to_response(json={'result': json.loads(request.read())})
+
+
+def test_01_send_maps_bulk_results_by_geid(run, mock_http):
+    mock_http.add_response(method='POST', url=BULK_URL, json={'result': [
+        {'global_entity_id': 'geid-2', 'status_code': 400, 'error_msg': 'bad document'},
+        {'global_entity_id': 'geid-1', 'status_code': 200},
+    ]})
+    results = run(ESBatcher().send('POST', DOCS))
+    assert [(r.global_entity_id, r.status_code, r.error) for r in results] == [
+        ('geid-1', 200, ''),
+        ('geid-2', 400, 'bad document'),
+    ]
+    assert results[0].ok and not results[1].ok
+
+
+def test_02_send_single_document_skips_bulk(run, mock_http):
+    mock_http.add_callback(echo_entity, method='PUT', url=ENTITY_URL)
+    results = run(ESBatcher().send('PUT', DOCS[:1]))
+    assert [(r.global_entity_id, r.status_code) for r in results] == [('geid-1', 200)]
+    assert len(mock_http.get_requests()) == 1
+
+
+def test_03_missing_bulk_endpoint_falls_back_until_retry(run, mock_http):
+    batcher = ESBatcher()
+    mock_http.add_response(method='POST', url=BULK_URL, status_code=404)
+    mock_http.add_callback(echo_entity, method='POST', url=ENTITY_URL)
+    results = run(batcher.send('POST', DOCS))
+    assert all(r.ok for r in results)
+    # the bulk endpoint is not called again before ES_BULK_RETRY_INTERVAL elapsed
+    run(batcher.send('POST', DOCS))
+    assert len(mock_http.get_requests(url=BULK_URL)) == 1
+    assert len(mock_http.get_requests(url=ENTITY_URL)) == 4
+
+
+def test_04_missing_bulk_endpoint_is_probed_again(run, mock_http, monkeypatch):
+    monkeypatch.setattr(ConfigClass, 'ES_BULK_RETRY_INTERVAL', 0)
+    batcher = ESBatcher()
+    mock_http.add_response(method='POST', url=BULK_URL, status_code=405)
+    mock_http.add_callback(echo_entity, method='POST', url=ENTITY_URL)
+    run(batcher.send('POST', DOCS))
+    run(batcher.send('POST', DOCS))
+    assert len(mock_http.get_requests(url=BULK_URL)) == 2
+
+
+def test_05_unexpected_bulk_body_falls_back_to_each_document(run, mock_http):
+    mock_http.add_response(method='POST', url=BULK_URL, json={'code': 200, 'result': 'ok'})
+    mock_http.add_callback(echo_entity, method='POST', url=ENTITY_URL)
+    results = run(ESBatcher().send('POST', DOCS))
+    assert [(r.global_entity_id, r.status_code) for r in results] == [('geid-1', 200), ('geid-2', 200)]
+
+
+def test_06_bulk_result_missing_a_document_falls_back(run, mock_http):
+    mock_http.add_response(method='POST', url=BULK_URL, json={'result': [{'global_entity_id': 'geid-1'}]})
+    mock_http.add_callback(echo_entity, method='POST', url=ENTITY_URL)
+    results = run(ESBatcher().send('POST', DOCS))
+    assert all(r.ok for r in results)
+    assert len(mock_http.get_requests(url=ENTITY_URL)) == 2
+
+
+def test_07_bulk_server_error_fails_every_document(run, mock_http):
+    mock_http.add_response(method='POST', url=BULK_URL, status_code=503, data='unavailable')
+    results = run(ESBatcher().send('POST', DOCS))
+    assert [(r.status_code, r.error) for r in results] == [(503, 'unavailable'), (503, 'unavailable')]
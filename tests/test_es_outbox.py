@@ -0,0 +1,208 @@
+import asyncio
+import json
+
+import pytest
+
+from config import ConfigClass
+from resources import es_outbox
+from resources.es_batcher import EntityResult
+from resources.es_outbox import ESOutboxDispatcher
+
+
+class FakeTransaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def __aenter__(self):
+        self.connection.in_transaction = True
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.connection.in_transaction = False
+        self.connection.committed = exc_type is None
+
+
+class FakeConnection:
+    '''
+        stands in for an asyncpg connection, the claim query returns the queued rows and writes are recorded.
+    '''
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.claimed = None
+        self.deleted = []
+        self.failed = []
+        self.committed = None
+        self.in_transaction = False
+
+    async def fetch(self, sql, limit, lease):
+        self.claimed = (limit, lease)
+        # rows come back from UPDATE ... RETURNING in no particular order
+        return list(reversed(self.rows[:limit]))
+
+    async def execute(self, sql, ids):
+        self.deleted.extend(ids)
+
+    async def executemany(self, sql, args):
+        self.failed.extend(args)
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+
+class FakePool:
+    def __init__(self, connection):
+        self.connection = connection
+        self.inserted = []
+
+    def acquire(self):
+        pool = self
+
+        class Acquire:
+            async def __aenter__(self):
+                return pool.connection
+
+            async def __aexit__(self, exc_type, exc, tb):
+                return False
+
+        return Acquire()
+
+    async def executemany(self, sql, args):
+        self.inserted.extend(args)
+
+
+def outbox_row(row_id, geid, method='POST'):
+    return {
+        'id': row_id,
+        'global_entity_id': geid,
+        'method': method,
+        'payload': json.dumps({'global_entity_id': geid}),
+        'attempts': 0,
+    }
+
+
+@pytest.fixture
+def connection(monkeypatch):
+    connection = FakeConnection([])
+    monkeypatch.setattr(es_outbox, '_pool', FakePool(connection))
+    return connection
+
+
+@pytest.fixture
+def sent(monkeypatch, connection):
+    '''
+        replace the provenance calls with per geid status codes, geids missing from ``statuses`` are written
+    '''
+    calls = []
+    statuses = {}
+
+    async def send(method, docs):
+        assert not connection.in_transaction
+        calls.append((method, [doc['global_entity_id'] for doc in docs]))
+        if statuses.get('*') == 'unreachable':
+            raise ConnectionError('provenance service down')
+        return [EntityResult(doc['global_entity_id'], statuses.get(doc['global_entity_id'], 200), 'error')
+                for doc in docs]
+
+    monkeypatch.setattr(es_outbox.es_batcher, 'send', send)
+    return calls, statuses
+
+
+def test_01_enqueue_inserts_one_row_per_document(run, connection):
+    run(es_outbox.enqueue('PUT', [{'global_entity_id': 'geid-1'}, {'global_entity_id': 'geid-2'}]))
+    inserted = es_outbox._pool.inserted
+    assert [(geid, method) for geid, method, _ in inserted] == [('geid-1', 'PUT'), ('geid-2', 'PUT')]
+    assert json.loads(inserted[0][2]) == {'global_entity_id': 'geid-1'}
+
+
+def test_02_enqueue_without_documents_skips_the_database(run, monkeypatch):
+    monkeypatch.setattr(es_outbox, '_pool', None)
+    run(es_outbox.enqueue('POST', []))
+    assert es_outbox._pool is None
+
+
+def test_03_drain_deletes_delivered_rows(run, connection, sent):
+    calls, _ = sent
+    connection.rows = [outbox_row(1, 'geid-1'), outbox_row(2, 'geid-2', 'PUT'), outbox_row(3, 'geid-3')]
+    dispatcher = ESOutboxDispatcher(batch_size=10)
+    assert run(dispatcher.drain_once()) == 3
+    assert connection.claimed == (10, ConfigClass.ES_OUTBOX_LEASE)
+    # claimed rows are sent in id order, without a transaction held open during the calls
+    assert sorted(calls) == [('POST', ['geid-1', 'geid-3']), ('PUT', ['geid-2'])]
+    assert sorted(connection.deleted) == [1, 2, 3]
+    assert connection.failed == []
+    assert connection.committed is True
+    assert dispatcher.delivered == 3
+
+
+def test_04_drain_claims_at_most_a_batch(run, connection, sent):
+    connection.rows = [outbox_row(i, f'geid-{i}') for i in range(5)]
+    assert run(ESOutboxDispatcher(batch_size=2).drain_once()) == 2
+    assert sorted(connection.deleted) == [0, 1]
+
+
+def test_05_drain_of_an_empty_outbox(run, connection, sent):
+    calls, _ = sent
+    assert run(ESOutboxDispatcher().drain_once()) == 0
+    assert calls == []
+
+
+def test_06_retryable_failure_is_kept_pending(run, connection, sent):
+    _, statuses = sent
+    statuses['geid-2'] = 503
+    connection.rows = [outbox_row(1, 'geid-1'), outbox_row(2, 'geid-2')]
+    dispatcher = ESOutboxDispatcher()
+    run(dispatcher.drain_once())
+    assert connection.deleted == [1]
+    assert connection.failed == [(
+        2,
+        '503 error',
+        False,
+        ConfigClass.ES_OUTBOX_MAX_ATTEMPTS,
+        ConfigClass.ES_OUTBOX_RETRY_DELAY,
+        ConfigClass.ES_OUTBOX_RETRY_MAX_DELAY,
+    )]
+    assert dispatcher.failed == 1
+
+
+def test_07_rejected_document_is_dead_lettered_at_once(run, connection, sent):
+    _, statuses = sent
+    statuses['geid-1'] = 400
+    connection.rows = [outbox_row(1, 'geid-1')]
+    run(ESOutboxDispatcher().drain_once())
+    row_id, error, dead = connection.failed[0][:3]
+    assert (row_id, error, dead) == (1, '400 error', True)
+
+
+def test_08_unreachable_provenance_service_is_retried(run, connection, sent):
+    _, statuses = sent
+    statuses['*'] = 'unreachable'
+    connection.rows = [outbox_row(1, 'geid-1'), outbox_row(2, 'geid-2')]
+    run(ESOutboxDispatcher().drain_once())
+    assert connection.deleted == []
+    assert [failure[:3] for failure in connection.failed] == [
+        (1, '0 provenance service unreachable', False),
+        (2, '0 provenance service unreachable', False),
+    ]
+
+
+@pytest.mark.parametrize('status_code,retryable', [(500, True), (502, True), (408, True), (429, True),
+                                                   (400, False), (404, False), (422, False)])
+def test_09_is_retryable(status_code, retryable):
+    assert es_outbox.is_retryable(status_code) is retryable
+
+
+def test_10_concurrent_first_uses_create_one_pool(run, monkeypatch):
+    created = []
+
+    async def create_pool(dsn, min_size, max_size):
+        await asyncio.sleep(0.01)
+        created.append(dsn)
+        return FakePool(FakeConnection([]))
+
+    monkeypatch.setattr(es_outbox, '_pool', None)
+    monkeypatch.setattr(es_outbox, '_pool_lock', None)
+    monkeypatch.setattr(es_outbox.asyncpg, 'create_pool', create_pool)
+    pools = run(asyncio.gather(*[es_outbox.get_pool() for _ in range(5)]))
+    assert len(created) == 1
+    assert all(pool is pools[0] for pool in pools)
@@ -1,3 +1,4 @@
+import json
 import unittest
 from tests.logger import Logger
 from tests.prepare_test import SetUpTest
@@ -56,6 +57,23 @@ class FileAttributes(unittest.TestCase):
         self.log.info(result)
         self.assertEqual(result.status_code, 200)
 
+    def test_01_files_attribute_attach_stream(self):
+        project_geid = self.container[0]["global_entity_id"]
+        payload = {
+            "manifest_id": self.manifest_id,
+            "global_entity_id": [project_geid],
+            "attributes": {self.attribute_name: "2"},
+            "stream": True
+        }
+
+        result = self.app.post("/v1/files/attributes/attach", json=payload)
+        self.log.info(result.text)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(result.headers["content-type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in result.text.splitlines()]
+        self.assertIn("summary", lines[-1])
+        self.assertEqual(lines[-1]["summary"]["total"], len(lines) - 1)
+
     def test_02_missing_required_field(self):
         project_geid = self.container[0]["global_entity_id"]
         payload = {
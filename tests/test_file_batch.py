@@ -0,0 +1,107 @@
+import json
+
+import pytest
+from pytest_httpx import to_response
+
+from config import ConfigClass
+from resources.project_resolver import project_resolver
+
+NEO4J = ConfigClass.NEO4J_SERVICE_V1
+PROJECT = {'id': 7, 'global_entity_id': 'project-geid', 'code': 'unittest_project'}
+
+
+@pytest.fixture(autouse=True)
+def clear_project_cache():
+    project_resolver.clear()
+    yield
+    project_resolver.clear()
+
+
+def created_nodes(missing=()):
+    '''
+        answer a node batch creation with the created nodes, leaving out the geids in ``missing``
+    '''
+    def callback(request, extensions):
+        payload = json.loads(request.read())['payload']
+        return to_response(json=[
+            dict(node, id=index) for index, node in enumerate(payload) if node['global_entity_id'] not in missing
+        ])
+    return callback
+
+
+def file_item(geid, **kwargs):
+    return dict({
+        'global_entity_id': geid,
+        'file_size': 1024,
+        'full_path': f'/data/unittest_project/raw/{geid}.txt',
+        'dcm_id': '',
+        'guid': f'guid-{geid}',
+        'namespace': 'greenroom',
+        'uploader': 'admin',
+        'project_code': 'unittest_project',
+    }, **kwargs)
+
+
+def test_01_create_batch(test_client, mock_http, outbox_rows):
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Container/query', json=[PROJECT])
+    mock_http.add_callback(created_nodes(), method='POST', url=NEO4J + 'nodes/File/batch')
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/own/batch', json={})
+    payload = [file_item('geid-1'), file_item('geid-2'), file_item(''), file_item('geid-1')]
+    res = test_client.post('/v1/files/batch', json={'payload': payload}).json()
+    assert res['code'] == 200
+    assert [(r['global_entity_id'], r['status'], r['error_msg']) for r in res['result']] == [
+        ('geid-1', 'success', ''),
+        ('geid-2', 'success', ''),
+        ('', 'failed', 'Missing required field global_entity_id'),
+        ('geid-1', 'failed', 'Duplicated global_entity_id'),
+    ]
+    relations = json.loads(mock_http.get_requests(url=NEO4J + 'relations/own/batch')[0].read())
+    assert relations['start_label'] == 'Container'
+    assert [r['end_params']['global_entity_id'] for r in relations['payload']] == ['geid-1', 'geid-2']
+    assert [(geid, method) for geid, method, _ in outbox_rows] == [('geid-1', 'POST'), ('geid-2', 'POST')]
+
+
+def test_02_create_batch_fails_nodes_missing_from_the_response(test_client, mock_http, outbox_rows):
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Container/query', json=[PROJECT])
+    mock_http.add_callback(created_nodes(missing={'geid-2'}), method='POST', url=NEO4J + 'nodes/File/batch')
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/own/batch', json={})
+    payload = [file_item('geid-1'), file_item('geid-2')]
+    res = test_client.post('/v1/files/batch', json={'payload': payload}).json()
+    assert [(r['status'], r['error_msg'], r['result']) for r in res['result']][1] == (
+        'failed', 'Neo4j error: node missing from batch response', {}
+    )
+    relations = json.loads(mock_http.get_requests(url=NEO4J + 'relations/own/batch')[0].read())
+    assert [r['end_params']['global_entity_id'] for r in relations['payload']] == ['geid-1']
+    assert [geid for geid, _, _ in outbox_rows] == ['geid-1']
+
+
+def test_03_create_batch_with_unknown_project_creates_nothing(test_client, mock_http, outbox_rows):
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Container/query', json=[])
+    res = test_client.post('/v1/files/batch', json={'payload': [file_item('geid-1')]}).json()
+    assert res['result'][0]['error_msg'] == 'Project not found unittest_project'
+    assert len(mock_http.get_requests()) == 1
+    assert outbox_rows == []
+
+
+def test_04_create_batch_size_limit(test_client, monkeypatch):
+    monkeypatch.setattr(ConfigClass, 'FILE_BATCH_MAX_SIZE', 1)
+    res = test_client.post('/v1/files/batch', json={'payload': [file_item('geid-1'), file_item('geid-2')]})
+    assert res.json()['code'] == 400
+
+
+@pytest.mark.parametrize('body', [{'result': []}, [['geid-1']], 'not json'])
+def test_05_create_batch_unexpected_response_is_not_a_plain_failure(test_client, mock_http, outbox_rows, body):
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Container/query', json=[PROJECT])
+    if isinstance(body, str):
+        mock_http.add_response(method='POST', url=NEO4J + 'nodes/File/batch', data=body)
+    else:
+        mock_http.add_response(method='POST', url=NEO4J + 'nodes/File/batch', json=body)
+    res = test_client.post('/v1/files/batch', json={'payload': [file_item('geid-1'), file_item('')]}).json()
+    assert res['code'] == 500
+    assert 'query them before creating them again' in res['error_msg']
+    assert [(r['status'], r['error_msg']) for r in res['result']] == [
+        ('unknown', 'Neo4j error: unexpected batch response, the file may have been created'),
+        ('failed', 'Missing required field global_entity_id'),
+    ]
+    assert mock_http.get_requests(url=NEO4J + 'relations/own/batch') == []
+    assert outbox_rows == []
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+
+from pytest_httpx import to_response
+
+from config import ConfigClass
+
+QUERY_URL = ConfigClass.NEO4J_SERVICE_V2 + 'relations/query'
+
+TREE = {
+    'project-geid': [
+        {'global_entity_id': 'f1', 'labels': ['File', 'Greenroom'], 'name': 'a.txt'},
+        {'global_entity_id': 'd1', 'labels': ['Folder', 'Greenroom'], 'name': 'raw'},
+    ],
+    'd1': [{'global_entity_id': 'f2', 'labels': ['File', 'Greenroom'], 'name': 'b,c.txt'}],
+}
+
+
+def mock_tree(httpx_mock, tree, failing=()):
+    def children(request, extensions):
+        query = json.loads(request.read())
+        geid = query['query']['start_params']['global_entity_id']
+        if geid in failing:
+            return to_response(status_code=500, json={'error_msg': 'neo4j down'})
+        nodes = tree.get(geid, [])[query['skip']:query['skip'] + query['limit']]
+        return to_response(json={'results': nodes, 'total': len(nodes)})
+
+    httpx_mock.add_callback(children, method='POST', url=QUERY_URL)
+
+
+def test_01_export_ndjson(test_client, mock_http):
+    mock_tree(mock_http, TREE)
+    res = test_client.get('/v2/files/project-geid/export', params={'source_type': 'Project'})
+    assert res.status_code == 200
+    assert res.headers['content-type'] == 'application/x-ndjson'
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert [row['global_entity_id'] for row in rows] == ['f1', 'f2']
+    start_labels = [json.loads(r.read())['start_label'] for r in mock_http.get_requests()]
+    assert start_labels == ['Container', 'Folder']
+
+
+def test_02_export_csv_with_folders(test_client, mock_http):
+    mock_tree(mock_http, TREE)
+    res = test_client.get(
+        '/v2/files/project-geid/export',
+        params={'source_type': 'Project', 'export_format': 'csv', 'include_folders': True},
+    )
+    assert res.headers['content-disposition'] == 'attachment; filename="project-geid.csv"'
+    lines = res.text.splitlines()
+    assert lines[0].startswith('global_entity_id,name,display_path,labels')
+    assert lines[1:] == [
+        'f1,a.txt,,File;Greenroom,,,,',
+        'd1,raw,,Folder;Greenroom,,,,',
+        'f2,"b,c.txt",,File;Greenroom,,,,',
+    ]
+
+
+def test_03_export_failing_first_page_returns_an_error_status(test_client, mock_http):
+    mock_tree(mock_http, TREE, failing={'project-geid'})
+    res = test_client.get('/v2/files/project-geid/export', params={'source_type': 'Project'})
+    assert res.status_code == 500
+    assert res.json()['error_msg'].startswith('Neo4j error')
+
+
+def test_04_export_failing_later_page_ends_with_an_error(test_client, mock_http):
+    mock_tree(mock_http, TREE, failing={'d1'})
+    res = test_client.get('/v2/files/project-geid/export', params={'source_type': 'Project'})
+    rows = [json.loads(line) for line in res.text.splitlines()]
+    assert rows[0]['global_entity_id'] == 'f1'
+    assert 'error' in rows[-1]
+
+    res = test_client.get('/v2/files/project-geid/export', params={'source_type': 'Project', 'export_format': 'csv'})
+    last_row = list(csv.reader(io.StringIO(res.text)))[-1]
+    assert last_row[0] == '#error'
+    assert 'Server Error' in last_row[1]
+
+
+def test_05_export_rejects_unknown_options(test_client):
+    res = test_client.get('/v2/files/project-geid/export', params={'source_type': 'Dataset'})
+    assert res.json()['error_msg'] == 'Invalid source_type'
+    res = test_client.get('/v2/files/project-geid/export', params={'export_format': 'xml'})
+    assert res.json()['error_msg'] == 'Invalid export_format'
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+from pytest_httpx import to_response
+
+from config import ConfigClass
+from resources.project_resolver import project_resolver
+
+NEO4J = ConfigClass.NEO4J_SERVICE_V1
+PROJECT = {'id': 7, 'global_entity_id': 'project-geid', 'code': 'unittest_project'}
+
+
+@pytest.fixture(autouse=True)
+def clear_project_cache():
+    project_resolver.clear()
+    yield
+    project_resolver.clear()
+
+
+def created_nodes(missing=()):
+    '''
+        answer a node batch creation with the created nodes, leaving out the geids in ``missing``
+    '''
+    def callback(request, extensions):
+        payload = json.loads(request.read())['payload']
+        return to_response(json=[
+            dict(node, id=index) for index, node in enumerate(payload) if node['global_entity_id'] not in missing
+        ])
+    return callback
+
+
+def file_node(geid):
+    return {
+        'id': 1,
+        'global_entity_id': geid,
+        'labels': ['File', 'Greenroom'],
+        'name': f'{geid}.txt',
+        'full_path': f'/data/unittest_project/raw/{geid}.txt',
+        'project_code': 'unittest_project',
+        'parent_folder_geid': 'folder-geid',
+    }
+
+
+def trash_item(geid):
+    return {
+        'geid': geid,
+        'trash_geid': f'trash-{geid}',
+        'full_path': f'/data/unittest_project/raw/{geid}.txt',
+        'trash_full_path': f'/data/unittest_project/trash/{geid}.txt',
+    }
+
+
+def mock_trash(mock_http, missing=()):
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/query/geids', json={
+        'result': [file_node('geid-1'), file_node('geid-2')],
+    })
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Container/query', json=[PROJECT])
+    mock_http.add_callback(created_nodes(missing), method='POST', url=NEO4J + 'nodes/TrashFile/batch')
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/deleted/batch', json={})
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/own/batch', json={})
+
+
+def test_01_trash_batch(test_client, mock_http, outbox_rows):
+    mock_trash(mock_http)
+    payload = [trash_item('geid-1'), trash_item('geid-2'), trash_item('geid-3')]
+    res = test_client.post('/v1/files/trash/batch', json={'payload': payload}).json()
+    assert [(r['global_entity_id'], r['status'], r['error_msg']) for r in res['result']] == [
+        ('geid-1', 'success', ''),
+        ('geid-2', 'success', ''),
+        ('geid-3', 'failed', 'File not found geid-3'),
+    ]
+    trash_files = json.loads(mock_http.get_requests(url=NEO4J + 'nodes/TrashFile/batch')[0].read())
+    assert trash_files['extra_labels'] == ['Greenroom']
+    owned = json.loads(mock_http.get_requests(url=NEO4J + 'relations/own/batch')[0].read())
+    assert {r['start_params']['global_entity_id'] for r in owned['payload']} == {'project-geid'}
+    assert [(geid, method) for geid, method, _ in outbox_rows] == [('geid-1', 'PUT'), ('geid-2', 'PUT')]
+
+
+def test_02_trash_batch_fails_trash_files_missing_from_the_response(test_client, mock_http, outbox_rows):
+    mock_trash(mock_http, missing={'trash-geid-1'})
+    payload = [trash_item('geid-1'), trash_item('geid-2')]
+    res = test_client.post('/v1/files/trash/batch', json={'payload': payload}).json()
+    assert [(r['status'], r['error_msg']) for r in res['result']] == [
+        ('failed', 'Neo4j error: node missing from batch response'),
+        ('success', ''),
+    ]
+    deleted = json.loads(mock_http.get_requests(url=NEO4J + 'relations/deleted/batch')[0].read())
+    assert [r['end_params']['global_entity_id'] for r in deleted['payload']] == ['trash-geid-2']
+    assert [geid for geid, _, _ in outbox_rows] == ['geid-2']
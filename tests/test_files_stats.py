@@ -0,0 +1,68 @@
+import re
+
+import pytest
+from pytest_httpx import to_response
+
+from api.api_files import files_stats
+from config import ConfigClass
+from resources.project_resolver import project_resolver
+
+NEO4J = ConfigClass.NEO4J_SERVICE_V1
+PROJECT = {'id': 7, 'global_entity_id': 'project-geid', 'code': 'unittest_project', 'name': 'Unit Test Project'}
+AUDIT_TOTALS = {'data_upload': 3, 'data_download': 2, 'data_transfer': 1}
+FILE_COUNTS = {'Greenroom:File': 10, 'Core:File': 4}
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    project_resolver.clear()
+    files_stats._stats_cache.clear()
+    yield
+    project_resolver.clear()
+    files_stats._stats_cache.clear()
+
+
+def mock_stats(mock_http):
+    def audit_logs(request, extensions):
+        assert request.url.params['project_code'] == 'unittest_project'
+        return to_response(json={'total': AUDIT_TOTALS[request.url.params['action']]})
+
+    def file_count(request, extensions):
+        assert request.url.params['project_code'] == 'unittest_project'
+        return to_response(json={'result': FILE_COUNTS[request.url.params['labels']]})
+
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Container/query', json=[PROJECT])
+    mock_http.add_callback(audit_logs, method='GET', url=re.compile(ConfigClass.PROVENANCE_SERVICE_V1 + 'audit-logs'))
+    mock_http.add_callback(file_count, method='GET', url=re.compile(NEO4J + 'file/quick/count'))
+
+
+def get_stats(test_client):
+    return test_client.get('/v1/project/project-geid/files/statistics', params={
+        'start_date': 1618200000, 'end_date': 1618286399,
+    }).json()
+
+
+def test_01_statistics_of_a_project(test_client, mock_http):
+    mock_stats(mock_http)
+    res = get_stats(test_client)
+    assert res['code'] == 200
+    assert res['result'] == {
+        'uploaded': 3, 'downloaded': 2, 'approved': 1, 'greenroom': 10, 'core': 4, 'project_info': PROJECT,
+    }
+
+
+def test_02_resolved_project_needs_six_calls(test_client, mock_http):
+    mock_stats(mock_http)
+    project_resolver._store(PROJECT)
+    get_stats(test_client)
+    # the project node, three audit log totals and two file counts
+    assert len(mock_http.get_requests(url=NEO4J + 'nodes/Container/query')) == 1
+    assert len(mock_http.get_requests()) == 6
+
+
+def test_03_statistics_are_cached(test_client, mock_http):
+    mock_stats(mock_http)
+    first = get_stats(test_client)
+    requests = len(mock_http.get_requests())
+    assert get_stats(test_client) == first
+    assert len(mock_http.get_requests()) == requests
@@ -0,0 +1,172 @@
+import json
+
+import pytest
+from pytest_httpx import to_response
+
+from config import ConfigClass
+from models import folders as models
+from resources import es_outbox
+from resources.project_resolver import project_resolver
+
+NEO4J = ConfigClass.NEO4J_SERVICE_V1
+PROJECT = {'id': 7, 'global_entity_id': 'project-geid', 'code': 'unittest_project'}
+PARENT = {'id': 3, 'global_entity_id': 'parent-geid', 'labels': ['Folder', 'Greenroom']}
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    project_resolver.clear()
+    models._folder_node_cache.clear()
+    yield
+    project_resolver.clear()
+    models._folder_node_cache.clear()
+
+
+def created_node(request, extensions):
+    return to_response(json=[dict(json.loads(request.read()), id=11)])
+
+
+def folder_item(geid='folder-geid', **kwargs):
+    return dict({
+        'global_entity_id': geid,
+        'folder_name': 'folder',
+        'folder_level': 1,
+        'folder_parent_geid': 'parent-geid',
+        'folder_parent_name': 'parent',
+        'uploader': 'admin',
+        'folder_relative_path': 'admin',
+        'zone': 'greenroom',
+        'project_code': 'unittest_project',
+    }, **kwargs)
+
+
+def test_01_folder_is_queued_after_it_is_created_and_linked(test_client, mock_http, outbox_rows):
+    mock_http.add_callback(created_node, method='POST', url=NEO4J + 'nodes/Folder')
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Folder/query', json=[PARENT])
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/own', json={})
+    res = test_client.post('/v1/folders', json=folder_item()).json()
+    assert res['code'] == 200
+    assert res['result']['id'] == 11
+    link = json.loads(mock_http.get_requests(url=NEO4J + 'relations/own')[0].read())
+    assert link == {'start_id': 3, 'end_id': 11}
+    assert [(geid, method) for geid, method, _ in outbox_rows] == [('folder-geid', 'POST')]
+
+
+def test_02_failed_create_queues_nothing(test_client, mock_http, outbox_rows):
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Folder', status_code=500, data='neo4j down')
+    res = test_client.post('/v1/folders', json=folder_item()).json()
+    assert res['code'] == 500
+    assert outbox_rows == []
+
+
+def test_03_failed_link_queues_nothing(test_client, mock_http, outbox_rows):
+    mock_http.add_callback(created_node, method='POST', url=NEO4J + 'nodes/Folder')
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Folder/query', json=[PARENT])
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/own', status_code=500, data='neo4j down')
+    res = test_client.post('/v1/folders', json=folder_item()).json()
+    assert res['code'] == 500
+    assert outbox_rows == []
+
+
+def test_04_name_folder_is_not_queued(test_client, mock_http, outbox_rows):
+    mock_http.add_callback(created_node, method='POST', url=NEO4J + 'nodes/Folder')
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Container/query', json=[PROJECT])
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/own', json={})
+    res = test_client.post('/v1/folders', json=folder_item(folder_relative_path='')).json()
+    assert res['code'] == 200
+    link = json.loads(mock_http.get_requests(url=NEO4J + 'relations/own')[0].read())
+    assert link == {'start_id': 7, 'end_id': 11}
+    assert outbox_rows == []
+
+
+def batch(test_client, link_container):
+    items = [folder_item('folder-1'), folder_item('folder-2'), folder_item('name-folder', folder_relative_path='')]
+    return test_client.post('/v1/folders/batch', json={
+        'payload': items, 'zone': 'Greenroom', 'link_container': link_container,
+    }).json()
+
+
+def test_05_batch_links_the_folders_to_their_project(test_client, mock_http, outbox_rows):
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Folder/batch', json=[])
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/own/batch', json={})
+    res = batch(test_client, link_container=True)
+    assert (res['code'], res['result']) == (200, {'result': 'success'})
+    relations = json.loads(mock_http.get_requests(url=NEO4J + 'relations/own/batch')[0].read())
+    assert (relations['start_label'], relations['end_label']) == ('Container', 'Folder')
+    assert [r['end_params']['global_entity_id'] for r in relations['payload']] == [
+        'folder-1', 'folder-2', 'name-folder',
+    ]
+    assert outbox_rows == []
+
+
+def test_06_batch_queues_the_unlinked_folders_in_one_insert(test_client, mock_http, outbox_rows):
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Folder/batch', json=[])
+    res = batch(test_client, link_container=False)
+    assert res['code'] == 200
+    assert mock_http.get_requests(url=NEO4J + 'relations/own/batch') == []
+    # name folders are not indexed
+    assert [(geid, method) for geid, method, _ in outbox_rows] == [('folder-1', 'POST'), ('folder-2', 'POST')]
+
+
+def test_07_batch_create_failure_queues_nothing(test_client, mock_http, outbox_rows):
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Folder/batch', status_code=500)
+    res = batch(test_client, link_container=False)
+    assert (res['code'], res['result']) == (500, {'result': 'failed to create folders'})
+    assert outbox_rows == []
+
+
+def test_08_batch_link_failure_is_reported(test_client, mock_http, outbox_rows):
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Folder/batch', json=[])
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/own/batch', status_code=500, data='neo4j down')
+    res = batch(test_client, link_container=True)
+    assert (res['code'], res['result']) == (500, {'result': 'failed to link projects with folders'})
+    assert 'neo4j down' in res['error_msg']
+
+
+def test_09_batch_outbox_failure_lists_every_folder_as_not_indexed(test_client, mock_http, monkeypatch):
+    class Pool:
+        async def executemany(self, sql, args):
+            raise ConnectionError('database down')
+
+    monkeypatch.setattr(es_outbox, '_pool', Pool())
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Folder/batch', json=[])
+    res = batch(test_client, link_container=False)
+    assert res['code'] == 500
+    assert res['error_msg'] == 'Elastic Search outbox error: database down'
+    assert res['result'] == {
+        'result': 'folders created but none of them was queued for elastic search',
+        'not_indexed': ['folder-1', 'folder-2'],
+    }
+
+
+def test_10_subfolder_finds_its_parent_in_the_cache(test_client, mock_http, outbox_rows):
+    mock_http.add_callback(created_node, method='POST', url=NEO4J + 'nodes/Folder')
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Folder/query', json=[PARENT])
+    mock_http.add_response(method='POST', url=NEO4J + 'relations/own', json={})
+    test_client.post('/v1/folders', json=folder_item('folder-geid'))
+    requests = len(mock_http.get_requests())
+    res = test_client.post('/v1/folders', json=folder_item('subfolder-geid', folder_parent_geid='folder-geid'))
+    assert res.json()['code'] == 200
+    # the node creation and the own relation, the parent created just before is not queried
+    assert len(mock_http.get_requests()) - requests == 2
+    assert len(mock_http.get_requests(url=NEO4J + 'nodes/Folder/query')) == 1
+    link = json.loads(mock_http.get_requests(url=NEO4J + 'relations/own')[-1].read())
+    assert link == {'start_id': 11, 'end_id': 11}
+
+
+def test_11_missing_parent_folder_fails(test_client, mock_http, outbox_rows):
+    mock_http.add_callback(created_node, method='POST', url=NEO4J + 'nodes/Folder')
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Folder/query', json=[])
+    res = test_client.post('/v1/folders', json=folder_item()).json()
+    assert res['code'] == 500
+    assert 'Not found 200 parent-geid' in res['error_msg']
+    assert mock_http.get_requests(url=NEO4J + 'relations/own') == []
+    assert outbox_rows == []
+
+
+def test_12_missing_project_fails(test_client, mock_http, outbox_rows):
+    mock_http.add_callback(created_node, method='POST', url=NEO4J + 'nodes/Folder')
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Container/query', json=[])
+    res = test_client.post('/v1/folders', json=folder_item(folder_relative_path='')).json()
+    assert res['code'] == 500
+    assert 'Not found project: unittest_project' in res['error_msg']
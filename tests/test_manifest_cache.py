@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+
+from api.api_manifest.service import Manifest
+from config import ConfigClass
+from resources import pg_notify
+from resources.pg_notify import PGListener
+
+
+def manifest(manifest_id, project_code='unittest_project'):
+    return {
+        'id': manifest_id,
+        'name': f'Manifest{manifest_id}',
+        'project_code': project_code,
+        'attributes': [{'name': 'attr1', 'type': 'text', 'value': '', 'optional': True}],
+    }
+
+
+@pytest.fixture(autouse=True)
+def clear_manifest_cache():
+    Manifest.evict(None)
+    yield
+    Manifest.evict(None)
+
+
+def test_01_loaded_manifest_is_cached(monkeypatch):
+    loads = []
+
+    def load(id):
+        loads.append(id)
+        return manifest(id)
+
+    monkeypatch.setattr(Manifest, '_load_by_id', staticmethod(load))
+    assert Manifest.get_by_id(1)['id'] == 1
+    result, validator = Manifest.get_with_validator('1')
+    assert result['id'] == 1 and validator.manifest_id == 1
+    assert loads == [1]
+
+
+def test_02_invalidation_during_a_load_does_not_store_the_stale_manifest(monkeypatch):
+    loads = []
+
+    def load(id):
+        loads.append(id)
+        if len(loads) == 1:
+            # another request commits a change and evicts the manifest while this one is still loading it
+            Manifest.evict({'manifest_ids': [id], 'project_codes': []})
+        return manifest(id)
+
+    monkeypatch.setattr(Manifest, '_load_by_id', staticmethod(load))
+    assert Manifest.get_by_id(1)['id'] == 1
+    assert 1 not in Manifest.by_id_cache
+    Manifest.get_by_id(1)
+    Manifest.get_by_id(1)
+    assert loads == [1, 1]
+
+
+def test_03_invalidation_during_a_project_load_does_not_store_the_stale_list(monkeypatch):
+    def load(project_code):
+        Manifest.evict({'manifest_ids': [], 'project_codes': [project_code]})
+        return [manifest(1, project_code)]
+
+    monkeypatch.setattr(Manifest, '_load_by_project_name', staticmethod(load))
+    assert [m['id'] for m in Manifest.get_by_project_name('unittest_project')] == [1]
+    assert 'unittest_project' not in Manifest.by_project_cache
+
+
+def test_04_evict_drops_the_manifest_and_its_project_list():
+    Manifest._cache_entry(manifest(1), Manifest.generation)
+    Manifest._cache_entry(manifest(2, 'other_project'), Manifest.generation)
+    Manifest.by_project_cache.set('unittest_project', [manifest(1)])
+    Manifest.evict({'manifest_ids': [1], 'project_codes': []})
+    assert 1 not in Manifest.by_id_cache
+    assert 'unittest_project' not in Manifest.by_project_cache
+    assert 2 in Manifest.by_id_cache
+
+
+class FakeListenConnection:
+    def __init__(self):
+        self.listeners = {}
+        self.closed = False
+
+    async def add_listener(self, channel, callback):
+        self.listeners[channel] = callback
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+
+
+def test_05_received_notification_evicts_the_manifest(run, monkeypatch):
+    connection = FakeListenConnection()
+
+    async def connect(dsn):
+        return connection
+
+    monkeypatch.setattr(pg_notify.asyncpg, 'connect', connect)
+    channel = ConfigClass.MANIFEST_NOTIFY_CHANNEL
+    listener = PGListener(channel, Manifest.evict, reconnect_delay=0.01)
+
+    async def notify():
+        listener.start()
+        await asyncio.sleep(0)
+        # cache after the listener connected, connecting clears everything
+        Manifest._cache_entry(manifest(1), Manifest.generation)
+        Manifest._cache_entry(manifest(2), Manifest.generation)
+        payload = json.dumps({'manifest_ids': [1], 'project_codes': ['unittest_project']})
+        connection.listeners[channel](connection, 1234, channel, payload)
+        await listener.stop()
+
+    run(notify())
+    assert 1 not in Manifest.by_id_cache
+    assert 2 in Manifest.by_id_cache
+
+
+def test_06_reconnecting_listener_clears_the_cache(run, monkeypatch):
+    Manifest._cache_entry(manifest(1), Manifest.generation)
+
+    async def connect(dsn):
+        return FakeListenConnection()
+
+    monkeypatch.setattr(pg_notify.asyncpg, 'connect', connect)
+    listener = PGListener(ConfigClass.MANIFEST_NOTIFY_CHANNEL, Manifest.evict, reconnect_delay=0.01)
+
+    async def connect_once():
+        listener.start()
+        await asyncio.sleep(0)
+        await listener.stop()
+
+    run(connect_once())
+    # notifications sent while the listener was down are lost, so nothing cached before it connected is kept
+    assert 1 not in Manifest.by_id_cache
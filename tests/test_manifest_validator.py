@@ -0,0 +1,144 @@
+import itertools
+
+from api.api_manifest.validator import ManifestValidator
+
+MANIFEST = {
+    'id': 1,
+    'name': 'Manifest1',
+    'attributes': [
+        {'name': 'choice', 'type': 'multiple_choice', 'value': 'a1,a2', 'optional': False},
+        {'name': 'optional_choice', 'type': 'multiple_choice', 'value': 'b1,b2', 'optional': True},
+        {'name': 'text', 'type': 'text', 'value': '', 'optional': False},
+        {'name': 'optional_text', 'type': 'text', 'value': '', 'optional': True},
+    ],
+}
+VALIDATOR = ManifestValidator(MANIFEST)
+
+CHOICES = [None, '', 'a1', 'b2', 'z', 5]
+TEXTS = [None, '', 'short', 'x' * 100, 'x' * 101]
+
+
+def payloads():
+    '''
+        every combination of the values above, a None value leaves the attribute out, plus unknown attributes
+    '''
+    for choice, optional_choice, text, optional_text in itertools.product(CHOICES, CHOICES, TEXTS, TEXTS):
+        values = {'choice': choice, 'optional_choice': optional_choice, 'text': text, 'optional_text': optional_text}
+        payload = {name: value for name, value in values.items() if value is not None}
+        yield payload
+        yield dict(payload, unknown='value')
+
+
+def attach_reference(attributes, received_attributes, text_too_long='text too long'):
+    # has_valid_attributes from api_attributes/utils.py and api_files/utils.py before the validator was compiled
+    for attr in attributes:
+        if not attr["optional"] and not attr["name"] in received_attributes:
+            return False, "Missing required attribute"
+        if attr["type"] == "multiple_choice":
+            value = received_attributes.get(attr["name"])
+            if value:
+                if not value in attr["value"].split(","):
+                    return False, "Invalid choice field"
+            else:
+                if not attr["optional"]:
+                    return False, "Field required"
+        if attr["type"] == "text":
+            value = received_attributes.get(attr["name"])
+            if value:
+                if len(value) > 100:
+                    return False, text_too_long
+            else:
+                if not attr["optional"]:
+                    return False, "Field required"
+    return True, ""
+
+
+def attach_es_reference(manifest, attributes):
+    # the elastic search attributes attach_attributes built before the validator was compiled
+    es_attributes = []
+    for key in attributes:
+        value = attributes[key]
+        sql_attribute = [x for x in manifest['attributes'] if x['name'] == key]
+        if len(sql_attribute) == 0:
+            continue
+        sql_attribute = sql_attribute[0]
+        if sql_attribute["type"] == 'multiple_choice':
+            es_attributes.append({"attribute_name": key, "name": manifest['name'], "value": [value]})
+        else:
+            es_attributes.append({"attribute_name": key, "name": manifest['name'], "value": value})
+    return es_attributes
+
+
+def update_reference(manifest, data):
+    # the checks FileManifest.put made inline before the validator was compiled, returns (valid, error, es attributes)
+    valid_attributes = []
+    es_attributes = []
+    for attr in manifest['attributes']:
+        valid_attributes.append(attr['name'])
+        if not attr['optional'] and not attr['name'] in data:
+            return False, 'Missing required attribute', None
+        # absent optional attributes raised a KeyError, they are handled as empty values now
+        value = data.get(attr['name'])
+        if attr['type'] == 'multiple_choice':
+            if not value in attr['value'].split(','):
+                if not value and attr['optional']:
+                    continue
+                return False, 'Invalid attribute value', None
+            es_attributes.append({'attribute_name': attr['name'], 'name': manifest['name'], 'value': [value]})
+        if attr['type'] == 'text':
+            if value:
+                if len(value) > 100:
+                    return False, 'text to long', None
+                es_attributes.append({'attribute_name': attr['name'], 'name': manifest['name'], 'value': value})
+    for key in data:
+        if key not in valid_attributes:
+            return False, 'Not a valid attribute', None
+    return True, '', es_attributes
+
+
+def test_01_validate_matches_the_attach_checks():
+    for payload in payloads():
+        assert VALIDATOR.validate(payload) == attach_reference(MANIFEST['attributes'], payload)
+        assert VALIDATOR.es_attributes(payload) == attach_es_reference(MANIFEST, payload)
+
+
+def test_02_validate_matches_the_validate_manifest_checks():
+    for payload in payloads():
+        expected = attach_reference(MANIFEST['attributes'], payload, text_too_long='text to long')
+        assert VALIDATOR.validate(payload, text_too_long='text to long') == expected
+
+
+def test_03_validate_update_matches_the_file_manifest_put_checks():
+    for payload in payloads():
+        valid, error_msg, es_attributes = update_reference(MANIFEST, payload)
+        assert VALIDATOR.validate_update(payload) == (valid, error_msg)
+        if valid:
+            assert VALIDATOR.update_es_attributes(payload) == es_attributes
+
+
+def test_04_messages_of_each_endpoint():
+    payload = {'choice': 'z', 'text': 'short'}
+    assert VALIDATOR.validate(payload) == (False, 'Invalid choice field')
+    assert VALIDATOR.validate_update(payload) == (False, 'Invalid attribute value')
+    payload = {'choice': 'a1', 'text': 'x' * 101}
+    assert VALIDATOR.validate(payload) == (False, 'text too long')
+    assert VALIDATOR.validate(payload, text_too_long='text to long') == (False, 'text to long')
+    assert VALIDATOR.validate_update(payload) == (False, 'text to long')
+
+
+def test_05_required_empty_text_is_only_accepted_on_update():
+    payload = {'choice': 'a1', 'text': ''}
+    assert VALIDATOR.validate(payload) == (False, 'Field required')
+    assert VALIDATOR.validate_update(payload) == (True, '')
+
+
+def test_06_unknown_attribute_is_reported_after_the_rules_on_update():
+    assert VALIDATOR.validate_update({'choice': 'z', 'text': '', 'unknown': 1}) == (False, 'Invalid attribute value')
+    assert VALIDATOR.validate_update({'choice': 'a1', 'text': '', 'unknown': 1}) == (False, 'Not a valid attribute')
+
+
+def test_07_attach_es_attributes_keep_empty_values():
+    assert VALIDATOR.es_attributes({'choice': 'a1', 'text': '', 'unknown': 'value'}) == [
+        {'attribute_name': 'choice', 'name': 'Manifest1', 'value': ['a1']},
+        {'attribute_name': 'text', 'name': 'Manifest1', 'value': ''},
+    ]
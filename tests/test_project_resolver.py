@@ -0,0 +1,77 @@
+import json
+import time
+
+from pytest_httpx import to_response
+
+from config import ConfigClass
+from resources.project_resolver import ProjectResolver
+
+QUERY_URL = ConfigClass.NEO4J_SERVICE_V1 + 'nodes/Container/query'
+PROJECT = {
+    'id': 7,
+    'global_entity_id': 'project-geid',
+    'code': 'unittest_project',
+    'name': 'Unit test project',
+    'description': 'before',
+}
+
+
+def container_query(request, extensions):
+    query = json.loads(request.read())
+    matches = query.get('code') == PROJECT['code'] or query.get('global_entity_id') == PROJECT['global_entity_id']
+    return to_response(json=[PROJECT] if matches else [])
+
+
+def test_01_resolve_caches_the_keys_for_every_lookup(run, mock_http):
+    mock_http.add_callback(container_query, method='POST', url=QUERY_URL)
+    resolver = ProjectResolver()
+    keys = {'id': 7, 'global_entity_id': 'project-geid', 'code': 'unittest_project'}
+    assert run(resolver.resolve(code='unittest_project')) == keys
+    assert run(resolver.resolve(geid='project-geid')) == keys
+    assert run(resolver.resolve(id=7)) == keys
+    assert len(mock_http.get_requests()) == 1
+    assert resolver.stats() == {'hits': 2, 'misses': 1, 'size': 1}
+
+
+def test_02_unknown_project_is_not_cached(run, mock_http):
+    mock_http.add_callback(container_query, method='POST', url=QUERY_URL)
+    resolver = ProjectResolver()
+    assert run(resolver.resolve(code='missing')) is None
+    assert run(resolver.resolve(code='missing')) is None
+    assert len(mock_http.get_requests()) == 2
+
+
+def test_03_fetch_returns_the_current_node(run, mock_http):
+    mock_http.add_response(method='POST', url=QUERY_URL, json=[dict(PROJECT, description='before')])
+    mock_http.add_response(method='POST', url=QUERY_URL, json=[dict(PROJECT, description='after')])
+    resolver = ProjectResolver()
+    assert run(resolver.fetch(geid='project-geid'))['description'] == 'before'
+    assert run(resolver.fetch(geid='project-geid'))['description'] == 'after'
+    # the keys stored by fetch serve later resolves
+    assert run(resolver.resolve(code='unittest_project'))['id'] == 7
+    assert len(mock_http.get_requests()) == 2
+
+
+def test_04_invalidate_drops_every_key_of_the_project(run, mock_http):
+    mock_http.add_callback(container_query, method='POST', url=QUERY_URL)
+    resolver = ProjectResolver()
+    run(resolver.resolve(code='unittest_project'))
+    resolver.invalidate(code='unittest_project')
+    assert resolver.stats()['size'] == 0
+    run(resolver.resolve(geid='project-geid'))
+    assert len(mock_http.get_requests()) == 2
+
+
+def test_05_cached_keys_expire_after_the_ttl(run, mock_http, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    mock_http.add_callback(container_query, method='POST', url=QUERY_URL)
+    resolver = ProjectResolver(ttl=60)
+    run(resolver.resolve(code='unittest_project'))
+    now[0] += 59
+    run(resolver.resolve(code='unittest_project'))
+    assert len(mock_http.get_requests()) == 1
+    # a project deleted through another worker is not resolved from this one's cache any longer
+    now[0] += 2
+    run(resolver.resolve(code='unittest_project'))
+    assert len(mock_http.get_requests()) == 2
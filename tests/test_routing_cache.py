@@ -0,0 +1,67 @@
+import time
+
+import pytest
+
+from config import ConfigClass
+from models import meta
+from models.meta import get_cached_parent_connections
+
+NEO4J = ConfigClass.NEO4J_SERVICE_V1
+ROUTING = [
+    {'global_entity_id': 'project-geid', 'labels': ['Container']},
+    {'global_entity_id': 'folder-geid', 'labels': ['Folder']},
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_routing_cache():
+    meta._routing_cache.clear()
+    yield
+    meta._routing_cache.clear()
+
+
+def mock_routing(mock_http, geid='folder-geid', status_code=200):
+    mock_http.add_response(
+        method='GET', url=NEO4J + f'relations/connected/{geid}', json={'result': ROUTING}, status_code=status_code
+    )
+
+
+def test_01_routing_is_cached_per_geid(run, mock_http):
+    mock_routing(mock_http)
+    assert run(get_cached_parent_connections('folder-geid')) == ROUTING
+    assert run(get_cached_parent_connections('folder-geid')) == ROUTING
+    assert len(mock_http.get_requests()) == 1
+
+
+def test_02_cached_routing_is_returned_as_a_copy(run, mock_http):
+    mock_routing(mock_http)
+    run(get_cached_parent_connections('folder-geid'))[0]['global_entity_id'] = 'changed'
+    assert run(get_cached_parent_connections('folder-geid')) == ROUTING
+
+
+def test_03_self_node_is_added_when_neo4j_leaves_it_out(run, mock_http):
+    mock_routing(mock_http, 'file-geid')
+    file_node = {'global_entity_id': 'file-geid', 'labels': ['File']}
+    mock_http.add_response(method='POST', url=NEO4J + 'nodes/Folder/query', json=[file_node])
+    assert run(get_cached_parent_connections('file-geid')) == ROUTING + [file_node]
+
+
+def test_04_routing_expires_after_the_ttl(run, mock_http, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    mock_routing(mock_http)
+    run(get_cached_parent_connections('folder-geid'))
+    now[0] += ConfigClass.ROUTING_CACHE_TTL - 1
+    run(get_cached_parent_connections('folder-geid'))
+    assert len(mock_http.get_requests()) == 1
+    # a moved or renamed folder shows its new path once the ttl elapsed
+    now[0] += 2
+    run(get_cached_parent_connections('folder-geid'))
+    assert len(mock_http.get_requests()) == 2
+
+
+def test_05_failed_lookup_is_not_cached(run, mock_http):
+    mock_routing(mock_http, status_code=500)
+    with pytest.raises(Exception):
+        run(get_cached_parent_connections('folder-geid'))
+    assert 'folder-geid' not in meta._routing_cache
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from resources.step_graph import StepFailed
+from resources.step_graph import StepGraph
+
+
+def test_01_steps_get_the_results_they_require(run):
+    async def parent():
+        return 'parent'
+
+    async def node():
+        return 'node'
+
+    async def link(parent, node):
+        return f'{parent}->{node}'
+
+    steps = StepGraph()
+    steps.add('parent', parent).add('node', node).add('link', link, requires=['parent', 'node'])
+    results = run(steps.run())
+    assert results == {'parent': 'parent', 'node': 'node', 'link': 'parent->node'}
+    assert set(steps.timings) == {'parent', 'node', 'link'}
+
+
+def test_02_independent_steps_run_concurrently(run):
+    started = []
+
+    async def step(name):
+        started.append(name)
+        await asyncio.sleep(0.05)
+        # both steps started before either finished
+        return len(started)
+
+    steps = StepGraph()
+    steps.add('a', lambda: step('a')).add('b', lambda: step('b'))
+    assert run(steps.run()) == {'a': 2, 'b': 2}
+
+
+def test_03_failure_cancels_the_running_steps(run):
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append('slow')
+            raise
+
+    async def failing():
+        raise StepFailed('Parent folder not found')
+
+    async def after(failing):
+        return 'never'
+
+    steps = StepGraph()
+    steps.add('slow', slow).add('failing', failing).add('after', after, requires=['failing'])
+    with pytest.raises(StepFailed, match='Parent folder not found'):
+        run(steps.run())
+    assert cancelled == ['slow']
+    assert 'after' not in steps.results
+
+
+def test_04_requirements_must_be_added_first():
+    async def step():
+        return None
+
+    steps = StepGraph()
+    with pytest.raises(ValueError):
+        steps.add('link', step, requires=['node'])
+    steps.add('node', step)
+    with pytest.raises(ValueError):
+        steps.add('node', step)
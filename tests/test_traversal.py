@@ -0,0 +1,78 @@
+import json
+
+import pytest
+from pytest_httpx import to_response
+
+from config import ConfigClass
+from resources.traversal import TraversalLimitError
+from resources.traversal import iter_folder_files
+from resources.traversal import iter_subtree_pages
+
+QUERY_URL = ConfigClass.NEO4J_SERVICE_V2 + 'relations/query'
+
+
+def file_node(geid):
+    return {'global_entity_id': geid, 'labels': ['File', 'Greenroom']}
+
+
+def folder_node(geid):
+    return {'global_entity_id': geid, 'labels': ['Folder', 'Greenroom']}
+
+
+def mock_tree(httpx_mock, tree):
+    '''
+        answer relations/query with the children of the start node, paged with skip and limit when they are given
+    '''
+    def children(request, extensions):
+        query = json.loads(request.read())
+        nodes = tree.get(query['query']['start_params']['global_entity_id'], [])
+        if 'limit' in query:
+            nodes = nodes[query['skip']:query['skip'] + query['limit']]
+        return to_response(json={'results': nodes, 'total': len(nodes)})
+
+    httpx_mock.add_callback(children, method='POST', url=QUERY_URL)
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+def test_01_folder_files_walks_every_level(mock_http, run):
+    mock_tree(mock_http, {
+        'root': [file_node('f1'), folder_node('d1')],
+        'd1': [file_node('f2'), folder_node('d2')],
+        'd2': [file_node('f3')],
+    })
+    files = run(collect(iter_folder_files('root')))
+    assert sorted(node['global_entity_id'] for node in files) == ['f1', 'f2', 'f3']
+
+
+def test_02_folder_files_depth_limit(mock_http, run):
+    mock_tree(mock_http, {'root': [folder_node('d1')], 'd1': [folder_node('d2')], 'd2': [file_node('f1')]})
+    with pytest.raises(TraversalLimitError, match='deeper than 2 levels'):
+        run(collect(iter_folder_files('root', max_depth=2)))
+
+
+def test_03_folder_files_file_limit(mock_http, run):
+    mock_tree(mock_http, {'root': [file_node(f'f{i}') for i in range(3)]})
+    with pytest.raises(TraversalLimitError, match='more than 2 files'):
+        run(collect(iter_folder_files('root', max_files=2)))
+
+
+def test_04_folder_files_frontier_limit(mock_http, run):
+    mock_tree(mock_http, {'root': [folder_node(f'd{i}') for i in range(3)]})
+    with pytest.raises(TraversalLimitError, match='more than 2 folders'):
+        run(collect(iter_folder_files('root', max_frontier=2)))
+
+
+
+
+def test_05_subtree_pages_are_not_capped(run, mock_http, monkeypatch):
+    monkeypatch.setattr(ConfigClass, 'TRAVERSAL_MAX_FRONTIER', 1)
+    tree = {'root': [folder_node(f'd{i}') for i in range(4)]}
+    tree.update({f'd{i}': [file_node(f'f{i}')] for i in range(4)})
+    mock_tree(mock_http, tree)
+    pages = run(collect(iter_subtree_pages('root', 'Container', page_size=3)))
+    assert [[node['global_entity_id'] for node in page] for page in pages] == [
+        ['d0', 'd1', 'd2'], ['d3'], ['f0'], ['f1'], ['f2'], ['f3'],
+    ]